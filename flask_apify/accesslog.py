@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.accesslog
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    The sampled access log of API requests.
+
+    The entry of sampled request is put into the bounded queue by the request
+    thread, then encoded as compact JSON line and written to the stream by the
+    background thread::
+
+        apify.access_log = AccessLog(open('access.log', 'a'), sample_rate=0.01,
+                                     slow=0.5)
+
+    The errors and slow requests are always logged.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from itertools import count
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+
+def request_id(ctx):
+    """Returns the ``X-Request-Id`` header value as the sampling key, so all
+    services sample the same requests.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    return ctx.request.headers.get('X-Request-Id')
+
+
+class JSONLinesWriter(object):
+    """Writes entries to the stream as JSON lines in the background thread.
+    The thread is started on the first write, so the writer may be created
+    before the fork. Entries which do not fit into the queue are dropped and
+    counted in :attr:`dropped`.
+
+    :param stream: The file-like object to write lines to
+    :param maxsize: The maximum number of entries waiting in the queue
+    """
+
+    _sentinel = None
+
+    def __init__(self, stream, maxsize=4096):
+        self.stream = stream
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def write(self, entry):
+        """Put entry into the queue to write.
+
+        :param entry: The JSON serializable dictionary
+        """
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        """Starts the background thread, if not started in this process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run,
+                                            name='flask-apify-access-log')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def close(self):
+        """Writes the queued entries and stops the background thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = self._pid = None
+
+    def _run(self):
+        dumps = json.JSONEncoder(separators=(',', ':')).encode
+        while True:
+            entry = self.queue.get()
+            if entry is self._sentinel:
+                break
+            self.stream.write(dumps(entry) + '\n')
+            if self.queue.empty():
+                self.stream.flush()
+        self.stream.flush()
+
+
+class AccessLog(object):
+    """The access log of API requests.
+
+    The request is sampled by the CRC32 of the sampling key, which is either
+    returned by `key_func` or the sequential number of request in process.
+    The same key is always either sampled or not.
+
+    :param stream: The file-like object to write lines to, the standard
+        error by default.
+    :param sample_rate: The fraction of requests to log, from 0 to 1.
+    :param slow: The duration in seconds after which the request is always
+        logged, never if `None`.
+    :param error_status: The response status code from which the request is
+        always logged, never if `None`.
+    :param key_func: The function which accepts the request
+        :class:`~flask_apify.ctx.ApiContext` and returns the sampling key or
+        `None`.
+    :param maxsize: The maximum number of entries waiting to be written.
+    :param writer: The object with ``write(entry)`` method to write entries
+        with instead of :class:`JSONLinesWriter`.
+    """
+
+    def __init__(self, stream=None, sample_rate=0.01, slow=1.0,
+                 error_status=500, key_func=request_id, maxsize=4096,
+                 writer=None):
+        if writer is None:
+            if stream is None:
+                stream = sys.stderr
+            writer = JSONLinesWriter(stream, maxsize=maxsize)
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.slow = slow
+        self.error_status = error_status
+        self.key_func = key_func
+        self._threshold = int(sample_rate * 0xffffffff)
+        self._counter = count()
+
+    def sampled(self, ctx):
+        """Returns whether the request is sampled.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if self.sample_rate >= 1:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        key = self.key_func(ctx) if self.key_func is not None else None
+        if key is None:
+            key = '%d' % next(self._counter)
+        return (zlib.crc32(key.encode('utf-8')) & 0xffffffff) \
+            < self._threshold
+
+    def get_reason(self, ctx, res, duration):
+        """Returns the reason to log request or `None`.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param res: The response object
+        :param duration: The request duration in seconds
+        """
+        if self.error_status is not None \
+           and res.status_code >= self.error_status:
+            return 'error'
+        if self.slow is not None and duration >= self.slow:
+            return 'slow'
+        if self.sampled(ctx):
+            return 'sample'
+        return None
+
+    def record(self, ctx, res, duration):
+        """Writes the access log entry of the request if it should be logged.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param res: The response object
+        :param duration: The request duration in seconds
+        """
+        reason = self.get_reason(ctx, res, duration)
+        if reason is None:
+            return
+        request = ctx.request
+        self.writer.write({
+            'ts': round(time.time(), 3),
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'status': res.status_code,
+            'mimetype': res.mimetype,
+            'bytes': res.content_length,
+            'duration': round(duration * 1000, 3),
+            'cache': ctx.cache_status,
+            'reason': reason,
+        })
+
+    def close(self):
+        """Writes the pending entries."""
+        close = getattr(self.writer, 'close', None)
+        if close is not None:
+            close()
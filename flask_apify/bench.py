@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.bench
+    ~~~~~~~~~~~~~~~~~
+
+    The load generator to measure throughput and latency of API routes.
+
+    The weighted mix of requests is sent by the number of threads either
+    directly to the WSGI application in-process, or over HTTP to the server
+    on loopback interface. The latency percentiles are reported per endpoint
+    along with the time spent per request pipeline stage::
+
+        generator = LoadGenerator(app, [
+            RequestSpec('GET', '/api/todos', weight=9),
+            RequestSpec('POST', '/api/todos', data=b'{"title": "x"}',
+                        headers={'Content-Type': 'application/json'}),
+        ], concurrency=8, apify=apify)
+        result = generator.run(total=10000, warmup=100)
+        print(result.as_dict())
+
+    The result of the previous version may be kept to assert there is no
+    throughput regression::
+
+        assert not result.regressions(baseline, tolerance=0.1)
+
+    Note that the threads share the interpreter lock, so the in-process load
+    measures the overhead per request rather than the capacity of the server.
+    Run the application by the multi-process server and pass it as
+    :class:`HTTPTransport` to measure the latter.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import bisect
+import math
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from werkzeug.serving import make_server
+from werkzeug.test import EnvironBuilder
+
+from .utils import timer
+
+try:
+    from http.client import HTTPConnection
+except ImportError:  # pragma: no cover
+    from httplib import HTTPConnection
+
+
+class RequestSpec(object):
+    """The request of load mix.
+
+    :param method: The HTTP method
+    :param path: The request path with the query string
+    :param headers: The request headers, the dictionary or the list of
+        ``(key, value)`` pairs.
+    :param data: The request body bytes
+    :param weight: The relative frequency of the request in mix
+    :param name: The name to report request statistics by, defaults to the
+        method and path.
+    """
+
+    __slots__ = ('method', 'path', 'headers', 'data', 'weight', 'name')
+
+    def __init__(self, method, path, headers=None, data=None, weight=1,
+                 name=None):
+        if hasattr(headers, 'items'):
+            headers = headers.items()
+        self.method = method.upper()
+        self.path = path
+        self.headers = list(headers or ())
+        self.data = data
+        self.weight = weight
+        self.name = name or '%s %s' % (self.method, path.partition('?')[0])
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.method,
+                               self.path)
+
+
+class WSGITransport(object):
+    """Calls the WSGI application in the current process.
+
+    :param app: The WSGI application, e.g. the Flask instance
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def prepare(self, spec):
+        """Returns the WSGI environ of the request, built before the timer is
+        started.
+
+        :param spec: The :class:`RequestSpec`
+        """
+        path, _, query_string = spec.path.partition('?')
+        builder = EnvironBuilder(path=path, method=spec.method,
+                                 headers=spec.headers, data=spec.data,
+                                 query_string=query_string)
+        try:
+            return builder.get_environ()
+        finally:
+            builder.close()
+
+    def __call__(self, environ):
+        """Sends the prepared request. Returns the response status code and
+        the body size.
+
+        :param environ: The value returned by :meth:`prepare`
+        """
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(None, 1)[0]))
+            return lambda data: None
+
+        body = self.app(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in body)
+        finally:
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+        return status[0], size
+
+    def connect(self):
+        """Returns the transport for the single thread."""
+        return self
+
+
+class HTTPTransport(object):
+    """Sends requests over HTTP to the running server, each thread keeps its
+    own persistent connection.
+
+    :param host: The server host
+    :param port: The server port
+    :param timeout: The number of seconds to wait for response
+    """
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+
+    def connect(self):
+        """Returns the transport for the single thread."""
+        return self.__class__(self.host, self.port, self.timeout)
+
+    def prepare(self, spec):
+        return spec
+
+    def __call__(self, spec):
+        if self.connection is None:
+            self.connection = HTTPConnection(self.host, self.port,
+                                             timeout=self.timeout)
+        try:
+            self.connection.request(spec.method, spec.path, body=spec.data,
+                                    headers=dict(spec.headers))
+            res = self.connection.getresponse()
+            size = len(res.read())
+        except Exception:
+            self.close()
+            raise
+        if res.will_close:
+            self.close()
+        return res.status, size
+
+    def close(self):
+        """Closes the connection."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+@contextmanager
+def serve(app, host='127.0.0.1', port=0, threaded=True):
+    """Runs the application by the development server in the background
+    thread and yields the :class:`HTTPTransport` to it.
+
+    :param app: The WSGI application
+    :param host: The interface to listen on
+    :param port: The port to listen on, any free port if 0
+    :param threaded: Whether to handle each request in a separate thread
+    """
+    server = make_server(host, port, app, threaded=threaded)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='flask-apify-bench-server')
+    thread.daemon = True
+    thread.start()
+    try:
+        yield HTTPTransport(host, server.server_port)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def percentile(values, q):
+    """Returns the nearest-rank percentile of sorted values or `None` if
+    there are no values.
+
+    :param values: The sorted list of values
+    :param q: The percentile from 0 to 100
+    """
+    if not values:
+        return None
+    rank = int(math.ceil(q / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class EndpointStats(object):
+    """The latencies and statuses of requests of the endpoint.
+
+    :param name: The endpoint name
+    """
+
+    __slots__ = ('name', 'latencies', 'statuses', 'errors', 'bytes')
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.bytes = 0
+
+    def merge(self, other):
+        """Adds the statistics of the other thread.
+
+        :param other: The :class:`EndpointStats`
+        """
+        self.latencies.extend(other.latencies)
+        self.statuses.update(other.statuses)
+        self.errors += other.errors
+        self.bytes += other.bytes
+
+    def as_dict(self, duration):
+        """Returns the statistics as dictionary, the latencies are in
+        milliseconds.
+
+        :param duration: The number of seconds the load lasted
+        """
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        return {
+            'count': count,
+            'errors': self.errors,
+            'throughput': round(count / duration, 1) if duration else None,
+            'bytes': self.bytes,
+            'statuses': dict(self.statuses),
+            'mean': ms(sum(latencies) / count if count else None),
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+        }
+
+
+class StageTimer(object):
+    """Collects the time spent per request pipeline stage per endpoint, see
+    :attr:`~flask_apify.Apify.stage_timer`.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, ctx):
+        """Adds the stage timings of the request.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        timings = ctx.timings
+        if not timings:
+            return
+        endpoint = ctx.request.endpoint
+        with self._lock:
+            stages = self.endpoints.get(endpoint)
+            if stages is None:
+                stages = self.endpoints[endpoint] = {}
+            for stage, elapsed in timings.items():
+                total = stages.get(stage)
+                if total is None:
+                    stages[stage] = [1, elapsed]
+                else:
+                    total[0] += 1
+                    total[1] += elapsed
+
+    def report(self):
+        """Returns the mean time per stage in milliseconds per endpoint as
+        dictionary.
+        """
+        with self._lock:
+            return dict((endpoint, dict(
+                (stage, round(elapsed / count * 1000, 3))
+                for stage, (count, elapsed) in stages.items()
+            )) for endpoint, stages in self.endpoints.items())
+
+
+class BenchResult(object):
+    """The result of the load run.
+
+    :param duration: The number of seconds the load lasted
+    :param endpoints: The :class:`EndpointStats` per endpoint name
+    :param stages: The mean stage timings reported by :class:`StageTimer`
+    """
+
+    def __init__(self, duration, endpoints, stages=None):
+        self.duration = duration
+        self.endpoints = endpoints
+        self.stages = stages or {}
+
+    @property
+    def count(self):
+        """The total number of requests sent."""
+        return sum(len(stats.latencies) for stats in self.endpoints.values())
+
+    @property
+    def throughput(self):
+        """The number of requests per second."""
+        return self.count / self.duration if self.duration else 0.0
+
+    def as_dict(self):
+        """Returns the result as dictionary."""
+        return {
+            'duration': round(self.duration, 3),
+            'count': self.count,
+            'throughput': round(self.throughput, 1),
+            'endpoints': dict((name, stats.as_dict(self.duration))
+                              for name, stats in self.endpoints.items()),
+            'stages': self.stages,
+        }
+
+    def regressions(self, baseline, tolerance=0.1):
+        """Returns the list of regressions compared to the baseline result:
+        the total and per endpoint throughput lower by more than tolerance.
+
+        :param baseline: The :class:`BenchResult` or its dictionary
+        :param tolerance: The allowed fraction of slowdown
+        """
+        if isinstance(baseline, BenchResult):
+            baseline = baseline.as_dict()
+        current = self.as_dict()
+
+        regressions = []
+
+        def check(name, value, expected):
+            if expected and value < expected * (1 - tolerance):
+                regressions.append('%s: %.1f req/s, was %.1f req/s'
+                                   % (name, value, expected))
+
+        check('total', current['throughput'], baseline['throughput'])
+        for name, stats in baseline['endpoints'].items():
+            if name in current['endpoints']:
+                check(name, current['endpoints'][name]['throughput'],
+                      stats['throughput'])
+        return regressions
+
+
+class LoadGenerator(object):
+    """Sends the weighted mix of requests by the number of threads.
+
+    :param app: The WSGI application or the transport, e.g. the one yielded
+        by :func:`serve`
+    :param requests: The list of :class:`RequestSpec`
+    :param concurrency: The number of threads
+    :param apify: The :class:`~flask_apify.Apify` instance to collect the
+        stage timings of, the application must run in the current process.
+    :param seed: The seed of the request mix, the mix differs between runs
+        if `None`.
+    """
+
+    def __init__(self, app, requests, concurrency=4, apify=None, seed=None):
+        if not requests:
+            raise ValueError('At least one request is required')
+        self.transport = app if hasattr(app, 'connect') \
+            else WSGITransport(app)
+        self.requests = list(requests)
+        self.concurrency = concurrency
+        self.apify = apify
+        self.seed = seed
+
+        cumulative, total = [], 0
+        for spec in self.requests:
+            total += spec.weight
+            cumulative.append(total)
+        self._cumulative, self._total_weight = cumulative, total
+
+    def choose(self, rnd):
+        """Returns the next request of the mix.
+
+        :param rnd: The :class:`random.Random` instance of the thread
+        """
+        index = bisect.bisect_right(self._cumulative,
+                                    rnd.random() * self._total_weight)
+        return self.requests[min(index, len(self.requests) - 1)]
+
+    def run(self, total=None, duration=None, warmup=0):
+        """Sends the requests and returns the :class:`BenchResult`.
+
+        :param total: The number of requests to send
+        :param duration: The number of seconds to send requests for, used if
+            `total` is not passed.
+        :param warmup: The number of requests to send before measurement
+        """
+        if total is None and duration is None:
+            raise ValueError('Either total or duration is required')
+
+        if warmup:
+            self._load(warmup, None)
+
+        stage_timer, previous = None, None
+        if self.apify is not None:
+            previous = self.apify.stage_timer
+            stage_timer = self.apify.stage_timer = StageTimer()
+        try:
+            start = timer()
+            results = self._load(total, duration)
+            elapsed = timer() - start
+        finally:
+            if self.apify is not None:
+                self.apify.stage_timer = previous
+
+        endpoints = {}
+        for result in results:
+            for name, stats in result.items():
+                if name not in endpoints:
+                    endpoints[name] = EndpointStats(name)
+                endpoints[name].merge(stats)
+        stages = stage_timer.report() if stage_timer is not None else None
+        return BenchResult(elapsed, endpoints, stages)
+
+    def _load(self, total, duration):
+        results = [None] * self.concurrency
+        lock = threading.Lock()
+        remaining = [total]
+        deadline = timer() + duration if total is None else None
+
+        def take():
+            if deadline is not None:
+                return timer() < deadline
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker(index):
+            seed = None if self.seed is None else self.seed + index
+            rnd = random.Random(seed)
+            transport = self.transport.connect()
+            stats = results[index] = {}
+            try:
+                while take():
+                    spec = self.choose(rnd)
+                    request = transport.prepare(spec)
+                    endpoint = stats.get(spec.name)
+                    if endpoint is None:
+                        endpoint = stats[spec.name] = EndpointStats(spec.name)
+                    start = timer()
+                    try:
+                        status, size = transport(request)
+                    except Exception:
+                        endpoint.errors += 1
+                        continue
+                    endpoint.latencies.append(timer() - start)
+                    endpoint.statuses[status] += 1
+                    endpoint.bytes += size
+            finally:
+                close = getattr(transport, 'close', None)
+                if close is not None:
+                    close()
+
+        threads = [threading.Thread(target=worker, args=(i,),
+                                    name='flask-apify-bench-%d' % i)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
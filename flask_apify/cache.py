@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.cache
+    ~~~~~~~~~~~~~~~~~
+
+    The HTTP caching of API responses.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+
+
+class CachePolicy(object):
+    """The HTTP cache policy of API route. The ``Cache-Control`` header value
+    is built once on instantiation and set to successful responses of
+    ``GET`` and ``HEAD`` requests which do not set it by themselves::
+
+        @apify.route('/products', cache=CachePolicy(max_age=60, public=True,
+                                                    stale_while_revalidate=30))
+        def products():
+            pass
+
+    :param max_age: The number of seconds the response is fresh for clients.
+    :param s_maxage: The number of seconds the response is fresh for shared
+        caches, e.g. CDN or reverse proxy.
+    :param stale_while_revalidate: The number of seconds the stale response
+        may be served while cache revalidates it in background.
+    :param stale_if_error: The number of seconds the stale response may be
+        served if origin responds with an error.
+    :param public: Whether the response may be stored by shared caches
+        (`True`) or by the client only (`False`). Neither directive is sent
+        if `None`.
+    :param no_cache: Whether cache must revalidate response before reuse.
+    :param no_store: Whether the response must not be stored at all.
+    """
+
+    #: The HTTP methods which responses may be cached
+    methods = frozenset(('GET', 'HEAD'))
+
+    def __init__(self, max_age=None, s_maxage=None,
+                 stale_while_revalidate=None, stale_if_error=None,
+                 public=None, no_cache=False, no_store=False):
+        self.max_age = max_age
+        self.s_maxage = s_maxage
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.public = public
+        self.no_cache = no_cache
+        self.no_store = no_store
+        self.header = self.build_header()
+
+    def build_header(self):
+        """Returns the ``Cache-Control`` header value."""
+        directives = []
+        if self.public is True:
+            directives.append('public')
+        elif self.public is False:
+            directives.append('private')
+        if self.no_cache:
+            directives.append('no-cache')
+        if self.no_store:
+            directives.append('no-store')
+        for name, value in (('max-age', self.max_age),
+                            ('s-maxage', self.s_maxage),
+                            ('stale-while-revalidate',
+                             self.stale_while_revalidate),
+                            ('stale-if-error', self.stale_if_error)):
+            if value is not None:
+                directives.append('%s=%d' % (name, value))
+        return ', '.join(directives)
+
+    def apply(self, response, method):
+        """Set the ``Cache-Control`` header to response if it is cacheable.
+        Returns whether the header has been set.
+
+        :param response: The response object
+        :param method: The request method
+        """
+        if method in self.methods and 200 <= response.status_code < 300 \
+           and 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = self.header
+            return True
+        return False
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.ctx
+    ~~~~~~~~~~~~~~~
+
+    The request-scoped state of API request dispatching.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from flask import (
+    current_app, g, request
+)
+
+from .exc import ApiGatewayTimeout
+from .serializers import get_default_serializer
+from .utils import clock, key, timer
+
+
+class ApiContext(object):
+    """The state of the single API request dispatching.
+
+    Created once per request and passed explicitly through the request
+    pipeline, so neither stage has to resolve the context locals again.
+    The negotiated mimetype and serializer and the request deadline are
+    mirrored onto :data:`flask.g` as ``api_mimetype``, ``api_serializer`` and
+    ``api_deadline`` if ``APIFY_MIRROR_GLOBALS`` config value is set.
+
+    :param apify: The :class:`~flask_apify.Apify` instance
+    :param app: The Flask instance, defaults to the current application
+    :param request: The request object, defaults to the current request
+    :param route: The :class:`~flask_apify.routing.ApiRoute` of the request
+    """
+
+    __slots__ = ('apify', 'app', 'request', 'route', 'mimetype', 'serializer',
+                 'body', 'data', 'headers', 'vary', 'cache_status', 'deadline',
+                 'memory_trace', 'timings', '_stage_start')
+
+    def __init__(self, apify, app=None, request=None, route=None):
+        self.apify = apify
+        self.app = app or current_app._get_current_object()
+        self.request = request or _get_current_request()
+        self.route = route
+
+        # The request body decoded by
+        # :meth:`~flask_apify.Apify.load_request_body`
+        self.body = None
+
+        # The raw request body read by
+        # :meth:`~flask_apify.Apify.read_request_data`, `None` if the body
+        # is read from the request stream
+        self.data = None
+
+        # The mimetype and serializer of the response negotiated by
+        # :func:`~flask_apify.fy.set_best_serializer`
+        self.mimetype = None
+        self.serializer = None
+
+        # The list of extra headers to add to response, see :meth:`add_header`
+        self.headers = None
+
+        # The set of request headers the response depends on, see
+        # :meth:`add_vary`
+        self.vary = None
+
+        # The outcome of caching the response, e.g. ``'cacheable'`` if the
+        # response may be stored by HTTP caches. Reported by access log.
+        self.cache_status = None
+
+        # The :func:`clock` time the request must be processed before, see
+        # :meth:`set_timeout`
+        self.deadline = None
+
+        # The :class:`~flask_apify.memory.MemoryTrace` of the request sampled
+        # by memory profiler
+        self.memory_trace = None
+
+        # The number of seconds spent per request pipeline stage, collected
+        # only if the stage timer is enabled, see :meth:`start_timings`
+        self.timings = None
+        self._stage_start = None
+
+    @property
+    def serializers(self):
+        """The serializer registry."""
+        return self.apify.serializers
+
+    def config_value(self, name):
+        """Returns the extension config value.
+
+        :param name: The config key without prefix
+        """
+        return self.app.config.get(key(name))
+
+    def add_header(self, name, value):
+        """Add the header to the response of the request.
+
+        :param name: The header name
+        :param value: The header value
+        """
+        if self.headers is None:
+            self.headers = []
+        self.headers.append((name, value))
+
+    def add_vary(self, name):
+        """Mark the response as depending on the request header, so it is
+        listed in the ``Vary`` response header.
+
+        :param name: The request header name
+        """
+        if self.vary is None:
+            self.vary = set()
+        self.vary.add(name)
+
+    def set_serializer(self, mimetype, serializer):
+        """Set the response mimetype and serializer.
+
+        :param mimetype: The response mimetype
+        :param serializer: The serializer callable
+        """
+        self.mimetype, self.serializer = mimetype, serializer
+        if self.config_value('mirror_globals'):
+            g.api_mimetype, g.api_serializer = mimetype, serializer
+
+    def set_timeout(self, timeout):
+        """Set the request deadline in `timeout` seconds from now.
+
+        :param timeout: The number of seconds
+        """
+        self.deadline = clock() + timeout
+        if self.config_value('mirror_globals'):
+            g.api_deadline = self.deadline
+
+    def time_left(self):
+        """Returns the number of seconds left until the request deadline or
+        `None` if the request has no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - clock()
+
+    def check_deadline(self):
+        """Raises `ApiGatewayTimeout` error if the request deadline is
+        exceeded.
+        """
+        if self.deadline is not None and clock() >= self.deadline:
+            raise ApiGatewayTimeout()
+
+    def start_timings(self):
+        """Starts to collect the time spent per request pipeline stage into
+        :attr:`timings`.
+        """
+        self.timings = {}
+        self._stage_start = timer()
+
+    def mark(self, stage):
+        """Records the time elapsed since the previous stage ended as the
+        time of the stage.
+
+        :param stage: The name of the request stage ended
+        """
+        now = timer()
+        self.timings[stage] = now - self._stage_start
+        self._stage_start = now
+
+    def end_stage(self, stage, check_deadline=True):
+        """Ends the request pipeline stage: records its time and memory
+        allocations if collected and checks the request deadline.
+
+        :param stage: The name of the request stage ended
+        :param check_deadline: Whether to check the deadline
+        """
+        if self.timings is not None:
+            self.mark(stage)
+        if self.memory_trace is not None:
+            self.memory_trace.snapshot(stage)
+        if check_deadline:
+            self.check_deadline()
+
+    def set_default_serializer(self):
+        """Set the response mimetype and serializer to the default ones.
+        May raise `ApiNotAcceptable` error if nothing registered for the
+        default mimetype.
+        """
+        self.set_serializer(*get_default_serializer(
+            self.serializers, self.config_value('default_mimetype')))
+
+
+def _get_current_request():
+    return request._get_current_object()
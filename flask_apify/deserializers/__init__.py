@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.deserializers
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implements deserializers of the request body for an application API.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from ..exc import (
+    ApiRequestEntityTooLarge, ApiUnsupportedMediaType
+)
+
+
+class Deserializer(object):
+    """Base class for request body deserializers."""
+
+    def __call__(self, stream, charset='utf-8'):
+        """Returns the data decoded from the request body.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        raise NotImplementedError('call method must be overriden '
+                                  'by subclasses')
+
+    def iterate(self, stream, charset='utf-8'):
+        """Returns the iterator over the items decoded from the request body
+        one at a time. Deserializers which do not support incremental decoding
+        raise `ApiUnsupportedMediaType` error.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        raise ApiUnsupportedMediaType()
+
+
+class BoundedStream(object):
+    """Wraps the input stream to raise `ApiRequestEntityTooLarge` error as
+    soon as more than `limit` bytes is read from it. Uses to enforce the
+    body size limit on requests without ``Content-Length`` header.
+
+    :param stream: The input stream.
+    :param limit: The maximum number of bytes allowed to read.
+    """
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.pos = 0
+
+    def _count(self, data):
+        self.pos += len(data)
+        if self.pos > self.limit:
+            raise ApiRequestEntityTooLarge()
+        return data
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            # Read at most one byte over the limit to detect the overflow
+            size = self.limit - self.pos + 1
+        return self._count(self.stream.read(size))
+
+    def readline(self, size=-1):
+        if size is None or size < 0:
+            size = self.limit - self.pos + 1
+        return self._count(self.stream.readline(size))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+
+def get_deserializer(mimetype, deserializers):
+    """Returns deserializer function for the request body mimetype.
+
+    May raise `ApiUnsupportedMediaType` error if nothing registered for the
+    mimetype.
+
+    :param mimetype: The request body mimetype.
+    :param deserializers: The deserializer registry.
+    """
+    try:
+        return deserializers.lookup(mimetype)
+    except KeyError:
+        raise ApiUnsupportedMediaType()
+
+
+# The deserializers are imported on first access, so application which does
+# not use a deserializer does not pay for its import
+_lazy_deserializers = {
+    'from_json': 'flask_apify.deserializers.json:from_json',
+    'from_ndjson': 'flask_apify.deserializers.ndjson:from_ndjson',
+}
+
+
+def __getattr__(name):
+    try:
+        path = _lazy_deserializers[name]
+    except KeyError:
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name))
+    from werkzeug.utils import import_string
+    return import_string(path)
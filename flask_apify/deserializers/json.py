@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.deserializers.json
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The JSON deserializer of the request body.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from __future__ import absolute_import
+
+import codecs
+from json import JSONDecoder
+
+from flask import json
+
+from . import Deserializer
+from ..exc import ApiUnprocessableEntity, ApiUnsupportedMediaType
+
+
+def get_decoder(charset):
+    """Returns the incremental decoder of the text encoding. Raises
+    `ApiUnsupportedMediaType` error if the charset is unknown or is not a
+    text encoding, e.g. ``base64``.
+
+    :param charset: The charset of the request body.
+    """
+    try:
+        info = codecs.lookup(charset)
+    except LookupError:
+        info = None
+    if info is None or not getattr(info, '_is_text_encoding', True):
+        raise ApiUnsupportedMediaType('Unsupported charset "%s".' % charset)
+    return info.incrementaldecoder()
+
+
+class JSONDeserializer(Deserializer):
+    """The JSON deserializer.
+
+    :param chunk_size: The number of bytes to read at once on incremental
+        decoding.
+    """
+
+    def __init__(self, chunk_size=64 * 1024):
+        self.chunk_size = chunk_size
+        self.decoder = JSONDecoder()
+
+    def __call__(self, stream, charset='utf-8'):
+        """Loads data from JSON. Returns `None` if request body is empty.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        data = stream.read()
+        if not data:
+            return None
+        try:
+            return json.loads(data.decode(charset))
+        except (ValueError, LookupError):
+            raise ApiUnprocessableEntity('The request body is not valid JSON.')
+
+    def iterate(self, stream, charset='utf-8'):
+        """Yields the items of the top-level JSON array one at a time, without
+        reading the whole request body into memory.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        decoder = get_decoder(charset)
+        chunks = iter(lambda: stream.read(self.chunk_size), b'')
+        buf, pos, eof = u'', 0, False
+
+        def fill(buf, pos):
+            chunk = next(chunks, None)
+            try:
+                if chunk is None:
+                    return buf[pos:] + decoder.decode(b'', final=True), 0, True
+                return buf[pos:] + decoder.decode(chunk), 0, False
+            except UnicodeDecodeError:
+                raise ApiUnprocessableEntity(
+                    'The request body is not valid %s text.' % charset)
+
+        def skip_whitespace(buf, pos, eof):
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf, pos, eof
+                buf, pos, eof = fill(buf, pos)
+
+        buf, pos, eof = skip_whitespace(buf, pos, eof)
+        if buf[pos:pos + 1] != u'[':
+            raise ApiUnprocessableEntity('The request body is not JSON array.')
+        pos += 1
+
+        first = True
+        while True:
+            buf, pos, eof = skip_whitespace(buf, pos, eof)
+            char = buf[pos:pos + 1]
+            if char == u']':
+                buf, pos, eof = skip_whitespace(buf, pos + 1, eof)
+                if pos < len(buf):
+                    raise ApiUnprocessableEntity(
+                        'The request body is not valid JSON.')
+                return
+            if not first:
+                if char != u',':
+                    raise ApiUnprocessableEntity(
+                        'The request body is not valid JSON.')
+                buf, pos, eof = skip_whitespace(buf, pos + 1, eof)
+
+            # Find the end of item by scanning each character once, the data
+            # read is appended to buffer and the scan resumes where it stopped
+            scanner = ItemScanner()
+            while True:
+                end = scanner.scan(buf, pos, eof)
+                if end is not None:
+                    break
+                if eof:
+                    raise ApiUnprocessableEntity(
+                        'The request body is not valid JSON.')
+                scanned = scanner.offset - pos
+                buf, pos, eof = fill(buf, pos)
+                scanner.offset = pos + scanned
+
+            try:
+                item, end = self.decoder.raw_decode(buf[pos:end])
+            except ValueError:
+                raise ApiUnprocessableEntity(
+                    'The request body is not valid JSON.')
+            yield item
+            pos, first = pos + end, False
+
+
+class ItemScanner(object):
+    """Finds the end of JSON value in the buffer without decoding it. The
+    scan is resumed from :attr:`offset` when more data is read.
+    """
+
+    __slots__ = ('offset', 'depth', 'in_string', 'escape', 'started')
+
+    #: The characters which end the scalar value
+    delimiters = frozenset(u',]} \t\r\n')
+
+    def __init__(self):
+        self.offset = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+
+    def scan(self, buf, pos, eof):
+        """Returns the index after the end of value starting at `pos` or
+        `None` if more data is required.
+
+        :param buf: The buffer
+        :param pos: The position value starts at
+        :param eof: Whether there is no more data
+        """
+        i = pos if self.offset is None else self.offset
+        size = len(buf)
+        while i < size:
+            char = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == u'\\':
+                    self.escape = True
+                elif char == u'"':
+                    self.in_string = False
+                    if not self.depth:
+                        return i + 1
+            elif char == u'"':
+                self.in_string = True
+            elif char in u'[{':
+                self.depth += 1
+            elif char in u']}':
+                if not self.depth:
+                    if not self.started:
+                        return i + 1
+                    return i
+                self.depth -= 1
+                if not self.depth:
+                    return i + 1
+            elif not self.depth and self.started and char in self.delimiters:
+                return i
+            self.started = True
+            i += 1
+        self.offset = i
+        if eof and self.started and not self.depth and not self.in_string:
+            return size
+        return None
+
+
+from_json = JSONDeserializer()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.deserializers.ndjson
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The newline delimited JSON deserializer of the request body.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from flask import json
+
+from . import Deserializer
+from ..exc import ApiUnprocessableEntity
+
+
+class NDJSONDeserializer(Deserializer):
+    """The newline delimited JSON deserializer. Each non-empty line of the
+    request body is decoded as separate JSON document.
+    """
+
+    def __call__(self, stream, charset='utf-8'):
+        """Returns the list of documents decoded from the request body.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        return list(self.iterate(stream, charset))
+
+    def iterate(self, stream, charset='utf-8'):
+        """Yields documents decoded from the request body one line at a time.
+
+        :param stream: The file-like object to read request body from.
+        :param charset: The charset of the request body.
+        """
+        for lineno, line in enumerate(iter(stream.readline, b''), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(charset))
+            except (ValueError, LookupError):
+                raise ApiUnprocessableEntity(
+                    'The line %d of request body is not valid JSON.' % lineno)
+
+
+from_ndjson = NDJSONDeserializer()
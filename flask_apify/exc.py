@@ -59,13 +59,78 @@ class ApiNotAcceptable(ApiError):
     )
 
 
+class ApiConflict(ApiError):
+    """Raise if the request conflicts with the current state of the
+    resource, e.g. the request with the same idempotency key is being
+    processed.
+    """
+    code = 409
+    description = (
+        "The request conflicts with the current state of the resource."
+    )
+
+
+class ApiRequestEntityTooLarge(ApiError):
+    """Raise if the request body is larger than the endpoint may process."""
+    code = 413
+    description = (
+        "The data value transmitted exceeds the capacity limit."
+    )
+
+
+class ApiUnsupportedMediaType(ApiError):
+    """Raise if the request body is in format that application cannot
+    process.
+    """
+    code = 415
+    description = (
+        "The server does not support the media type transmitted in "
+        "the request."
+    )
+
+
 class ApiUnprocessableEntity(ApiError):
-    """Raise if the client send invalid fields in request."""
+    """Raise if the client send invalid fields in request.
+
+    :param description: The error description
+    :param errors: The dictionary of field name to error message
+    """
     code = 422
     description = (
         "The client missed required field or send invalid fields in request."
     )
 
+    def __init__(self, description=None, response=None, errors=None):
+        super(ApiUnprocessableEntity, self).__init__(description, response)
+        self.errors = errors
+
+
+class ApiTooManyRequests(ApiError):
+    """Raise if the client sent too many requests in a given amount of time."""
+    code = 429
+    description = (
+        "This user has exceeded an allotted request count. Try again later."
+    )
+
+
+class ApiServiceUnavailable(ApiError):
+    """Raise if the server is temporarily unable to handle the request, e.g.
+    overloaded.
+    """
+    code = 503
+    description = (
+        "The server is temporarily unable to handle the request. "
+        "Try again later."
+    )
+
+
+class ApiGatewayTimeout(ApiError):
+    """Raise if the request has not been processed before its deadline."""
+    code = 504
+    description = (
+        "The request has not been processed in time. Try again later."
+    )
+
 
 class ApiNotImplemented(ApiError):
     """Raise if the application does not support the action requested by the
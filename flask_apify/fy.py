@@ -8,25 +8,45 @@
 
     :copyright: (c) by Vital Kudzelka
 """
+import gc
+import inspect
+import io
 import logging
+from collections.abc import Iterator
 from functools import wraps
 from itertools import chain
 
 from flask import (
-    current_app, g, request, Blueprint
+    copy_current_request_context, current_app, g, request, url_for, Blueprint
 )
 from werkzeug.local import LocalProxy
 from werkzeug.datastructures import ImmutableDict
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.wsgi import wrap_file
 
 from . import http
+from .ctx import ApiContext
+from .idempotency import (
+    MemoryIdempotencyBackend, StoredResponse, request_fingerprint
+)
+from .memoize import MemoEntry, MemoStore, check_templates, get_tags
+from .ranges import RangeStore
+from .ratelimit import MemoryBackend
+from .registry import MimetypeRegistry, parse_mimetype, quality
+from .response import ApiResponse
+from .routing import ApiRoute, HookFilter, all_routes
 from .utils import (
-    key, unpack_response, self_config_value
+    key, pass_context, timer
 )
 from .exc import (
-    ApiError, ApiNotAcceptable, HTTPException
+    ApiConflict, ApiError, ApiForbidden, ApiGatewayTimeout, ApiNotAcceptable,
+    ApiNotFound, ApiRequestEntityTooLarge, ApiServiceUnavailable,
+    ApiTooManyRequests, ApiUnauthorized, ApiUnprocessableEntity,
+    ApiUnsupportedMediaType, HTTPException
 )
-from .serializers import (
-    get_default_serializer, get_serializer, to_javascript, to_json, to_html
+from .serializers import SerializerRegistry, get_serializer
+from .deserializers import (
+    BoundedStream, get_deserializer
 )
 
 
@@ -36,9 +56,71 @@ default_config = ImmutableDict({
 
     # The name of the jinja template rendered on debug view
     'apidump_template': 'apidump.html',
+
+    # Whether to mirror the negotiated mimetype and serializer onto the
+    # application globals as `g.api_mimetype` and `g.api_serializer`
+    'mirror_globals': True,
+
+    # The maximum size of request body in bytes, unlimited if `None`
+    'max_body_size': None,
+
+    # The number of seconds API request must be processed in, unlimited if
+    # `None`
+    'timeout': None,
 })
 
 
+# The serializer function per mimetype registered by default. Serializers are
+# registered by import path and imported on first use.
+default_serializers = ImmutableDict({
+    'application/json': 'flask_apify.serializers.json:to_json',
+    'application/javascript': 'flask_apify.serializers.jsonp:to_javascript',
+    'application/json-p': 'flask_apify.serializers.jsonp:to_javascript',
+    'text/json-p': 'flask_apify.serializers.jsonp:to_javascript',
+    'application/x-ndjson': 'flask_apify.serializers.ndjson:to_ndjson',
+    'text/event-stream': 'flask_apify.serializers.sse:to_event_stream',
+})
+
+
+# The serializer function per mimetype registered if debug view is enabled
+debug_serializers = ImmutableDict({
+    'text/html': 'flask_apify.serializers.debug:to_html',
+})
+
+
+# The request body deserializer function per mimetype registered by default
+default_deserializers = ImmutableDict({
+    'application/json': 'flask_apify.deserializers.json:from_json',
+    'application/x-ndjson': 'flask_apify.deserializers.ndjson:from_ndjson',
+    'application/ndjson': 'flask_apify.deserializers.ndjson:from_ndjson',
+})
+
+
+# The errors which bodies are serialized ahead by :meth:`Apify.warmup`. These
+# are either raised by extension itself or do not depend on the request.
+static_errors = (
+    ApiUnauthorized,
+    ApiForbidden,
+    ApiNotFound,
+    ApiNotAcceptable,
+    ApiConflict,
+    ApiRequestEntityTooLarge,
+    ApiUnsupportedMediaType,
+    ApiTooManyRequests,
+    ApiServiceUnavailable,
+    ApiGatewayTimeout,
+)
+
+
+# The hook types in order they are applied to the request
+hook_names = ('preprocessor', 'postprocessor', 'finalizer')
+
+
+# The logger of extension is silent until the handler is added
+logger = logging.getLogger('flask-apify')
+logger.addHandler(logging.NullHandler())
+
+
 class Apify(object):
     """The Flask extension to create an API to your application as a ninja.
 
@@ -57,6 +139,9 @@ class Apify(object):
         for handler in app.logger.handlers:
             api.logger.addHandler(handler)
 
+    To keep slow handlers out of the request thread, move them to the
+    background thread with :meth:`start_log_queue`.
+
     :param app: Flask application instance
     :param blueprint_name: A name of the blueprint created, also uses to make a
         URLs via :func:`url_for` calls
@@ -67,29 +152,26 @@ class Apify(object):
         after a view callable done but response object is not exists yet.
     :param finalizer_funcs: A list of functions that should be called after
         response object has been created.
+    :param debug_html: Whether to render responses into the HTML page for
+        clients which accept ``text/html``, to inspect API in a browser.
     """
 
-    # the serializer function per mimetype
-    serializers = {
-        'text/html': to_html,
-        'application/json': to_json,
-        'application/javascript': to_javascript,
-        'application/json-p': to_javascript,
-        'text/json-p': to_javascript,
-    }
+    #: The class of the request-scoped state object created once per API
+    #: request and passed through the request pipeline.
+    context_class = ApiContext
 
     def __init__(self, app=None, blueprint_name='api', url_prefix=None,
                  preprocessor_funcs=None, postprocessor_funcs=None,
-                 finalizer_funcs=None):
+                 finalizer_funcs=None, debug_html=False):
         self.app = app
 
         # A logger instance uses to log errors and exceptions occurred during
         # request dispatching.
-        self.logger = logging.getLogger('flask-apify')
-        class NullHandler(logging.StreamHandler):
-            def emit(*_):
-                pass
-        self.logger.addHandler(NullHandler())
+        self.logger = logger
+
+        # The :class:`~flask_apify.logqueue.LogQueue` started by
+        # :meth:`start_log_queue`
+        self.log_queue = None
 
         # A list of functions that should decorate original view callable. To
         # register a function here, use the :meth:`preprocessor` decorator.
@@ -106,7 +188,79 @@ class Apify(object):
         # decorator.
         self.finalizer_funcs = finalizer_funcs or []
 
-        self.blueprint = create_blueprint(blueprint_name, url_prefix)
+        # All hooks per hook type, e.g. ``'preprocessor'``, as the list of
+        # ``(fn, filter)`` pairs in order of registration. The global hooks
+        # have the filter which matches all routes.
+        self.hooks = dict(
+            (name, [(fn, all_routes) for fn in funcs])
+            for name, funcs in zip(hook_names, self.global_hooks))
+
+        # The list of :class:`~flask_apify.routing.ApiRoute` of registered
+        # view functions
+        self.routes = []
+
+        # The registry of serializer functions per mimetype. Each instance
+        # has its own registry, to register a function here, use the
+        # :meth:`serializer` decorator. The encoders of objects serializers
+        # cannot process natively are registered to its ``encoders``.
+        self.serializers = SerializerRegistry(default_serializers)
+        if debug_html:
+            for mimetype, serializer in debug_serializers.items():
+                self.serializers.register(mimetype, serializer)
+
+        # The registry of request body deserializer functions per mimetype.
+        # To register a function here, use the :meth:`deserializer`
+        # decorator.
+        self.deserializers = MimetypeRegistry(default_deserializers)
+
+        # The storage of token buckets used by routes with rate limit. Replace
+        # it with the backend on top of a shared store to apply limits across
+        # worker processes.
+        self.rate_limit_backend = MemoryBackend()
+
+        # The storage of responses of routes with ``idempotent`` option.
+        # Replace it with the backend on top of a shared store to replay
+        # responses across worker processes.
+        self.idempotency_backend = MemoryIdempotencyBackend()
+
+        # The store of responses of routes with ``memoize`` option, see
+        # :meth:`invalidate`
+        self.memo_store = MemoStore()
+
+        # The store of response bodies of routes with ``ranges`` option
+        self.range_store = RangeStore()
+
+        # The :class:`~flask_apify.accesslog.AccessLog` to record the
+        # dispatched requests to, disabled if `None`
+        self.access_log = None
+
+        # The :class:`~flask_apify.memory.MemoryProfiler` to collect the
+        # memory statistics of requests with, see
+        # :meth:`enable_memory_profiler`
+        self.memory_profiler = None
+
+        # The :class:`~flask_apify.bench.StageTimer` to collect the time
+        # spent per request pipeline stage with, disabled if `None`
+        self.stage_timer = None
+
+        # The :class:`~flask_apify.recorder.RequestRecorder` to record the
+        # sampled requests with, disabled if `None`
+        self.request_recorder = None
+
+        # The :class:`~flask_apify.metrics.SharedMetrics` to count requests
+        # with, see :meth:`enable_metrics`
+        self.metrics = None
+
+        # The :class:`~flask_apify.jobs.JobExecutor` to run the views of
+        # routes with ``job`` option, see :meth:`enable_jobs`
+        self.jobs = None
+
+        # The serialized error bodies per error and response mimetype, see
+        # :meth:`render_error`
+        self._error_bodies = {}
+
+        self.blueprint = create_blueprint(blueprint_name, url_prefix,
+                                          with_templates=debug_html)
 
         if app is not None:
             self.init_app(app)
@@ -133,6 +287,47 @@ class Apify(object):
         app.extensions['apify'] = self
         return self
 
+    def warmup(self, app=None, freeze_gc=False):
+        """Builds everything the extension otherwise builds lazily on the
+        first requests: imports and binds the registered serializers and
+        deserializers, compiles the URL map and serializes the bodies of
+        :data:`static_errors` for each registered mimetype.
+
+        Call it in the master process of pre-forking server after all routes
+        are registered, so worker processes share the result instead of
+        building it again each::
+
+            app.register_blueprint(apify.blueprint)
+            apify.warmup(app, freeze_gc=True)
+
+        :param app: The Flask instance, defaults to the application passed on
+            instantiation or the current application.
+        :param freeze_gc: Whether to move all objects tracked by the garbage
+            collector into the permanent generation, so collections in worker
+            processes do not touch (and copy) the shared memory pages.
+            Supported on Python 3.7+ only.
+        """
+        if app is None:
+            app = self.app or current_app._get_current_object()
+
+        with app.app_context():
+            app.url_map.update()
+
+            for registry in (self.serializers, self.deserializers):
+                for mimetype in registry:
+                    registry.lookup(mimetype)
+
+            for mimetype in self.serializers:
+                serializer = self.serializers.lookup(mimetype)
+                if not getattr(serializer, 'cacheable', True):
+                    continue
+                for error_class in static_errors:
+                    self.render_error(error_class(), mimetype, serializer)
+
+        if freeze_gc and hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+
     def route(self, rule, **options):
         """A decorator that is used to register a view function for a given URL
         rule, same as :meth:`route` in :class:`~flask.Blueprint` object.
@@ -153,7 +348,8 @@ class Apify(object):
 
         :param rule: The URL rule string
         :param options: The options to be forwarded to the
-            underlying :class:`~werkzeug.routing.Rule` object.
+            underlying :class:`~werkzeug.routing.Rule` object, except the
+            extension options listed in :class:`~flask_apify.routing.ApiRoute`.
 
         Example::
 
@@ -162,71 +358,734 @@ class Apify(object):
                 '''Remove todo.'''
                 pass
 
+        The deserialized request body may be passed to the view function as
+        keyword argument::
+
+            @apify.route('/todos', methods=('POST',), body_arg='todo',
+                         max_body_size=4096, schema={'title': str})
+            def addtodo(todo):
+                '''Create new todo.'''
+                pass
+
         """
+        route_options = ApiRoute.pop_options(options)
+
         def wrapper(fn):
             if not hasattr(fn, 'is_api_method'):
-                fn = self.dispatch_api_request(fn)
+                fn = self.dispatch_api_request(fn, **route_options)
                 fn.is_api_method = True
+            elif route_options:
+                fn.api_route.update(**route_options)
+            check_templates(fn.api_route.memoize, rule,
+                            options.get('defaults'))
             self.blueprint.add_url_rule(rule, view_func=fn, **options)
+            fn.api_route.add_rule(rule, options.get('endpoint') or fn.__name__,
+                                  options.get('methods'))
+            self.resolve_hooks(fn.api_route)
+            if fn.api_route.job and self.jobs is None:
+                self.enable_jobs()
             return fn
         return wrapper
 
-    def dispatch_api_request(self, fn):
+    def dispatch_api_request(self, fn, **options):
         """Decorator uses to create a function which does the request
         dispatching. On top of that performs request pre and postprocessing
         as well as exception catching and error handling.
 
         :param fn: The view callable.
+        :param options: The route options, see
+            :class:`~flask_apify.routing.ApiRoute`.
         """
+        route = ApiRoute(fn, **options)
+        self.routes.append(route)
+
         @wraps(fn)
-        @catch_errors(HTTPException, errorhandler=self.handle_http_exception)
-        @catch_errors(ApiError, errorhandler=self.handle_api_exception)
         def wrapper(*args, **kwargs):
-            # Call preprocessor functions
-            func = apply_all(self.preprocessor_funcs, fn)
+            ctx = self.context_class(self, route=route)
+            access_log, profiler = self.access_log, self.memory_profiler
+            stage_timer, recorder = self.stage_timer, self.request_recorder
+            metrics = self.metrics
+            if access_log is None and profiler is None and \
+               stage_timer is None and recorder is None and metrics is None:
+                return self.handle_api_request(ctx, fn, args, kwargs)
+
+            if profiler is not None:
+                ctx.memory_trace = profiler.start(ctx)
+            if stage_timer is not None:
+                ctx.start_timings()
+            sample = recorder.start(ctx) if recorder is not None else None
+            res, start = None, timer()
+            try:
+                res = self.handle_api_request(ctx, fn, args, kwargs)
+            except Exception:
+                # The unhandled error is answered by Flask with ``500
+                # Internal Server Error``, so the request is recorded as such
+                res = ctx.app.response_class(status=500)
+                raise
+            finally:
+                duration = timer() - start
+                if profiler is not None:
+                    profiler.record(ctx, res)
+                if res is not None:
+                    if stage_timer is not None:
+                        stage_timer.record(ctx)
+                    if sample is not None:
+                        recorder.record(sample, res, duration)
+                    if metrics is not None:
+                        metrics.record(ctx, res, duration)
+                    if access_log is not None:
+                        access_log.record(ctx, res, duration)
+            return res
+        wrapper.api_route = route
+        return wrapper
 
-            # Call view callable
-            raw = func(*args, **kwargs)
+    def handle_api_request(self, ctx, fn, args, kwargs):
+        """Runs the request pipeline and returns the response object, the
+        API and HTTP errors are converted to the error responses.
 
-            # Call postprocessor functions
-            raw = apply_all(self.postprocessor_funcs, raw)
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param fn: The view callable
+        :param args: The positional arguments to call view with
+        :param kwargs: The keyword arguments to call view with
+        """
+        try:
+            try:
+                return self.process_api_request(ctx, fn, args, kwargs)
+            except ApiError as exc:
+                return self.handle_api_exception(exc, ctx)
+        except HTTPException as exc:
+            return self.handle_http_exception(exc, ctx)
+
+    def process_api_request(self, ctx, fn, args, kwargs):
+        """Runs the request pipeline for the view callable and returns the
+        response object.
 
-            # Make a response object
-            res = self.make_api_response(raw)
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+            with the route
+        :param fn: The view callable
+        :param args: The positional arguments to call view with
+        :param kwargs: The keyword arguments to call view with
 
-            # Finalize response
-            res = apply_all(self.finalizer_funcs, res)
+        If the request has a deadline, it is checked between the pipeline
+        stages and `ApiGatewayTimeout` error is raised once it is exceeded.
+        The coroutine returned by async view is cancelled on the deadline.
+        """
+        res = self.check_request(ctx)
+        if res is not None:
+            return res
 
+        # Call preprocessor functions
+        preprocessors, postprocessors, finalizers = self.get_hooks(ctx)
+        func = apply_preprocessors(preprocessors, fn, ctx)
+        ctx.end_stage('preprocess')
+
+        if ctx.route.idempotent:
+            return self.process_idempotent_request(
+                ctx, func, args, kwargs, postprocessors, finalizers)
+        return self.process_view(ctx, func, args, kwargs, postprocessors,
+                                 finalizers)
+
+    def process_idempotent_request(self, ctx, func, args, kwargs,
+                                   postprocessors, finalizers):
+        """Returns the response stored for the request ``Idempotency-Key``
+        by :attr:`idempotency_backend` or processes the request and stores
+        its response. Raises `ApiUnprocessableEntity` error if the key is
+        reused with another request body.
+
+        The successful responses are stored only, so the retried request is
+        processed again after an error. The streamed responses are not
+        stored as well.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param func: The view callable decorated by preprocessors
+        :param args: The positional arguments to call view with
+        :param kwargs: The keyword arguments to call view with
+        :param postprocessors: The postprocessors of the request
+        :param finalizers: The finalizers of the request
+        """
+        backend = self.idempotency_backend
+        key = backend.key_func(ctx)
+        if key is None:
+            return self.process_view(ctx, func, args, kwargs, postprocessors,
+                                     finalizers)
+
+        fingerprint = request_fingerprint(self.read_request_data(ctx))
+        stored = backend.acquire(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                raise ApiUnprocessableEntity(
+                    'The Idempotency-Key is already used for the request '
+                    'with another body.')
+            ctx.cache_status = 'replay'
+            res = ctx.app.response_class(stored.body, status=stored.status,
+                                         headers=stored.headers)
+            res.headers['Idempotent-Replayed'] = 'true'
             return res
-        return wrapper
 
-    def make_api_response(self, raw):
+        try:
+            res = self.process_view(ctx, func, args, kwargs, postprocessors,
+                                    finalizers)
+        except BaseException:
+            backend.release(key)
+            raise
+
+        if res.is_streamed or not http.status.is_success(res.status_code):
+            backend.release(key)
+        else:
+            backend.complete(key, StoredResponse(
+                res.status_code, list(res.headers), res.get_data(),
+                fingerprint))
+        return res
+
+    def process_view(self, ctx, func, args, kwargs, postprocessors,
+                     finalizers):
+        """Calls the view decorated by preprocessors and returns the
+        response object, the stages of the request pipeline follow the
+        preprocessors.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param func: The view callable decorated by preprocessors
+        :param args: The positional arguments to call view with
+        :param kwargs: The keyword arguments to call view with
+        :param postprocessors: The postprocessors of the request
+        :param finalizers: The finalizers of the request
+        """
+        # Serve the memoized response or the stored range
+        res, memo = self.serve_stored_response(ctx)
+        if res is not None:
+            return apply_all(finalizers, res)
+
+        self.prepare_view_args(ctx, kwargs)
+        ctx.end_stage('body')
+
+        # Run the view in background and respond with the job accepted
+        if ctx.route.job:
+            raw = self.submit_job(ctx, func, args, kwargs, postprocessors)
+            return apply_all(finalizers, self.make_api_response(raw, ctx))
+
+        # Call view callable
+        raw = func(*args, **kwargs)
+        if inspect.iscoroutine(raw):
+            raw = run_coroutine(raw, ctx.time_left())
+        ctx.end_stage('view')
+
+        # Call postprocessor functions
+        raw = apply_all(postprocessors, raw)
+        ctx.end_stage('postprocess')
+
+        # Make a response object
+        res = self.make_api_response(raw, ctx)
+        res = self.store_response(res, ctx, memo)
+        ctx.end_stage('serialize', check_deadline=False)
+
+        # Finalize response
+        res = apply_all(finalizers, res)
+        ctx.end_stage('finalize', check_deadline=False)
+        return res
+
+    def check_request(self, ctx):
+        """Sets the request deadline and checks the route rate limit. Returns
+        the error response if the request is rejected or `None`.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        route = ctx.route
+        timeout = route.timeout
+        if timeout is None:
+            timeout = ctx.config_value('timeout')
+        if timeout is not None:
+            ctx.set_timeout(timeout)
+
+        # Reject the request over the rate limit before doing anything else
+        if route.rate_limit is not None:
+            return self.check_rate_limit(ctx)
+        return None
+
+    def serve_stored_response(self, ctx):
+        """Returns the ``(response, memo)`` pair, the response is either the
+        memoized one or the requested range of the stored body, or `None`.
+        The memo is passed to :meth:`store_response` to memoize the response
+        created, `None` if the response is not memoized.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        route, memo = ctx.route, None
+        if route.memoize is not None and \
+           ctx.request.method in ('GET', 'HEAD'):
+            memo_key = self.memo_store.key_func(ctx)
+            entry = self.memo_store.get(memo_key)
+            if entry is not None:
+                ctx.cache_status = 'hit'
+                res = ctx.app.response_class(entry.body, status=entry.status,
+                                             mimetype=entry.mimetype)
+                return self.update_response(res, ctx), None
+            memo = (memo_key, self.memo_store.generation)
+
+        # Serve the client which resumes download from the stored body
+        if route.ranges:
+            res = self.serve_stored_range(ctx)
+            if res is not None:
+                return res, None
+        return None, memo
+
+    def prepare_view_args(self, ctx, kwargs):
+        """Adds the keyword arguments the route passes to view: the request
+        body and the id of the last event received by client.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param kwargs: The keyword arguments to call view with
+        """
+        route = ctx.route
+        if route.has_body:
+            body = self.load_request_body(ctx)
+            if route.body_arg is not None:
+                kwargs[route.body_arg] = body
+
+        # Pass the id of the last event received by client to resume stream
+        if route.last_event_id_arg is not None:
+            kwargs[route.last_event_id_arg] = \
+                ctx.request.headers.get('Last-Event-ID')
+
+    def store_response(self, res, ctx, memo):
+        """Memoizes the response and stores its body to serve ranges of it
+        if the route asks for. Returns the response object.
+
+        :param res: The response object
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param memo: The memo returned by :meth:`serve_stored_response`
+        """
+        if memo is not None:
+            self.memoize_response(res, ctx, *memo)
+        if ctx.route.ranges:
+            res = self.store_range_body(res, ctx)
+        return res
+
+    def get_hooks(self, ctx):
+        """Returns the ``(preprocessors, postprocessors, finalizers)`` to
+        apply to the request.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        route = ctx.route
+        if route is not None:
+            if route.hooks is not None:
+                hooks = route.hooks.get(ctx.request.method)
+                if hooks is not None:
+                    return hooks
+            if not route.global_hooks:
+                return ((set_best_serializer,), (), ())
+        return self.global_hooks
+
+    @property
+    def global_hooks(self):
+        """The ``(preprocessors, postprocessors, finalizers)`` lists of the
+        hooks applied to all routes.
+        """
+        return (self.preprocessor_funcs, self.postprocessor_funcs,
+                self.finalizer_funcs)
+
+    def resolve_hooks(self, route=None):
+        """Resolves the hooks of the route per request method, so the hook
+        filters are not matched on each request. The route which has no
+        scoped hooks and uses the global ones refers to the global lists.
+
+        Called on route and hook registration. Call it after modifying the
+        hook lists directly.
+
+        :param route: The :class:`~flask_apify.routing.ApiRoute`, all
+            registered routes if omitted.
+        """
+        if route is None:
+            for route in self.routes:
+                self.resolve_hooks(route)
+            return
+
+        hooks = [self.merge_hooks(name, funcs)
+                 for name, funcs in zip(hook_names, self.global_hooks)]
+        methods = route.methods
+        if route.global_hooks and not any(
+                not hook_filter.is_global and
+                hook_filter.matches(route, method)
+                for entries in hooks
+                for _, hook_filter in entries
+                for method in methods):
+            route.hooks = None
+            return
+
+        route.hooks = {}
+        for method in methods:
+            resolved = tuple(
+                tuple(fn for fn, hook_filter in entries
+                      if (route.global_hooks if hook_filter.is_global
+                          else hook_filter.matches(route, method)))
+                for entries in hooks)
+            if not route.global_hooks:
+                resolved = ((set_best_serializer,) + resolved[0],) + \
+                    resolved[1:]
+            route.hooks[method] = resolved
+
+    def merge_hooks(self, name, funcs):
+        """Returns the ``(fn, filter)`` pairs of the hook type in order of
+        registration. The global hooks are taken from the list passed, so the
+        hooks added to the list directly follow the registered hooks which
+        precede them in the list.
+
+        :param name: The hook type
+        :param funcs: The list of global hooks of the type
+        """
+        merged, start = [], 0
+        for fn, hook_filter in self.hooks[name]:
+            if not hook_filter.is_global:
+                merged.append((fn, hook_filter))
+                continue
+            try:
+                end = funcs.index(fn, start) + 1
+            except ValueError:
+                continue  # removed from the list directly
+            merged.extend((func, all_routes) for func in funcs[start:end])
+            start = end
+        merged.extend((func, all_routes) for func in funcs[start:])
+        self.hooks[name] = merged
+        return merged
+
+    def add_hook(self, name, fn, endpoints=None, methods=None, rules=None):
+        """Register the hook. The hook is applied to all routes unless the
+        filters are passed, see :class:`~flask_apify.routing.HookFilter`.
+        The hooks are applied in order of registration, the global and the
+        scoped ones alike.
+
+        :param name: The hook type, either ``'preprocessor'``,
+            ``'postprocessor'`` or ``'finalizer'``.
+        :param fn: The hook function
+        :param endpoints: The endpoint names to apply hook to
+        :param methods: The HTTP methods to apply hook to
+        :param rules: The URL rule strings to apply hook to
+        """
+        funcs = getattr(self, name + '_funcs')
+        hooks = self.merge_hooks(name, funcs)
+        hook_filter = HookFilter(endpoints, methods, rules)
+        if hook_filter.is_global:
+            funcs.append(fn)
+            hook_filter = all_routes
+        hooks.append((fn, hook_filter))
+        self.resolve_hooks()
+
+    def submit_job(self, ctx, fn, args, kwargs, postprocessors):
+        """Submits the view call to :attr:`jobs` and returns the
+        :class:`~flask_apify.response.ApiResponse` with the job status.
+
+        The view and the postprocessors are called in the copy of the request
+        context. The errors other than `ApiError` are logged and stored as
+        the internal server error.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param fn: The view callable decorated by preprocessors
+        :param args: The positional arguments to call view with
+        :param kwargs: The keyword arguments to call view with
+        :param postprocessors: The postprocessors to apply to view result
+        """
+        @copy_current_request_context
+        def run():
+            try:
+                raw = fn(*args, **kwargs)
+                if inspect.iscoroutine(raw):
+                    raw = run_coroutine(raw)
+                return ApiResponse.from_raw(apply_all(postprocessors, raw))
+            except ApiError:
+                raise
+            except Exception as exc:
+                self.log_exception(exc)
+                raise ApiError()
+
+        job = self.jobs.submit(run, ctx.request.endpoint)
+        location = url_for(self.blueprint.name + '.job_status', job_id=job.id)
+        return ApiResponse(job.as_dict(), 202, {'Location': location})
+
+    def job_status(self, job_id):
+        """Returns the status of the background job, the view of the job
+        status route.
+
+        :param job_id: The job id
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ApiNotFound()
+        status = job.as_dict()
+        if job.status == 'done':
+            status['result'] = url_for(self.blueprint.name + '.job_result',
+                                       job_id=job_id)
+        return status
+
+    def job_result(self, job_id):
+        """Returns the result of the background job, the view of the job
+        result route. Returns the job status with ``202`` status code if the
+        job is not finished yet, and raises the job error if it is failed.
+
+        :param job_id: The job id
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ApiNotFound()
+        if job.status == 'failed':
+            exc = ApiError(job.error)
+            exc.code, exc.errors = job.error_code, job.errors
+            raise exc
+        if job.status != 'done':
+            return job.as_dict(), 202
+        res = job.response
+        if isinstance(res.payload, current_app.response_class):
+            return res.payload
+        return res
+
+    def check_rate_limit(self, ctx):
+        """Takes a token from the bucket of the request identity. Returns the
+        rate limit error response if request is not allowed, or `None` and
+        adds the rate limit headers to the response otherwise.
+
+        The error body is rendered by :meth:`render_error`, so it is
+        serialized once per mimetype and reused for all rejected requests.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        limit = ctx.route.rate_limit
+        key = limit.get_key(ctx)
+        if key is None:
+            return None
+
+        state = self.rate_limit_backend.consume(key, limit.rate,
+                                                limit.capacity)
+        headers = limit.headers(state)
+        if state.allowed:
+            for name, value in headers:
+                ctx.add_header(name, value)
+            return None
+
+        try:
+            set_best_serializer(None, ctx)
+        except ApiNotAcceptable:
+            pass
+        body = self.render_error(ApiTooManyRequests(), ctx.mimetype,
+                                 ctx.serializer)
+        res = ctx.app.response_class(body, status=ApiTooManyRequests.code,
+                                     headers=headers, mimetype=ctx.mimetype)
+        return self.update_response(res, ctx)
+
+    def memoize_response(self, res, ctx, key, generation):
+        """Stores the successful response to :attr:`memo_store` with the
+        tags of the route ``memoize`` option. The headers set by view are not
+        stored.
+
+        :param res: The response object
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param key: The entry key
+        :param generation: The store generation read before the view call
+        """
+        if res.status_code != 200 or res.is_streamed:
+            return
+        entry = MemoEntry(res.get_data(), res.status_code, ctx.mimetype,
+                          get_tags(ctx.route.memoize, ctx))
+        if self.memo_store.put(key, entry, generation):
+            ctx.cache_status = 'miss'
+
+    def invalidate(self, *tags):
+        """Evicts the memoized responses which depend on any of tags, see
+        :mod:`flask_apify.memoize`. Returns the number of evicted responses.
+
+        :param tags: The tags invalidated
+        """
+        return self.memo_store.invalidate(*tags)
+
+    def serve_stored_range(self, ctx):
+        """Returns the partial response from the body stored by
+        :attr:`range_store` if the request has ``Range`` header and
+        ``If-Range`` header matches the ETag of stored body, or `None`.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        request = ctx.request
+        if request.method not in ('GET', 'HEAD') or request.range is None:
+            return None
+        etag = request.if_range.etag
+        if etag is None:
+            return None
+
+        store = self.range_store
+        stored = store.get(store.key_func(ctx))
+        if stored is None or stored.etag != etag:
+            return None
+
+        res = ctx.app.response_class(wrap_file(request.environ, stored.open()),
+                                     mimetype=stored.mimetype,
+                                     direct_passthrough=True)
+        return self.update_response(self.make_range_response(res, stored, ctx),
+                                    ctx)
+
+    def store_range_body(self, res, ctx):
+        """Stores the body of successful response to :attr:`range_store`
+        and makes the response conditional to the request, e.g. returns the
+        requested part of body.
+
+        :param res: The response object
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if ctx.request.method not in ('GET', 'HEAD') \
+           or res.status_code != 200 or res.is_streamed:
+            return res
+
+        store = self.range_store
+        etag, _ = res.get_etag()
+        stored = store.put(store.key_func(ctx), res.get_data(), ctx.mimetype,
+                           etag=etag)
+        return self.make_range_response(res, stored, ctx)
+
+    def make_range_response(self, res, stored, ctx):
+        """Sets the ETag of stored body to response and makes it conditional
+        to the request. Raises `RequestedRangeNotSatisfiable` if the request
+        range is invalid.
+
+        :param res: The response object with the stored body
+        :param stored: The :class:`~flask_apify.ranges.StoredBody`
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        res.set_etag(stored.etag)
+        try:
+            res.make_conditional(ctx.request, accept_ranges=True,
+                                 complete_length=stored.size)
+        except RequestedRangeNotSatisfiable:
+            ctx.add_header('Content-Range', 'bytes */%d' % stored.size)
+            raise
+        return res
+
+    def load_request_body(self, ctx):
+        """Returns the request body decoded by deserializer registered for
+        the request mimetype.
+
+        The body size is checked against the route limit before reading
+        and the request stream is bounded by the same limit if the client
+        does not send ``Content-Length``. Raises `ApiRequestEntityTooLarge`
+        if body is too large and `ApiUnsupportedMediaType` if there is no
+        deserializer for the request mimetype. If route has the schema, then
+        body is validated by the route validator.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        request, route = ctx.request, ctx.route
+        deserializer = get_deserializer(request.mimetype, self.deserializers)
+        stream = self.request_stream(ctx)
+
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        validator = route.validator
+        if route.body_stream:
+            body = deserializer.iterate(stream, charset)
+            if validator is not None:
+                body = validator.iterate(body)
+        else:
+            body = deserializer(stream, charset)
+            if validator is not None:
+                body = validator(body)
+        ctx.body = body
+        return body
+
+    def request_stream(self, ctx):
+        """Returns the request body stream bounded by the route limit, or
+        the buffer of the body if it is already read by
+        :meth:`read_request_data`. Raises `ApiRequestEntityTooLarge` if the
+        ``Content-Length`` exceeds the limit.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if ctx.data is not None:
+            return io.BytesIO(ctx.data)
+
+        request = ctx.request
+        limit = ctx.route.max_body_size
+        if limit is None:
+            limit = ctx.config_value('max_body_size')
+
+        stream = request.stream
+        if limit is not None:
+            length = request.content_length
+            if length is not None and length > limit:
+                raise ApiRequestEntityTooLarge()
+            stream = BoundedStream(stream, limit)
+        return stream
+
+    def read_request_data(self, ctx):
+        """Reads the whole request body bounded by the route limit and keeps
+        it in the context, so the body is loaded from the buffer later.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if ctx.data is None:
+            ctx.data = self.request_stream(ctx).read()
+        return ctx.data
+
+    def make_api_response(self, raw, ctx=None):
         """Creates the response object from value returned by a view callable.
 
-        The `raw` may be a tuple in the form ``(raw, status_code, headers)``
-        or ``(raw, status_code)``.
+        The `raw` may be the :class:`~flask_apify.response.ApiResponse` or a
+        tuple in the form ``(raw, status_code, headers)`` or
+        ``(raw, status_code)``.
 
         :param raw: The raw data from view callable.
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request,
+            if omitted the serializer is taken from the application globals.
         """
-        response_class = current_app.response_class
+        if ctx is None:
+            ctx = self.context_class(self)
+            ctx.mimetype = g.get('api_mimetype')
+            ctx.serializer = g.get('api_serializer')
+
+        response_class = ctx.app.response_class
 
         # If view function or postprocessor creates a valid response object
         # then no need to create it again, just return what we've got.
         if isinstance(raw, response_class):
-            return raw
-
-        payload, code, headers = unpack_response(raw)
-        payload, mimetype = g.api_serializer(payload), g.api_mimetype
-
-        res = response_class(payload, headers=headers, mimetype=mimetype)
-        res.status_code = code
+            return self.update_response(raw, ctx)
+
+        # The error occurs before the serializer has been negotiated
+        if ctx.serializer is None:
+            ctx.set_default_serializer()
+
+        raw = ApiResponse.from_raw(raw)
+        payload = raw.payload
+        if isinstance(payload, Iterator) and \
+           not getattr(ctx.serializer, 'streaming', False):
+            # The serializer does not stream, pass it all items at once
+            payload = list(payload)
+        payload, mimetype = ctx.serializer(payload), ctx.mimetype
+
+        res = response_class(payload, headers=raw._headers, mimetype=mimetype)
+        res.status_code = raw.status
+        serializer_headers = getattr(ctx.serializer, 'headers', None)
+        if serializer_headers:
+            res.headers.extend(serializer_headers)
+        return self.update_response(res, ctx)
+
+    def update_response(self, res, ctx):
+        """Adds the headers collected during request processing to response:
+        extra headers, ``Vary`` and ``Cache-Control`` of the route cache
+        policy.
+
+        :param res: The response object
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if ctx.headers:
+            res.headers.extend(ctx.headers)
+        if ctx.vary:
+            res.vary.update(ctx.vary)
+        route = ctx.route
+        if route is not None and route.cache is not None \
+           and route.cache.apply(res, ctx.request.method):
+            ctx.cache_status = 'cacheable'
         return res
 
-    def handle_api_exception(self, exc):
+    def handle_api_exception(self, exc, ctx=None):
         """Handles an API exception. By default this returns the exception as
         response object.
 
         :param exc: The exception raised
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
         """
         # Force set status code of the exception to 500 if exception
         # does not provides that value explicitly. This also set exception
@@ -236,17 +1095,59 @@ class Apify(object):
         if status_code is None:
             exc.code = status_code = 500
 
-        payload = {
-            'error': exc.name,
-            'message': exc.description,
-        }
-
         self.log_exception(exc)
-        return self.make_api_response((payload, status_code))
+
+        errors = getattr(exc, 'errors', None)
+        if errors or ctx is None:
+            payload = {
+                'error': exc.name,
+                'message': exc.description,
+            }
+            if errors:
+                payload['errors'] = errors
+            return self.make_api_response((payload, status_code), ctx)
+
+        # The error occurs before the serializer has been negotiated
+        if ctx.serializer is None:
+            ctx.set_default_serializer()
+
+        body = self.render_error(exc, ctx.mimetype, ctx.serializer)
+        res = ctx.app.response_class(body, status=status_code,
+                                     mimetype=ctx.mimetype)
+        return self.update_response(res, ctx)
 
     handle_http_exception = handle_api_exception
     """Handles an HTTP exception. Alias to :meth:`handle_api_exception`."""
 
+    def render_error(self, exc, mimetype, serializer):
+        """Returns the body of error response serialized by serializer.
+
+        The body is serialized once per error and mimetype and reused for
+        the following responses, unless the serializer is not cacheable or
+        the error description is passed on instantiation, e.g. includes the
+        request details.
+
+        :param exc: The exception to render
+        :param mimetype: The response mimetype
+        :param serializer: The serializer callable for mimetype
+        """
+        cacheable = getattr(serializer, 'cacheable', True) \
+            and 'description' not in vars(exc)
+        if cacheable:
+            cache_key = (exc.code, exc.name, exc.description, mimetype)
+            try:
+                return self._error_bodies[cache_key]
+            except KeyError:
+                pass
+
+        body = serializer({
+            'error': exc.name,
+            'message': exc.description,
+        })
+        if cacheable:
+            self._error_bodies[cache_key] = body
+        return body
+
     def log_exception(self, exc_info):
         """Logs an exception to the configured :attr:`logger` instance.
         If exception is a server error or does not contain status code
@@ -260,10 +1161,124 @@ class Apify(object):
         else:
             logger_func = self.logger.info
 
-        logger_func('Exception on %s %s' % (
-            request.method,
-            request.path
-        ), exc_info=exc_info)
+        logger_func('Exception on %s %s', request.method, request.path,
+                    exc_info=exc_info)
+
+    def enable_memory_profiler(self, sample_rate=0.01, max_samples=32,
+                               rule=None):
+        """Starts collecting the memory statistics of API requests per
+        endpoint: the histogram of response body sizes of all requests and the
+        memory allocations per request pipeline stage traced by
+        :mod:`tracemalloc` for the sampled requests.
+
+        The report is served by the API route added to the blueprint if the
+        rule is given, so call it before the blueprint is registered. Open the
+        route in a browser with ``debug_html`` enabled to inspect the report.
+
+        The report exposes the endpoints and the source lines of the
+        application, so the route must be protected by the preprocessor
+        applied to the ``memory_report`` endpoint, e.g. ``login_required``.
+
+        :param sample_rate: The fraction of requests to trace, from 0 to 1.
+        :param max_samples: The maximum number of traces kept per endpoint.
+        :param rule: The URL rule of the report route, e.g.
+            ``'/_debug/memory'``, no route is added if `None`.
+        """
+        from .memory import MemoryProfiler
+
+        self.memory_profiler = MemoryProfiler(sample_rate=sample_rate,
+                                              max_samples=max_samples)
+        if rule is not None:
+            self.route(rule, endpoint='memory_report')(
+                self.memory_profiler.report)
+        return self.memory_profiler
+
+    def enable_metrics(self, path=None, max_endpoints=256, max_workers=64,
+                       rule=None):
+        """Starts counting API requests per endpoint in the memory-mapped
+        file shared by the worker processes, see :mod:`flask_apify.metrics`.
+
+        Call it before the workers are forked. The report is served by the
+        API route added to the blueprint if the rule is given, so call it
+        before the blueprint is registered as well.
+
+        The report exposes the endpoints and the traffic of the application,
+        so the route must be protected by the preprocessor applied to the
+        ``metrics_report`` endpoint, e.g. ``login_required``.
+
+        :param path: The file path, the temporary file is created if `None`.
+        :param max_endpoints: The maximum number of endpoints counted.
+        :param max_workers: The maximum number of worker processes.
+        :param rule: The URL rule of the report route, e.g.
+            ``'/_debug/metrics'``, no route is added if `None`.
+        """
+        from .metrics import SharedMetrics
+
+        self.metrics = SharedMetrics(path, max_endpoints=max_endpoints,
+                                     max_workers=max_workers)
+        if rule is not None:
+            self.route(rule, endpoint='metrics_report')(self.metrics.report)
+        return self.metrics
+
+    def enable_jobs(self, max_workers=4, max_pending=64, max_results=1024,
+                    ttl=60 * 60, rule='/jobs'):
+        """Starts the executor of the views of routes with ``job`` option and
+        adds the job status and result routes to the blueprint, see
+        :mod:`flask_apify.jobs`.
+
+        Called with the default arguments on registration of the first route
+        with ``job`` option, call it before to configure the executor. Raises
+        `RuntimeError` if the jobs are already enabled.
+
+        :param max_workers: The number of background threads.
+        :param max_pending: The maximum number of jobs waiting or running,
+            the requests over the limit are rejected with ``503`` status.
+        :param max_results: The maximum number of finished jobs kept.
+        :param ttl: The number of seconds the finished job is kept for.
+        :param rule: The URL rule prefix of the job routes.
+        """
+        from .jobs import JobExecutor
+
+        if self.jobs is not None:
+            raise RuntimeError('The jobs are already enabled, call '
+                               'enable_jobs before the routes with job '
+                               'option are registered')
+        self.jobs = JobExecutor(max_workers=max_workers,
+                                max_pending=max_pending,
+                                max_results=max_results, ttl=ttl)
+        self.route(rule + '/<job_id>', endpoint='job_status')(self.job_status)
+        self.route(rule + '/<job_id>/result', endpoint='job_result')(
+            self.job_result)
+        return self.jobs
+
+    def start_log_queue(self, maxsize=1024):
+        """Starts emitting the records of :attr:`logger` in the background
+        thread. The request thread only puts the record into the bounded
+        queue, if the queue is full the record is dropped and counted in
+        ``log_queue.dropped``. Call :meth:`stop_log_queue` to flush the queue
+        on shutdown.
+
+        Add handlers to the logger before the call. The thread does not
+        survive the fork, so call it in the worker process. Returns the queue
+        already started by the instance, raises `RuntimeError` if the queue
+        of another instance is started for the same logger, e.g. the default
+        one all instances share.
+
+        :param maxsize: The maximum number of records waiting in the queue
+        """
+        from .logqueue import LogQueue
+
+        if self.log_queue is None:
+            self.log_queue = LogQueue(self.logger, maxsize=maxsize).start()
+        return self.log_queue
+
+    def stop_log_queue(self):
+        """Emits the queued log records, stops the background thread and
+        restores the logger handlers.
+        """
+        if self.log_queue is not None:
+            self.log_queue.stop()
+            self.log_queue = None
 
     def serializer(self, mimetype):
         """Register decorated function as serializer for specific mimetype.
@@ -280,14 +1295,39 @@ class Apify(object):
         :param fn: The serializer callable
         """
         def wrapper(fn):
-            self.serializers[mimetype] = fn
+            self.serializers.register(mimetype, fn)
+            return fn
+        return wrapper
+
+    def deserializer(self, mimetype):
+        """Register decorated function as request body deserializer for
+        specific mimetype.
+
+        Deserializer is a callable which accept the file-like object to read
+        request body from and the body charset and returns decoded data::
+
+            @apify.deserializer('application/xml')
+            def from_xml(stream, charset='utf-8'):
+                '''Converts xml to data.'''
+                return stream.read().decode(charset)
+
+        Deserializer may provide the `iterate` method with the same signature
+        which returns iterator over the decoded items to support routes with
+        ``body_stream`` option.
+
+        :param mimetype: The mimetype to register function as a data
+            deserializer.
+        """
+        def wrapper(fn):
+            self.deserializers.register(mimetype, fn)
             return fn
         return wrapper
 
-    def preprocessor(self, fn=None):
+    def preprocessor(self, fn=None, **filters):
         """Register a function to decorate original view function.
 
         :param fn: A view decorator
+        :param filters: The route filters, see :meth:`add_hook`
 
         Example::
 
@@ -295,40 +1335,49 @@ class Apify(object):
             def login_required(fn):
                 raise ApiUnauthorized()
 
+        The hook may be applied to the specific routes only::
+
+            @apify.preprocessor(endpoints=('addtodo', 'rmtodo'))
+            def login_required(fn):
+                raise ApiUnauthorized()
+
         """
         def decorator(fn):
-            self.preprocessor_funcs.append(fn)
+            self.add_hook('preprocessor', fn, **filters)
             return fn
         if fn is None:
             return decorator
         return decorator(fn)
 
-    def postprocessor(self, fn=None):
+    def postprocessor(self, fn=None, **filters):
         """Register a function as request postprocessor.
 
         :param fn: A request postprocessor function.
+        :param filters: The route filters, see :meth:`add_hook`
 
         Postprocessor function must carefully process incoming data, e.g view
         callable may returns optional status code and headers dictionary::
 
             @apify.postprocessor
             def modify_view_result(raw):
-                raw, code, headers = unpack_response(raw)
-                return raw, code, headers
+                res = ApiResponse.from_raw(raw)
+                res.headers['X-Version'] = '1'
+                return res
 
         """
         def decorator(fn):
-            self.postprocessor_funcs.append(fn)
+            self.add_hook('postprocessor', fn, **filters)
             return fn
         if fn is None:
             return decorator
         return decorator(fn)
 
-    def finalizer(self, fn=None):
+    def finalizer(self, fn=None, **filters):
         """Register a function to run after :class:`~flask.Response` object is
         created.
 
         :param fn: A function to register
+        :param filters: The route filters, see :meth:`add_hook`
 
         Each of finalizer function has access to result
         :class:`~flask.Response` object ready to return to endpoint user.
@@ -340,7 +1389,7 @@ class Apify(object):
 
         """
         def decorator(fn):
-            self.finalizer_funcs.append(fn)
+            self.add_hook('finalizer', fn, **filters)
             return fn
         if fn is None:
             return decorator
@@ -351,9 +1400,6 @@ def catch_errors(errors, errorhandler):
     """The decorator to catch errors raised inside the decorated function and
     pass them to specified error handler.
 
-    Uses in :meth:`route` of :class:`Apify` object to produce nice output for
-    view errors and exceptions.
-
     :param errors: The errors to catch up
     :param errorhandler: The function which handles the error if occurs
     :param fn: The view function to decorate
@@ -396,51 +1442,103 @@ def apply_all(funcs, arg):
     return arg
 
 
-def create_blueprint(name, url_prefix):
+def apply_preprocessors(funcs, fn, ctx):
+    """Returns the view function decorated by all preprocessors. The same as
+    :func:`apply_all`, but passes the request context as the second argument
+    to preprocessors marked by :func:`~flask_apify.utils.pass_context`.
+
+    :param funcs: The list of preprocessor functions
+    :param fn: The view function to decorate
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    for func in funcs:
+        if getattr(func, 'pass_context', False):
+            fn = func(fn, ctx)
+        else:
+            fn = func(fn)
+    return fn
+
+
+def run_coroutine(coro, timeout=None):
+    """Runs the coroutine returned by async view in the new event loop and
+    returns its result. Cancels the coroutine and raises `ApiGatewayTimeout`
+    error if it is not done in `timeout` seconds.
+
+    :param coro: The coroutine object
+    :param timeout: The number of seconds, unlimited if `None`
+    """
+    import asyncio
+
+    if timeout is not None and timeout <= 0:
+        coro.close()
+        raise ApiGatewayTimeout()
+    try:
+        return asyncio.run(asyncio.wait_for(coro, timeout))
+    except asyncio.TimeoutError:
+        raise ApiGatewayTimeout()
+
+
+def create_blueprint(name, url_prefix, with_templates=True):
     """Creates an API blueprint, but does not register it to any specific
     application.
 
     :param name: The blueprint name
     :param url_prefix: The url prefix to mount blueprint.
+    :param with_templates: Whether to add the extension templates to the
+        application template search path.
     """
+    template_folder = 'templates' if with_templates else None
     return Blueprint(name, __name__, url_prefix=url_prefix,
-                     template_folder='templates')
+                     template_folder=template_folder)
 
 
-def set_best_serializer(fn):
+@pass_context
+def set_best_serializer(fn, ctx=None):
     """Set the best possible serializer and mimetype for response to the
-    application globals according with the request accept header.
+    request context according with the request accept header.
 
     Reraise on `ApiNotAcceptable` error.
 
     :param fn: A view function to decorate
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request,
+        created for the current request if omitted.
     """
+    if ctx is None:
+        ctx = ApiContext(_apify._get_current_object())
     try:
-        g.api_mimetype, g.api_serializer = get_serializer(guess_best_mimetype())
+        ctx.set_serializer(*get_serializer(guess_best_mimetype(ctx),
+                                           ctx.serializers))
     except ApiNotAcceptable as exc:
-        g.api_mimetype, g.api_serializer = get_default_serializer()
+        ctx.set_default_serializer()
         raise exc
     return fn
 
 
-def guess_best_mimetype():
+def guess_best_mimetype(ctx=None):
     """Returns the best mimetype that client may accept. If client may receive
     any mimetype then returns the default one.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request,
+        created for the current request if omitted.
     """
-    def _normalize(x):
-        x = x.lower()
-        return ('*', '*') if x == '*' else x.split('/', 1)
+    if ctx is None:
+        ctx = ApiContext(_apify._get_current_object())
 
-    def_mimetype = self_config_value('default_mimetype')
-    def_type, def_subtype = _normalize(def_mimetype)
+    def_mimetype = ctx.config_value('default_mimetype')
+    def_type, def_subtype = parse_mimetype(def_mimetype)
 
-    for value in request.accept_mimetypes.values():
-        value_type, value_subtype = _normalize(value)
+    ctx.add_vary('Accept')
+    accept = ctx.request.accept_mimetypes
+    for value in accept.values():
+        value_type, value_subtype = parse_mimetype(value)
         if (value_type == value_subtype == '*') or \
            (value_type == def_type and value_subtype == '*' ):
-            return def_mimetype
+            # Unless the client excludes it explicitly
+            if quality(accept, def_mimetype) > 0:
+                return def_mimetype
+            break
 
-    return request.accept_mimetypes.best_match(_apify.serializers.keys())
+    return ctx.serializers.index.best_match(accept)
 
 
 _apify = LocalProxy(lambda: current_app.extensions['apify'])
@@ -14,6 +14,10 @@
 class status(object):
     """Contains descriptive functions to work with HTTP status codes."""
 
+    @staticmethod
+    def is_success(code):
+        return 200 <= code <= 299
+
     @staticmethod
     def is_server_error(code):
         return 500 <= code <= 599
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.idempotency
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    The replay of responses to the retried requests with the same
+    ``Idempotency-Key`` header.
+
+    The successful response of the route with ``idempotent`` option is
+    stored per key and returned to the following requests with the same key
+    without calling the view again. The request with the key which is being
+    processed waits for the response of the first one::
+
+        @apify.route('/orders', methods=('POST',), idempotent=True)
+        def create_order():
+            pass
+
+    The stored response is looked up after the route rate limit and
+    preprocessors, so the retried request is authorized again. The key is
+    scoped by the client identity, and the key reused with another request
+    body is rejected with ``422 Unprocessable Entity``.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .exc import ApiConflict
+from .utils import clock
+
+
+def client_identity(ctx):
+    """Returns the identity of the client: the hash of ``Authorization``
+    header if the request has one, or the client address.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    request = ctx.request
+    credentials = request.headers.get('Authorization')
+    if credentials:
+        return hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+    return request.remote_addr
+
+
+def request_key(ctx):
+    """Returns the storage key of the request with ``Idempotency-Key``
+    header or `None`. The key is scoped by the client identity, the request
+    method and path.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    request = ctx.request
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    return '%s %s %s:%s' % (client_identity(ctx), request.method,
+                            request.path, key)
+
+
+def request_fingerprint(data):
+    """Returns the hash of the request body.
+
+    :param data: The raw request body
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class StoredResponse(object):
+    """The response stored per idempotency key.
+
+    :param status: The response status code
+    :param headers: The list of response headers
+    :param body: The serialized response body
+    :param fingerprint: The hash of the request body
+    """
+
+    __slots__ = ('status', 'headers', 'body', 'fingerprint')
+
+    def __init__(self, status, headers, body, fingerprint=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fingerprint = fingerprint
+
+
+class IdempotencyBackend(object):
+    """Base class for storages of responses per idempotency key.
+
+    To share the responses between worker processes implement the methods on
+    top of the shared store and pass the backend instance to
+    :attr:`~flask_apify.Apify.idempotency_backend`.
+    """
+
+    #: The function which accepts the request
+    #: :class:`~flask_apify.ctx.ApiContext` and returns the idempotency key
+    #: or `None`, replace it to identify clients by the authenticated user
+    key_func = staticmethod(request_key)
+
+    def acquire(self, key):
+        """Returns the :class:`StoredResponse` for key, or `None` if there is
+        no response and the key is acquired by the caller to process the
+        request. Waits while the request with the same key is being processed
+        by another caller.
+
+        Raises `ApiConflict` error if the other request is not done in time.
+
+        :param key: The idempotency key
+        """
+        raise NotImplementedError('acquire method must be overriden '
+                                  'by subclasses')
+
+    def complete(self, key, response):
+        """Stores the response for key acquired by the caller.
+
+        :param key: The idempotency key
+        :param response: The :class:`StoredResponse`
+        """
+        raise NotImplementedError('complete method must be overriden '
+                                  'by subclasses')
+
+    def release(self, key):
+        """Releases the key acquired by the caller without response, so the
+        following request with the key is processed again.
+
+        :param key: The idempotency key
+        """
+        raise NotImplementedError('release method must be overriden '
+                                  'by subclasses')
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """The in-process storage of responses.
+
+    :param max_keys: The maximum number of responses kept, the least recently
+        used responses are evicted when exceeded.
+    :param ttl: The number of seconds the response is kept for.
+    :param wait_timeout: The number of seconds to wait for the request with
+        the same key being processed.
+    :param clock: The function returns the current time in seconds.
+    :param key_func: The function which accepts the request
+        :class:`~flask_apify.ctx.ApiContext` and returns the idempotency key
+        or `None`.
+    """
+
+    def __init__(self, max_keys=4096, ttl=24 * 60 * 60, wait_timeout=30.0,
+                 clock=clock, key_func=request_key):
+        self.key_func = key_func
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        self._responses = OrderedDict()
+        self._in_flight = set()
+        self._cond = threading.Condition()
+
+    def acquire(self, key):
+        deadline = self.clock() + self.wait_timeout
+        with self._cond:
+            while True:
+                now = self.clock()
+                try:
+                    response, expires = self._responses[key]
+                except KeyError:
+                    pass
+                else:
+                    if expires > now:
+                        self._responses.move_to_end(key)
+                        return response
+                    del self._responses[key]
+
+                if key not in self._in_flight:
+                    self._in_flight.add(key)
+                    return None
+
+                if now >= deadline:
+                    raise ApiConflict()
+                self._cond.wait(deadline - now)
+
+    def complete(self, key, response):
+        with self._cond:
+            self._in_flight.discard(key)
+            self._responses.pop(key, None)
+            self._responses[key] = (response, self.clock() + self.ttl)
+            while len(self._responses) > self.max_keys:
+                self._responses.popitem(last=False)
+            self._cond.notify_all()
+
+    def release(self, key):
+        with self._cond:
+            self._in_flight.discard(key)
+            self._cond.notify_all()
+
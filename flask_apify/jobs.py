@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.jobs
+    ~~~~~~~~~~~~~~~~
+
+    The background execution of long-running API requests.
+
+    The view of the route with ``job`` option is called by the bounded pool
+    of background threads. The request is answered immediately with ``202
+    Accepted`` and the URL of job status, the result is served by the result
+    route with the serializer negotiated for the polling request::
+
+        @apify.route('/reports', methods=('POST',), body_arg='params',
+                     job=True)
+        def build_report(params):
+            pass
+
+    The requests over the limit of pending jobs are rejected with ``503
+    Service Unavailable``. The finished jobs are kept for the limited time
+    and the number of them is bounded, the oldest ones are evicted first.
+
+    Note that the job id is the only credential to access the job result, and
+    the jobs are kept in the memory of the process which accepted them, so
+    the status should be polled from the same process, e.g. by the sticky
+    sessions of load balancer.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .exc import ApiServiceUnavailable
+
+
+class Job(object):
+    """The state of the background job. The error of failed job is kept as
+    its status code, description and field errors rather than the exception
+    instance, so the fresh error is raised for each request of the result.
+
+    :param id: The job id
+    :param endpoint: The endpoint name of the request
+    :param created: The timestamp the job is accepted at
+    """
+
+    __slots__ = ('id', 'endpoint', 'status', 'response', 'error',
+                 'error_code', 'errors', 'created', 'finished')
+
+    def __init__(self, id, endpoint=None, created=None):
+        self.id = id
+        self.endpoint = endpoint
+        self.status = 'pending'
+        self.response = None
+        self.error = None
+        self.error_code = None
+        self.errors = None
+        self.created = created
+        self.finished = None
+
+    @property
+    def done(self):
+        """Whether the job is finished either successfully or not."""
+        return self.status in ('done', 'failed')
+
+    def as_dict(self):
+        """Returns the job status as dictionary."""
+        status = {
+            'id': self.id,
+            'status': self.status,
+            'created': self.created,
+            'finished': self.finished,
+        }
+        if self.status == 'failed':
+            status['error'] = self.error
+        return status
+
+
+class JobExecutor(object):
+    """Runs the jobs by the bounded pool of background threads and keeps the
+    results of finished jobs.
+
+    :param max_workers: The number of background threads.
+    :param max_pending: The maximum number of jobs waiting or running, the
+        new jobs are rejected when exceeded.
+    :param max_results: The maximum number of finished jobs kept.
+    :param ttl: The number of seconds the finished job is kept for.
+    :param clock: The function returns the current time in seconds.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, max_results=1024,
+                 ttl=60 * 60, clock=time.time):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.ttl = ttl
+        self.clock = clock
+        self.pending = 0
+        self._jobs = OrderedDict()
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, fn, endpoint=None):
+        """Returns the :class:`Job` to run the function in background. Raises
+        `ApiServiceUnavailable` error if there are too many pending jobs.
+
+        The function must return the :class:`~flask_apify.response.ApiResponse`
+        or raise `ApiError`.
+
+        :param fn: The function to call without arguments
+        :param endpoint: The endpoint name of the request
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ApiServiceUnavailable()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix='flask-apify-job')
+            job = Job(uuid.uuid4().hex, endpoint, round(self.clock(), 3))
+            self._jobs[job.id] = job
+            self.pending += 1
+        try:
+            self._executor.submit(self.run, job, fn)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+                del self._jobs[job.id]
+            raise
+        return job
+
+    def run(self, job, fn):
+        job.status = 'running'
+        try:
+            job.response = fn()
+            job.status = 'done'
+        except Exception as exc:
+            job.error = getattr(exc, 'description', None)
+            job.error_code = getattr(exc, 'code', None) or 500
+            job.errors = getattr(exc, 'errors', None)
+            job.status = 'failed'
+        finally:
+            with self._lock:
+                job.finished = round(self.clock(), 3)
+                self.pending -= 1
+                self._finished[job.id] = job
+                self._expire()
+
+    def get(self, job_id):
+        """Returns the :class:`Job` or `None` if there is no such job or it is
+        expired.
+
+        :param job_id: The job id
+        """
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        deadline = self.clock() - self.ttl
+        finished = self._finished
+        while finished:
+            job = next(iter(finished.values()))
+            if len(finished) <= self.max_results and job.finished > deadline:
+                break
+            finished.popitem(last=False)
+            self._jobs.pop(job.id, None)
+
+    def shutdown(self, wait=True):
+        """Stops the background threads.
+
+        :param wait: Whether to wait for the pending jobs
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.logqueue
+    ~~~~~~~~~~~~~~~~~~~~
+
+    The non-blocking logging of API errors.
+
+    The request thread puts the log record into the bounded queue and returns,
+    the record is formatted and emitted by the logger handlers in the
+    background thread. If the queue is full the record is dropped and counted
+    instead of blocking the request.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+
+class BoundedQueueHandler(QueueHandler):
+    """The handler which puts log records into the bounded queue without
+    blocking. Counts the records dropped because the queue is full per level
+    name in :attr:`dropped`.
+
+    :param queue: The queue to put records into
+    """
+
+    def __init__(self, queue):
+        QueueHandler.__init__(self, queue)
+        self.dropped = Counter()
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        """Returns the record to put into the queue. Only the message is
+        merged with its arguments, the traceback is formatted by the listener
+        handlers.
+
+        :param record: The log record
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped[record.levelname] += 1
+
+
+class BlockingSentinelListener(QueueListener):
+    """The queue listener which waits for the free slot in the bounded queue
+    to put the stop sentinel into.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class LogQueue(object):
+    """Moves handlers of the logger to the background thread::
+
+        api = Apify(app)
+        api.logger.addHandler(StreamHandler())
+        api.start_log_queue(maxsize=1024)
+
+    The thread does not survive the fork, so start the queue in each worker
+    process of pre-forking server.
+
+    :param logger: The logger instance
+    :param maxsize: The maximum number of records waiting in the queue
+    """
+
+    def __init__(self, logger, maxsize=1024):
+        self.logger = logger
+        self.queue = queue.Queue(maxsize)
+        self.handler = BoundedQueueHandler(self.queue)
+        self.handlers = []
+        self.listener = None
+
+    @property
+    def dropped(self):
+        """The number of records dropped per level name."""
+        return self.handler.dropped
+
+    def start(self):
+        """Replaces the logger handlers with the queue handler and starts the
+        background thread which emits the queued records by them. Raises
+        `RuntimeError` if the other queue is already started for the logger.
+        """
+        if self.listener is not None:
+            return self
+        if any(isinstance(h, BoundedQueueHandler)
+               for h in self.logger.handlers):
+            raise RuntimeError('The log queue is already started for logger '
+                               '"%s"' % self.logger.name)
+        self.handlers = [h for h in self.logger.handlers
+                         if not isinstance(h, logging.NullHandler)]
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(self.handler)
+
+        self.listener = BlockingSentinelListener(self.queue, *self.handlers,
+                                                 respect_handler_level=True)
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """Emits the queued records, stops the background thread and restores
+        the logger handlers.
+        """
+        if self.listener is None:
+            return
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        self.listener = None
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.memoize
+    ~~~~~~~~~~~~~~~~~~~
+
+    The memoization of API responses invalidated by dependency tags.
+
+    The response of the route with ``memoize`` option is stored with the
+    tags of data it depends on, and served to the following requests until
+    any of its tags is invalidated::
+
+        @apify.route('/users/<int:user_id>/orders',
+                     memoize=('user:{user_id}', 'order:*'))
+        def user_orders(user_id):
+            pass
+
+        @apify.route('/orders/<int:order_id>', methods=('PUT',))
+        def update_order(order_id):
+            apify.invalidate('order:%d' % order_id)
+
+    The tag templates are formatted with the URL arguments of the request,
+    the templates are checked against the URL rule on route registration.
+    The tag in form ``namespace:*`` depends on every tag of the namespace, so
+    the entries tagged by ``order:*`` are evicted by ``order:42`` as well,
+    and invalidation of ``order:*`` evicts all entries tagged by any
+    ``order:`` tag.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import string
+import threading
+from collections import OrderedDict
+
+from werkzeug.routing import Map, Rule
+
+from .ranges import request_key
+
+
+def namespace_of(tag):
+    """Returns the namespace of tag or `None`.
+
+    :param tag: The tag string
+    """
+    namespace, sep, _ = tag.partition(':')
+    return namespace if sep else None
+
+
+def generation_key(tag):
+    """Returns the key of the generation of tag: the namespace of tag or
+    the tag itself if it has no namespace.
+
+    :param tag: The tag string
+    """
+    namespace = namespace_of(tag)
+    return tag if namespace is None else namespace
+
+
+def get_tags(memoize, ctx):
+    """Returns the tags of the request response.
+
+    :param memoize: The route ``memoize`` option, either the sequence of tag
+        templates or the function which accepts the request context and
+        returns the tags.
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    if callable(memoize):
+        return tuple(memoize(ctx))
+    if memoize is True:
+        return ()
+    view_args = ctx.request.view_args or {}
+    return tuple(tag.format(**view_args) for tag in memoize)
+
+
+def check_templates(memoize, rule, defaults=None):
+    """Raises `ValueError` if any tag template refers to the argument which
+    the URL rule does not pass to view.
+
+    :param memoize: The route ``memoize`` option
+    :param rule: The URL rule string
+    :param defaults: The default URL arguments of the rule
+    """
+    if memoize is None or memoize is True or callable(memoize):
+        return
+    url_rule = Rule(rule, defaults=defaults)
+    Map([url_rule])
+    for template in memoize:
+        for _, field, _, _ in string.Formatter().parse(template):
+            if field is None:
+                continue
+            name = field.partition('.')[0].partition('[')[0]
+            if name not in url_rule.arguments:
+                raise ValueError('The tag template %r refers to the argument '
+                                 '%r missing from the URL rule %r'
+                                 % (template, name, rule))
+
+
+class MemoEntry(object):
+    """The memoized response.
+
+    :param body: The serialized response body
+    :param status: The response status code
+    :param mimetype: The response mimetype
+    :param tags: The tags the response depends on
+    """
+
+    __slots__ = ('body', 'status', 'mimetype', 'tags', 'size')
+
+    def __init__(self, body, status, mimetype, tags):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.tags = tags
+        self.size = len(body)
+
+
+class MemoStore(object):
+    """The in-process store of memoized responses.
+
+    Keeps the inverted index of tag to the keys of entries, so invalidation
+    touches only the entries which depend on the tag. The least recently
+    used entries are evicted if the total size of bodies exceeds `max_size`.
+
+    The generation of invalidation is kept per tag namespace, or per tag
+    without namespace, so the entry being computed is discarded by the
+    invalidation of its namespace only.
+
+    :param max_size: The maximum total size of stored bodies in bytes
+    :param key_func: The function which accepts the request
+        :class:`~flask_apify.ctx.ApiContext` and returns the entry key
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024, key_func=request_key):
+        self.max_size = max_size
+        self.key_func = key_func
+        self.size = 0
+        self._entries = OrderedDict()
+        self._index = {}
+        self._namespaces = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+        # Incremented on each invalidation, see :meth:`put`
+        self.generation = 0
+
+    def get(self, key):
+        """Returns the :class:`MemoEntry` or `None`.
+
+        :param key: The entry key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, generation=None):
+        """Stores the entry. Returns whether the entry has been stored.
+
+        The entry computed before an invalidation may be stale, so it is not
+        stored if `generation` is passed and any namespace of the entry tags
+        is invalidated after the :attr:`generation` is read.
+
+        :param key: The entry key
+        :param entry: The :class:`MemoEntry`
+        :param generation: The :attr:`generation` read before the entry
+            computation started
+        """
+        if entry.size > self.max_size:
+            return False
+        with self._lock:
+            if generation is not None and any(
+                    self._generations.get(generation_key(tag), 0) > generation
+                    for tag in entry.tags):
+                return False
+            self._evict(key)
+            self._entries[key] = entry
+            self.size += entry.size
+            for tag in entry.tags:
+                self._index.setdefault(tag, set()).add(key)
+                namespace = namespace_of(tag)
+                if namespace is not None:
+                    self._namespaces.setdefault(namespace, set()).add(tag)
+            while self.size > self.max_size:
+                self._evict(next(iter(self._entries)))
+        return True
+
+    def invalidate(self, *tags):
+        """Evicts the entries which depend on any of tags. Returns the number
+        of entries evicted.
+
+        :param tags: The tags invalidated
+        """
+        evicted = 0
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                self._generations[generation_key(tag)] = self.generation
+                for key in list(self._keys_of(tag)):
+                    evicted += self._evict(key)
+        return evicted
+
+    def _keys_of(self, tag):
+        namespace = namespace_of(tag)
+        if namespace is None:
+            return self._index.get(tag, ())
+
+        keys = set()
+        if tag == namespace + ':*':
+            for tagged in self._namespaces.get(namespace, ()):
+                keys.update(self._index.get(tagged, ()))
+        else:
+            keys.update(self._index.get(tag, ()))
+            keys.update(self._index.get(namespace + ':*', ()))
+        return keys
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        self.size -= entry.size
+        for tag in entry.tags:
+            keys = self._index.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._index[tag]
+                namespace = namespace_of(tag)
+                if namespace is not None:
+                    tags = self._namespaces[namespace]
+                    tags.discard(tag)
+                    if not tags:
+                        del self._namespaces[namespace]
+        return 1
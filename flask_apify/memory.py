@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.memory
+    ~~~~~~~~~~~~~~~~~~
+
+    The per-endpoint memory instrumentation of API requests.
+
+    The size of serialized response body is counted in the histogram for each
+    request. For the sampled fraction of requests the memory allocations are
+    traced by :mod:`tracemalloc` and the difference of snapshots taken at the
+    end of each request pipeline stage is kept in the bounded buffer per
+    endpoint::
+
+        apify.enable_memory_profiler(sample_rate=0.01, rule='/_debug/memory')
+        apify.preprocessor(login_required, endpoints=('memory_report',))
+        app.register_blueprint(apify.blueprint)
+
+    The report is available as the API route if the rule is given, open it in
+    a browser with ``debug_html`` enabled to inspect the report in the debug
+    template. The route is not protected by itself.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+
+class SizeHistogram(object):
+    """The histogram of sizes with power of two buckets."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, size):
+        """Count the size.
+
+        :param size: The size in bytes
+        """
+        self.buckets[size.bit_length()] += 1
+        self.count += 1
+        self.total += size
+        if size > self.max:
+            self.max = size
+
+    def as_dict(self):
+        """Returns the histogram as dictionary, each non-empty bucket is keyed
+        by its upper bound.
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'buckets': dict(('<%d' % (1 << i), n)
+                            for i, n in enumerate(self.buckets) if n),
+        }
+
+
+class MemoryTrace(object):
+    """The memory allocations traced during the single request.
+
+    Tracing is started on instantiation unless it is already running, and
+    stopped by :meth:`stop`. Note that allocations of other threads during
+    the request are traced too.
+
+    :param top: The number of the largest differences kept per stage
+    """
+
+    #: The traces of these files are excluded from snapshots
+    filters = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    )
+
+    def __init__(self, top=10):
+        self.top = top
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.last = self.take_snapshot()
+        self.stages = {}
+
+    def take_snapshot(self):
+        """Returns the snapshot of traced memory blocks."""
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def snapshot(self, stage):
+        """Takes the snapshot and keeps its difference with the previous one
+        as the allocations of the stage.
+
+        :param stage: The name of the request stage ended
+        """
+        snapshot = self.take_snapshot()
+        stats = snapshot.compare_to(self.last, 'lineno')
+        self.stages[stage] = {
+            'size_diff': sum(stat.size_diff for stat in stats),
+            'top': [{
+                'line': str(stat.traceback),
+                'size_diff': stat.size_diff,
+                'count_diff': stat.count_diff,
+            } for stat in stats[:self.top]],
+        }
+        self.last = snapshot
+
+    def stop(self):
+        """Stops tracing if it has been started by trace."""
+        self.last = None
+        if self.started:
+            tracemalloc.stop()
+
+
+class EndpointMemory(object):
+    """The memory statistics of the endpoint.
+
+    :param max_samples: The maximum number of traces kept
+    """
+
+    __slots__ = ('sizes', 'samples')
+
+    def __init__(self, max_samples):
+        self.sizes = SizeHistogram()
+        self.samples = deque(maxlen=max_samples)
+
+
+class MemoryProfiler(object):
+    """Collects the memory statistics of API requests per endpoint.
+
+    :param sample_rate: The fraction of requests to trace memory allocations
+        of, from 0 to 1.
+    :param max_samples: The maximum number of traces kept per endpoint.
+    :param top: The number of the largest allocation differences kept per
+        request stage.
+    """
+
+    def __init__(self, sample_rate=0.01, max_samples=32, top=10):
+        self.sample_rate = sample_rate
+        self.max_samples = max_samples
+        self.top = top
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        # Only one request is traced at a time, so traces do not overlap
+        self._tracing = threading.Lock()
+
+    def start(self, ctx):
+        """Returns the :class:`MemoryTrace` if the request is sampled or
+        `None`.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._tracing.acquire(False):
+            return None
+        try:
+            return MemoryTrace(top=self.top)
+        except Exception:
+            self._tracing.release()
+            raise
+
+    def record(self, ctx, res):
+        """Counts the response body size and keeps the memory trace of the
+        request.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param res: The response object or `None` if request failed
+        """
+        trace = ctx.memory_trace
+        if trace is not None:
+            trace.stop()
+            self._tracing.release()
+
+        size = res.content_length if res is not None else None
+        endpoint = ctx.request.endpoint
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = \
+                    EndpointMemory(self.max_samples)
+            if size is not None:
+                stats.sizes.add(size)
+            if trace is not None:
+                stats.samples.append({
+                    'ts': round(time.time(), 3),
+                    'status': res.status_code if res is not None else None,
+                    'size': size,
+                    'stages': trace.stages,
+                })
+
+    def report(self):
+        """Returns the statistics per endpoint as dictionary."""
+        with self._lock:
+            return dict((endpoint, {
+                'sizes': stats.sizes.as_dict(),
+                'samples': list(stats.samples),
+            }) for endpoint, stats in self.endpoints.items())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.metrics
+    ~~~~~~~~~~~~~~~~~~~
+
+    The request metrics per endpoint shared by the worker processes through
+    the memory-mapped file.
+
+    The file has the fixed layout: the header, the table of endpoint names,
+    the table of worker process ids and the slab of counters per worker. Each
+    worker updates its own slab only, so the counters are incremented without
+    locks between the processes, and the report sums the slabs of all
+    workers::
+
+        apify.enable_metrics('/run/myapp/metrics')
+        app.register_blueprint(apify.blueprint)
+
+    Each counter record of the endpoint consists of the request count, the
+    number of server errors, the total duration in microseconds, the total
+    response size and the histogram of durations.
+
+    The metrics must be enabled before the workers are forked if the file
+    path is omitted, so the workers share the same temporary file. The slab
+    of exited worker is taken over by the new one along with its counters.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import bisect
+import errno
+import mmap
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+#: The file signature, ``APIFYMT1``
+MAGIC = 0x31544d5946495041
+
+#: The version of the file layout
+VERSION = 1
+
+#: The size of the endpoint name slot in bytes
+NAME_SIZE = 64
+
+#: The number of 8-byte words of the file header
+HEADER_WORDS = 8
+
+#: The upper bounds of duration histogram buckets in milliseconds
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+#: The counters of the record preceding the histogram buckets
+FIELDS = ('count', 'errors', 'duration', 'bytes')
+
+
+def is_alive(pid):
+    """Returns whether the process with pid is running.
+
+    :param pid: The process id
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno != errno.ESRCH
+    return True
+
+
+class SharedMetrics(object):
+    """The request metrics stored in the memory-mapped file.
+
+    :param path: The file path, the temporary file is created if `None`.
+    :param max_endpoints: The maximum number of endpoints, the requests to
+        other endpoints are not counted.
+    :param max_workers: The maximum number of worker processes, the requests
+        of other workers are not counted.
+    :param buckets: The upper bounds of duration histogram buckets in
+        milliseconds.
+    :param error_status: The response status code from which the request is
+        counted as error.
+    """
+
+    def __init__(self, path=None, max_endpoints=256, max_workers=64,
+                 buckets=BUCKETS, error_status=500):
+        self.max_endpoints = max_endpoints
+        self.max_workers = max_workers
+        self.buckets = tuple(buckets)
+        self.error_status = error_status
+
+        #: The number of requests not counted as there is no free slot
+        self.dropped = 0
+
+        self.record_words = len(FIELDS) + len(self.buckets) + 1
+        self.names_offset = HEADER_WORDS * 8
+        self.workers_offset = self.names_offset + max_endpoints * NAME_SIZE
+        self.slabs_offset = self.workers_offset + max_workers * 8
+        self.size = self.slabs_offset + \
+            max_workers * max_endpoints * self.record_words * 8
+
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='flask-apify-metrics-')
+        else:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.path = path
+        self._fd = fd
+        self._lock = threading.Lock()
+        self._record_lock = threading.Lock()
+        self._pid = None
+        self._slab = None
+        self._endpoints = {}
+
+        with self.locked():
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+            self._mmap = mmap.mmap(fd, self.size)
+            self._words = memoryview(self._mmap).cast('Q')
+            if tuple(self._words[:5]) != self.header:
+                self._mmap[:] = b'\0' * self.size
+                for i, value in enumerate(self.header):
+                    self._words[i] = value
+
+    @property
+    def header(self):
+        """The expected values of the file header words."""
+        return (MAGIC, VERSION, self.max_endpoints, self.max_workers,
+                len(self.buckets))
+
+    def locked(self):
+        """Returns the context manager which holds the lock of the file
+        between processes and threads. Used on the file setup and slot
+        allocation only.
+        """
+        return _FileLock(self._fd, self._lock)
+
+    def record(self, ctx, res, duration):
+        """Counts the request.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        :param res: The response object
+        :param duration: The request duration in seconds
+        """
+        slab = self._slab if self._pid == os.getpid() else self.claim_slab()
+        index = self._endpoints.get(ctx.request.endpoint)
+        if index is None:
+            index = self.endpoint_index(ctx.request.endpoint)
+        if slab is None or index is None:
+            with self._record_lock:
+                self.dropped += 1
+            return
+
+        words = self._words
+        base = self.slabs_offset // 8 + \
+            (slab * self.max_endpoints + index) * self.record_words
+        error = self.error_status is not None and \
+            res.status_code >= self.error_status
+        bucket = bisect.bisect_left(self.buckets, duration * 1000)
+        # The slab is shared by the threads of the worker
+        with self._record_lock:
+            words[base] += 1
+            if error:
+                words[base + 1] += 1
+            words[base + 2] += int(duration * 1000000)
+            words[base + 3] += res.content_length or 0
+            words[base + len(FIELDS) + bucket] += 1
+
+    def claim_slab(self):
+        """Returns the index of the slab of the current process, the slab of
+        exited worker or free slab is taken. Returns `None` if there is no
+        slab left.
+        """
+        pid = os.getpid()
+        start = self.workers_offset // 8
+        with self.locked():
+            pids = self._words[start:start + self.max_workers].tolist()
+            if pid in pids:
+                slab = pids.index(pid)
+            else:
+                slab = next((i for i, other in enumerate(pids)
+                             if other == 0 or not is_alive(other)), None)
+                if slab is not None:
+                    self._words[start + slab] = pid
+        self._pid, self._slab = pid, slab
+        return slab
+
+    def endpoint_index(self, endpoint):
+        """Returns the index of the endpoint name slot, the free slot is taken
+        for the new endpoint. Returns `None` if there is no slot left.
+
+        :param endpoint: The endpoint name
+        """
+        name = (endpoint or '').encode('utf-8')[:NAME_SIZE].ljust(NAME_SIZE,
+                                                                 b'\0')
+        with self.locked():
+            index = None
+            for i, other in enumerate(self.read_names()):
+                if other == name:
+                    index = i
+                    break
+                if other[0:1] == b'\0':
+                    offset = self.names_offset + i * NAME_SIZE
+                    self._mmap[offset:offset + NAME_SIZE] = name
+                    index = i
+                    break
+        if index is not None:
+            self._endpoints[endpoint] = index
+        return index
+
+    def read_names(self):
+        """Yields the endpoint name slots."""
+        for i in range(self.max_endpoints):
+            offset = self.names_offset + i * NAME_SIZE
+            yield self._mmap[offset:offset + NAME_SIZE]
+
+    def report(self):
+        """Returns the metrics of all workers per endpoint as dictionary, the
+        durations are in milliseconds. The percentiles are estimated by the
+        upper bound of the histogram bucket, `None` is returned if the
+        percentile is in the last bucket.
+        """
+        words = self._words
+        start = self.workers_offset // 8
+        workers = [i for i, pid in enumerate(
+            words[start:start + self.max_workers].tolist()) if pid]
+
+        report = {}
+        for index, name in enumerate(self.read_names()):
+            if name[0:1] == b'\0':
+                break
+            record = [0] * self.record_words
+            for slab in workers:
+                base = self.slabs_offset // 8 + \
+                    (slab * self.max_endpoints + index) * self.record_words
+                values = words[base:base + self.record_words].tolist()
+                record = [a + b for a, b in zip(record, values)]
+            count, errors, duration, size = record[:len(FIELDS)]
+            histogram = record[len(FIELDS):]
+            endpoint = name.rstrip(b'\0').decode('utf-8', 'replace')
+            report[endpoint] = {
+                'count': count,
+                'errors': errors,
+                'bytes': size,
+                'mean': round(duration / 1000.0 / count, 3) if count
+                else None,
+                'p50': self.estimate(histogram, count, 0.5),
+                'p95': self.estimate(histogram, count, 0.95),
+                'p99': self.estimate(histogram, count, 0.99),
+                'buckets': dict(
+                    ('<=%s' % bound if i < len(self.buckets)
+                     else '>%s' % self.buckets[-1], n)
+                    for i, (bound, n) in enumerate(
+                        zip(self.buckets + (None,), histogram)) if n),
+            }
+        return report
+
+    def estimate(self, histogram, count, q):
+        """Returns the upper bound of histogram bucket of the quantile.
+
+        :param histogram: The list of bucket counts
+        :param count: The total count
+        :param q: The quantile from 0 to 1
+        """
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for bound, n in zip(self.buckets, histogram):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def close(self):
+        """Unmaps the file."""
+        self._words.release()
+        self._mmap.close()
+        os.close(self._fd)
+
+
+class _FileLock(object):
+
+    def __init__(self, fd, lock):
+        self.fd = fd
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
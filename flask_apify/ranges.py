@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.ranges
+    ~~~~~~~~~~~~~~~~~~
+
+    The store of serialized response bodies to serve ``Range`` requests of
+    API routes without calling the view again.
+
+    The body of successful response of the route with ``ranges`` option is
+    kept with its ETag. The client which resumes the interrupted download
+    sends ``Range`` and ``If-Range`` headers with that ETag, then the
+    requested part is served from the stored body::
+
+        @apify.route('/export', ranges=True)
+        def export():
+            pass
+
+    Note that stored body is served to any client which passes the route
+    preprocessors, include the client identity into the key with `key_func`
+    if the body differs between clients.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import hashlib
+import io
+import mmap
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def request_key(ctx):
+    """Returns the key of the stored body for the request: the endpoint,
+    the URL arguments, the query string and the response mimetype.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    request = ctx.request
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    return (request.endpoint, view_args, request.query_string, ctx.mimetype)
+
+
+class StoredBody(object):
+    """The serialized response body.
+
+    :param etag: The ETag of the body
+    :param mimetype: The body mimetype
+    :param buffer: The bytes-like object with the body content
+    """
+
+    __slots__ = ('etag', 'mimetype', 'buffer', 'size')
+
+    def __init__(self, etag, mimetype, buffer):
+        self.etag = etag
+        self.mimetype = mimetype
+        self.buffer = buffer
+        self.size = len(buffer)
+
+    def open(self):
+        """Returns the file-like object to read the body from. Each reader
+        has its own position, the content is shared.
+        """
+        return BufferReader(self.buffer)
+
+
+class BufferReader(io.RawIOBase):
+    """The seekable read-only file over the bytes-like object, e.g. memory
+    map, which does not copy the content.
+
+    :param buffer: The bytes-like object to read from
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        io.RawIOBase.close(self)
+
+
+class RangeStore(object):
+    """The in-process store of serialized response bodies.
+
+    The bodies larger than `spool_size` are written to the temporary file and
+    memory-mapped, so the content is kept in page cache rather than in the
+    process heap. The least recently used bodies are evicted if the total
+    size exceeds `max_size`.
+
+    :param max_size: The maximum total size of stored bodies in bytes
+    :param spool_size: The maximum size of body kept in memory in bytes
+    :param key_func: The function which accepts the request
+        :class:`~flask_apify.ctx.ApiContext` and returns the body key
+    """
+
+    def __init__(self, max_size=1024 * 1024 * 1024, spool_size=1024 * 1024,
+                 key_func=request_key):
+        self.max_size = max_size
+        self.spool_size = spool_size
+        self.key_func = key_func
+        self.size = 0
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the :class:`StoredBody` or `None`.
+
+        :param key: The body key
+        """
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key, data, mimetype, etag=None):
+        """Stores the body and returns the :class:`StoredBody`. The body
+        larger than :attr:`max_size` is not stored.
+
+        :param key: The body key
+        :param data: The body content
+        :param mimetype: The body mimetype
+        :param etag: The ETag of body, defaults to the body hash
+        """
+        if etag is None:
+            etag = hashlib.sha1(data).hexdigest()
+        body = StoredBody(etag, mimetype, self.spool(data))
+        if body.size > self.max_size:
+            return body
+
+        with self._lock:
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._bodies[key] = body
+            self.size += body.size
+            while self.size > self.max_size:
+                _, evicted = self._bodies.popitem(last=False)
+                self.size -= evicted.size
+        return body
+
+    def spool(self, data):
+        """Returns the buffer with the body content, the large content is
+        moved to the memory-mapped temporary file.
+
+        :param data: The body content
+        """
+        if len(data) <= self.spool_size:
+            return data
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            # The map stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.ratelimit
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    The token bucket rate limiter for API routes.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import math
+import threading
+from collections import namedtuple
+
+from .utils import clock
+
+
+RateLimitState = namedtuple('RateLimitState',
+                            'allowed limit remaining reset retry_after')
+"""The result of consuming tokens from the bucket.
+
+:param allowed: Whether the request is allowed
+:param limit: The bucket capacity
+:param remaining: The number of whole tokens left in the bucket
+:param reset: The number of seconds until the bucket is full again
+:param retry_after: The number of seconds until request may be allowed, zero
+    if request is allowed
+"""
+
+
+def make_state(allowed, tokens, capacity, rate, cost):
+    """Returns the :class:`RateLimitState` for the bucket content.
+
+    :param allowed: Whether the request is allowed
+    :param tokens: The number of tokens left in the bucket
+    :param capacity: The bucket capacity
+    :param rate: The number of tokens added to the bucket per second
+    :param cost: The number of tokens requested
+    """
+    reset = (capacity - tokens) / rate
+    retry_after = 0 if allowed else (cost - tokens) / rate
+    return RateLimitState(allowed, capacity, int(tokens), reset, retry_after)
+
+
+class RateLimitBackend(object):
+    """Base class for storages of token buckets.
+
+    To share the limits between worker processes implement :meth:`consume`
+    on top of the shared store, e.g. as the script executed atomically by
+    the store, and pass the backend instance to
+    :attr:`~flask_apify.Apify.rate_limit_backend`.
+    """
+
+    def consume(self, key, rate, capacity, cost=1):
+        """Takes `cost` tokens from the bucket and returns the
+        :class:`RateLimitState`. If there are not enough tokens in the bucket
+        nothing is taken and request is not allowed.
+
+        :param key: The bucket key
+        :param rate: The number of tokens added to the bucket per second
+        :param capacity: The maximum number of tokens in the bucket
+        :param cost: The number of tokens to take
+        """
+        raise NotImplementedError('consume method must be overriden '
+                                  'by subclasses')
+
+
+class MemoryBackend(RateLimitBackend):
+    """The in-process storage of token buckets.
+
+    The buckets are split into stripes by key hash, each stripe is guarded by
+    its own lock, so concurrent requests with different keys rarely wait for
+    each other.
+
+    :param stripes: The number of stripes
+    :param max_keys: The maximum number of buckets kept per stripe, the
+        oldest buckets are evicted when exceeded.
+    :param clock: The function returns the current time in seconds.
+    """
+
+    def __init__(self, stripes=16, max_keys=4096, clock=clock):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._buckets = [{} for _ in range(stripes)]
+
+    def consume(self, key, rate, capacity, cost=1):
+        stripe = hash(key) % len(self._locks)
+        buckets = self._buckets[stripe]
+        with self._locks[stripe]:
+            now = self.clock()
+            try:
+                tokens, updated = buckets.pop(key)
+                tokens = min(capacity, tokens + (now - updated) * rate)
+            except KeyError:
+                tokens = capacity
+                if len(buckets) >= self.max_keys:
+                    del buckets[next(iter(buckets))]
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            buckets[key] = (tokens, now)
+
+        return make_state(allowed, tokens, capacity, rate, cost)
+
+
+def remote_addr(ctx):
+    """Returns the client address as the rate limit key.
+
+    :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+    """
+    return ctx.request.remote_addr
+
+
+class RateLimit(object):
+    """The rate limit of API route.
+
+    Allows `rate` requests per `per` seconds for each identity key, with the
+    bursts up to `burst` requests::
+
+        @apify.route('/search', rate_limit=RateLimit(10, per=60))
+        def search():
+            pass
+
+    :param rate: The number of requests allowed per period
+    :param per: The period in seconds
+    :param burst: The maximum number of requests allowed at once, defaults to
+        `rate`
+    :param key_func: The function which accept the request
+        :class:`~flask_apify.ctx.ApiContext` and returns the identity key,
+        the request is not limited if key is `None`. Defaults to the client
+        address.
+    :param scope: The name of the bucket group, the routes with the same
+        scope share the buckets. Defaults to the endpoint name.
+    """
+
+    def __init__(self, rate, per=1.0, burst=None, key_func=remote_addr,
+                 scope=None):
+        self.rate = float(rate) / per
+        self.capacity = burst if burst is not None else rate
+        self.key_func = key_func
+        self.scope = scope
+
+    def get_key(self, ctx):
+        """Returns the bucket key for the request or `None`.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        identity = self.key_func(ctx)
+        if identity is None:
+            return None
+        return '%s:%s' % (self.scope or ctx.request.endpoint, identity)
+
+    def headers(self, state):
+        """Returns the list of rate limit headers to send to client.
+
+        :param state: The :class:`RateLimitState` of the request
+        """
+        headers = [
+            ('RateLimit-Limit', '%d' % state.limit),
+            ('RateLimit-Remaining', '%d' % state.remaining),
+            ('RateLimit-Reset', '%d' % math.ceil(state.reset)),
+        ]
+        if not state.allowed:
+            headers.append(('Retry-After',
+                            '%d' % max(1, math.ceil(state.retry_after))))
+        return headers
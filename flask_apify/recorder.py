@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.recorder
+    ~~~~~~~~~~~~~~~~~~~~
+
+    The recording of sampled API requests to replay them as benchmark load.
+
+    The sampled request is appended to the file as compact JSON line by the
+    background thread: the method, path, query string and the headers which
+    affect the response, the request body if it is small enough, and the
+    response status, size and duration::
+
+        apify.request_recorder = RequestRecorder(open('requests.log', 'a'),
+                                                 sample_rate=0.001)
+
+    The recorded requests are sent to the local application in the same
+    proportions to compare the versions on the production traffic shape::
+
+        with open('requests.log') as f:
+            samples = list(load_samples(f))
+        before = replay(app, samples, concurrency=8)
+
+    Note that the recorded request bodies and headers may contain personal
+    data, do not record the headers with credentials.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import base64
+import io
+import json
+import random
+import time
+
+from .accesslog import JSONLinesWriter
+from .bench import LoadGenerator, RequestSpec
+
+
+class RequestRecorder(object):
+    """Records the sampled API requests.
+
+    :param stream: The file-like object to append lines to.
+    :param sample_rate: The fraction of requests to record, from 0 to 1.
+    :param headers: The names of request headers to record.
+    :param max_body: The maximum size of request body in bytes to record,
+        the size only is recorded for larger bodies.
+    :param maxsize: The maximum number of entries waiting to be written.
+    :param writer: The object with ``write(entry)`` method to write entries
+        with instead of :class:`~flask_apify.accesslog.JSONLinesWriter`.
+    """
+
+    def __init__(self, stream=None, sample_rate=0.01,
+                 headers=('Accept', 'Accept-Encoding', 'Content-Type'),
+                 max_body=64 * 1024, maxsize=4096, writer=None):
+        if writer is None:
+            writer = JSONLinesWriter(stream, maxsize=maxsize)
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.headers = tuple(headers)
+        self.max_body = max_body
+
+    def start(self, ctx):
+        """Returns the entry of the request if it is sampled or `None`.
+
+        The request body is read before the request is processed, so the
+        request stream is replaced with the buffer of the body read.
+
+        :param ctx: The :class:`~flask_apify.ctx.ApiContext` of the request
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+
+        request = ctx.request
+        entry = {
+            'ts': round(time.time(), 3),
+            'e': request.endpoint,
+            'm': request.method,
+            'p': request.path,
+        }
+        if request.query_string:
+            entry['q'] = request.query_string.decode('latin-1')
+        headers = [[name, request.headers[name]] for name in self.headers
+                   if name in request.headers]
+        if headers:
+            entry['h'] = headers
+
+        length = request.content_length
+        if length:
+            entry['n'] = length
+            if length <= self.max_body:
+                data = request.get_data()
+                request.stream = io.BytesIO(data)
+                entry['b'] = base64.b64encode(data).decode('ascii')
+        return entry
+
+    def record(self, entry, res, duration):
+        """Writes the entry of the sampled request with its response.
+
+        :param entry: The value returned by :meth:`start`
+        :param res: The response object
+        :param duration: The request duration in seconds
+        """
+        entry['s'] = res.status_code
+        entry['r'] = res.content_length
+        entry['d'] = round(duration * 1000, 3)
+        self.writer.write(entry)
+
+    def close(self):
+        """Writes the pending entries."""
+        close = getattr(self.writer, 'close', None)
+        if close is not None:
+            close()
+
+
+def load_samples(stream):
+    """Yields the entries recorded by :class:`RequestRecorder`.
+
+    :param stream: The file-like object to read lines from
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def to_request_spec(entry):
+    """Returns the :class:`~flask_apify.bench.RequestSpec` of the recorded
+    request. The request without recorded body is sent with empty body.
+
+    :param entry: The recorded entry
+    """
+    path = entry['p']
+    if entry.get('q'):
+        path = '%s?%s' % (path, entry['q'])
+    data = entry.get('b')
+    if data is not None:
+        data = base64.b64decode(data)
+    return RequestSpec(entry['m'], path, headers=entry.get('h'), data=data,
+                       name=entry.get('e'))
+
+
+def replay(app, samples, concurrency=4, apify=None, total=None, warmup=0,
+           seed=None):
+    """Sends the recorded requests to the application and returns the
+    :class:`~flask_apify.bench.BenchResult`, the results are reported per
+    endpoint.
+
+    :param app: The WSGI application or the transport, see
+        :class:`~flask_apify.bench.LoadGenerator`
+    :param samples: The recorded entries
+    :param concurrency: The number of threads
+    :param apify: The :class:`~flask_apify.Apify` instance to collect the
+        stage timings of
+    :param total: The number of requests to send, defaults to the number of
+        samples.
+    :param warmup: The number of requests to send before measurement
+    :param seed: The seed of the request order
+    """
+    specs = [to_request_spec(entry) for entry in samples]
+    generator = LoadGenerator(app, specs, concurrency=concurrency,
+                              apify=apify, seed=seed)
+    return generator.run(total=total or len(specs), warmup=warmup)
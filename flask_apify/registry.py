@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.registry
+    ~~~~~~~~~~~~~~~~~~~~
+
+    The registry of callables keyed by mimetype and the index used to
+    negotiate the best of them for the request.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+from werkzeug.utils import import_string
+
+
+string_types = (bytes, type(u''))
+
+
+def parse_mimetype(mimetype):
+    """Returns the lowercase ``(type, subtype)`` pair of the mimetype without
+    parameters. The single ``*`` is treated as ``*/*``.
+
+    >>> parse_mimetype('Application/JSON; charset=utf-8')
+    ('application', 'json')
+
+    :param mimetype: The mimetype string
+    """
+    mimetype = mimetype.split(';', 1)[0].strip().lower()
+    if mimetype == '*':
+        return '*', '*'
+    type_, _, subtype = mimetype.partition('/')
+    return type_, subtype
+
+
+def parse_params(mimetype):
+    """Returns the set of lowercase ``(name, value)`` pairs of the mimetype
+    parameters except the quality.
+
+    >>> sorted(parse_params('text/html; Level=1; q=0.5'))
+    [('level', '1')]
+
+    :param mimetype: The mimetype string
+    """
+    params = set()
+    for param in mimetype.split(';')[1:]:
+        name, sep, value = param.partition('=')
+        name = name.strip().lower()
+        if sep and name != 'q':
+            params.add((name, value.strip().strip('"').lower()))
+    return frozenset(params)
+
+
+def parse_ranges(accept):
+    """Returns the list of ``(type, subtype, params, quality)`` of the
+    client accept values.
+
+    :param accept: The iterable of ``(value, quality)`` pairs.
+    """
+    return [parse_mimetype(value) + (parse_params(value), quality)
+            for value, quality in accept]
+
+
+def specificity(type_, subtype, params):
+    """Returns the sortable specificity of the mimetype range, the range
+    with parameters is more specific than the one without, and both are more
+    specific than ``type/*`` and ``*/*``.
+
+    :param type_: The range type
+    :param subtype: The range subtype
+    :param params: The range parameters
+    """
+    return (type_ != '*', subtype != '*', bool(params))
+
+
+def quality(accept, mimetype):
+    """Returns the quality of mimetype set by the most specific client
+    accept value which matches it, or ``0`` if there is no such value. The
+    same as :meth:`~werkzeug.datastructures.MIMEAccept.quality`.
+
+    :param accept: The iterable of ``(value, quality)`` pairs.
+    :param mimetype: The mimetype string
+    """
+    type_, subtype = parse_mimetype(mimetype)
+    params = parse_params(mimetype)
+    best = None
+    for range_type, range_subtype, range_params, q in parse_ranges(accept):
+        if range_type not in ('*', type_) or \
+           range_subtype not in ('*', subtype) or \
+           (range_params and range_params != params):
+            continue
+        rank = (specificity(range_type, range_subtype, range_params), q)
+        if best is None or rank > best:
+            best = rank
+    return best[1] if best is not None else 0
+
+
+class MimetypeIndex(object):
+    """The immutable lookup table built from the registry content.
+
+    Besides the exact mapping of mimetype to callable, contains the parsed
+    type/subtype of each mimetype and the buckets of mimetypes per type to
+    resolve wildcards like ``application/*`` without scanning the whole
+    registry.
+
+    :param mapping: The mapping of mimetype to callable.
+    """
+
+    __slots__ = ('exact', 'parsed', 'params', 'types', 'order', 'mimetypes')
+
+    def __init__(self, mapping):
+        self.exact = dict(mapping)
+        self.mimetypes = tuple(mapping)
+        self.order = dict((m, i) for i, m in enumerate(self.mimetypes))
+        self.parsed = dict((m, parse_mimetype(m)) for m in self.mimetypes)
+        self.params = dict((m, parse_params(m)) for m in self.mimetypes)
+
+        self.types = {}
+        for mimetype in self.mimetypes:
+            type_, _ = self.parsed[mimetype]
+            self.types.setdefault(type_, []).append(mimetype)
+        self.types = dict((k, tuple(v)) for k, v in self.types.items())
+
+    def replace(self, mimetype, fn):
+        """Returns the copy of index with callable for mimetype replaced.
+
+        :param mimetype: The registered mimetype
+        :param fn: The callable
+        """
+        exact = dict(self.exact)
+        exact[mimetype] = fn
+        return MimetypeIndex(exact)
+
+    def candidates(self, type_, subtype):
+        """Returns the registered mimetypes matched by the client mimetype.
+
+        :param type_: The client mimetype type
+        :param subtype: The client mimetype subtype
+        """
+        if type_ == '*':
+            return self.mimetypes if subtype == '*' else ()
+        if subtype == '*':
+            return self.types.get(type_, ())
+        mimetype = type_ + '/' + subtype
+        return (mimetype,) if mimetype in self.exact else ()
+
+    def best_match(self, accept):
+        """Returns the registered mimetype which fits the client accept
+        values best or `None`. The same as
+        :meth:`~werkzeug.datastructures.MIMEAccept.best_match`, but looks up
+        candidates in the index instead of matching every registered
+        mimetype against every accept value.
+
+        The quality of each mimetype is set by the most specific accept value
+        which matches it (RFC 7231, section 5.3.2), so ``application/json;
+        q=0, */*`` excludes JSON. The mimetypes of the same quality are
+        ranked by specificity of the value, then by registration order.
+
+        :param accept: The iterable of ``(value, quality)`` pairs.
+        """
+        matched = {}
+        for type_, subtype, params, q in parse_ranges(accept):
+            rank = (specificity(type_, subtype, params), q)
+            for mimetype in self.candidates(type_, subtype):
+                if params and params != self.params[mimetype]:
+                    continue
+                current = matched.get(mimetype)
+                if current is None or rank > current:
+                    matched[mimetype] = rank
+
+        result, best = None, None
+        for mimetype, (spec, q) in matched.items():
+            if q <= 0:
+                continue
+            rank = (q, spec, -self.order[mimetype])
+            if best is None or rank > best:
+                result, best = mimetype, rank
+        return result
+
+
+class MimetypeRegistry(Mapping):
+    """The read-only mapping of mimetype to the registered callable.
+
+    Each registration rebuilds an immutable :class:`MimetypeIndex` snapshot
+    used on the request path, so readers never see a partially updated
+    state. Registered callables which have a ``bind`` method are notified on
+    every rebuild and may return a bound replacement for the index (the
+    mapping itself always returns the callable as registered).
+
+    The callable may be registered by the import path in form
+    ``module:name``, then it is imported on the first access, e.g. when the
+    client requests the mimetype for the first time.
+
+    :param items: The initial mapping of mimetype to callable.
+    """
+
+    def __init__(self, items=None):
+        self._items = dict(items or {})
+        self.rebuild()
+
+    def __getitem__(self, mimetype):
+        fn = self._items[mimetype]
+        if isinstance(fn, string_types):
+            self.resolve(mimetype)
+            fn = self._items[mimetype]
+        return fn
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self._items)
+
+    def register(self, mimetype, fn):
+        """Register callable for mimetype and rebuild the index.
+
+        :param mimetype: The mimetype to register callable for.
+        :param fn: The callable or its import path
+        """
+        self._items[mimetype] = fn
+        self.rebuild()
+
+    def bind(self, fn):
+        """Returns the callable bound to the registry.
+
+        :param fn: The registered callable
+        """
+        bind = getattr(fn, 'bind', None)
+        bound_fn = bind(self) if bind is not None else None
+        return fn if bound_fn is None else bound_fn
+
+    def rebuild(self):
+        """Rebuild the :attr:`index` from the registry content. The callables
+        registered by import path are left unresolved.
+        """
+        bound = {}
+        for mimetype, fn in list(self._items.items()):
+            if not isinstance(fn, string_types):
+                fn = self.bind(fn)
+            bound[mimetype] = fn
+        self.index = MimetypeIndex(bound)
+
+    def resolve(self, mimetype):
+        """Imports the callable registered by import path and returns it
+        bound to the registry.
+
+        :param mimetype: The registered mimetype
+        """
+        fn = self._items[mimetype]
+        if isinstance(fn, string_types):
+            fn = self._items[mimetype] = import_string(fn)
+        bound_fn = self.bind(fn)
+        self.index = self.index.replace(mimetype, bound_fn)
+        return bound_fn
+
+    def lookup(self, mimetype):
+        """Returns the (bound) callable for mimetype. Raises `KeyError` if
+        nothing registered.
+
+        :param mimetype: The mimetype to look up.
+        """
+        fn = self.index.exact[mimetype]
+        if isinstance(fn, string_types):
+            fn = self.resolve(mimetype)
+        return fn
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.response
+    ~~~~~~~~~~~~~~~~~~~~
+
+    The result of view function passed through the request pipeline.
+
+    The view function and postprocessors may return :class:`ApiResponse`
+    instead of the ``(payload, status, headers)`` tuple, so the result is not
+    unpacked again by each postprocessor and the serializer::
+
+        @apify.route('/todos', methods=('POST',))
+        def addtodo():
+            return ApiResponse({'id': 42}, 201, {'Location': '/todos/42'})
+
+        @apify.postprocessor
+        def add_version(raw):
+            res = ApiResponse.from_raw(raw)
+            res.headers['X-Version'] = '1'
+            return res
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from werkzeug.datastructures import Headers
+
+
+def to_headers(headers):
+    """Returns the headers which support item assignment, the list of
+    ``(key, value)`` pairs is converted to :class:`Headers` to keep the
+    repeated keys. Returns `None` if there are no headers.
+
+    :param headers: The dictionary, :class:`Headers` or the list of pairs
+    """
+    if not headers:
+        return None
+    if isinstance(headers, (list, tuple)):
+        return Headers(headers)
+    return headers
+
+
+class ApiResponse(object):
+    """The raw data returned by view function with the response status code
+    and headers.
+
+    The headers dictionary is allocated on the first access to
+    :attr:`headers`, use :attr:`has_headers` to check for headers without
+    allocation.
+
+    :param payload: The data to serialize
+    :param status: The response status code
+    :param headers: The response headers, the dictionary or the list of
+        ``(key, value)`` pairs.
+    """
+
+    __slots__ = ('payload', 'status', '_headers')
+
+    def __init__(self, payload, status=200, headers=None):
+        self.payload = payload
+        self.status = status
+        self._headers = to_headers(headers)
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Returns the response for the data returned by view function, either
+        the :class:`ApiResponse` itself, the payload, or the tuple in the form
+        ``(payload, status)`` or ``(payload, status, headers)``.
+
+        :param raw: The data returned by view function
+        """
+        if isinstance(raw, cls):
+            return raw
+        if isinstance(raw, tuple):
+            size = len(raw)
+            if size == 2:
+                return cls(raw[0], raw[1])
+            if size == 3:
+                return cls(raw[0], raw[1], raw[2])
+        return cls(raw)
+
+    @property
+    def headers(self):
+        """The response headers, the dictionary or :class:`Headers` if set
+        as the list of pairs."""
+        if self._headers is None:
+            self._headers = {}
+        return self._headers
+
+    @headers.setter
+    def headers(self, headers):
+        self._headers = to_headers(headers)
+
+    @property
+    def has_headers(self):
+        """Whether any response header is set."""
+        return bool(self._headers)
+
+    def __iter__(self):
+        # Allows unpacking in the form ``payload, status, headers = res``
+        yield self.payload
+        yield self.status
+        yield self._headers or {}
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.payload,
+                               self.status)
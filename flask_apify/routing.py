@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.routing
+    ~~~~~~~~~~~~~~~~~~~
+
+    The options of API routes.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from .schema import compile_schema
+
+
+class ApiRoute(object):
+    """The extension options of the view function registered via
+    :meth:`~flask_apify.Apify.route`. Created once on registration and
+    available to each request of the view as
+    :attr:`~flask_apify.ctx.ApiContext.route`.
+
+    :param view_func: The original view callable.
+    :param max_body_size: The maximum size of request body in bytes, defaults
+        to the ``APIFY_MAX_BODY_SIZE`` config value.
+    :param body_arg: The name of keyword argument to pass the deserialized
+        request body to the view with. The body is not processed if omitted.
+    :param body_stream: Whether to pass the request body as iterator over the
+        items decoded one at a time, instead of decoding it entirely.
+    :param schema: The schema to validate request body against, see
+        :mod:`flask_apify.schema`. If body is streamed, then each item is
+        validated separately.
+    :param rate_limit: The :class:`~flask_apify.ratelimit.RateLimit` of the
+        route.
+    :param cache: The :class:`~flask_apify.cache.CachePolicy` of the route.
+    :param ranges: Whether to store the response body to serve ``Range``
+        requests from, see :mod:`flask_apify.ranges`.
+    :param last_event_id_arg: The name of keyword argument to pass the
+        ``Last-Event-ID`` header value to the view with, to resume the
+        stream of server-sent events, see :mod:`flask_apify.serializers.sse`.
+    :param timeout: The number of seconds the request must be processed in,
+        defaults to the ``APIFY_TIMEOUT`` config value.
+    :param idempotent: Whether to replay the response to requests with the
+        same ``Idempotency-Key`` header, see :mod:`flask_apify.idempotency`.
+    :param memoize: The tags of memoized response, see
+        :mod:`flask_apify.memoize`. The response is not memoized if `None`.
+    :param global_hooks: Whether to apply the hooks registered without
+        filters to the route. The response serializer is negotiated anyway.
+    :param job: Whether to run the view in background and respond with the
+        job status URL, see :mod:`flask_apify.jobs`. The streamed request
+        body is not supported.
+    """
+
+    #: The names of route options consumed by extension. The rest of options
+    #: is forwarded to the underlying :class:`~werkzeug.routing.Rule` object.
+    option_names = ('max_body_size', 'body_arg', 'body_stream', 'schema',
+                    'rate_limit', 'cache', 'ranges', 'last_event_id_arg',
+                    'timeout', 'idempotent', 'memoize', 'global_hooks',
+                    'job')
+
+    def __init__(self, view_func, max_body_size=None, body_arg=None,
+                 body_stream=False, schema=None, rate_limit=None, cache=None,
+                 ranges=False, last_event_id_arg=None, timeout=None,
+                 idempotent=False, memoize=None, global_hooks=True,
+                 job=False):
+        self.view_func = view_func
+        self.max_body_size = max_body_size
+        self.body_arg = body_arg
+        self.body_stream = body_stream
+        self.schema = schema
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.ranges = ranges
+        self.last_event_id_arg = last_event_id_arg
+        self.timeout = timeout
+        self.idempotent = idempotent
+        self.memoize = memoize
+        self.global_hooks = global_hooks
+        self.job = job
+
+        # The URL rules the view is registered with, see :meth:`add_rule`
+        self.rules = []
+
+        # The hooks resolved per request method by
+        # :meth:`~flask_apify.Apify.resolve_hooks`, the global hooks are used
+        # if `None`
+        self.hooks = None
+
+    @property
+    def schema(self):
+        """The request body schema. The schema is compiled into
+        :attr:`validator` on assignment.
+        """
+        return self._schema
+
+    @schema.setter
+    def schema(self, schema):
+        self._schema = schema
+        self.validator = compile_schema(schema) if schema is not None \
+            else None
+
+    @property
+    def endpoints(self):
+        """The set of endpoint names of the route."""
+        return set(endpoint for _, endpoint, _ in self.rules)
+
+    @property
+    def methods(self):
+        """The set of HTTP methods of the route."""
+        return set(method for _, _, methods in self.rules
+                   for method in methods)
+
+    def add_rule(self, rule, endpoint, methods=None):
+        """Add the URL rule the view is registered with.
+
+        :param rule: The URL rule string
+        :param endpoint: The endpoint name, without the blueprint name
+        :param methods: The HTTP methods of the rule, defaults to ``GET``
+        """
+        methods = set(m.upper() for m in methods or ('GET',))
+        if 'GET' in methods:
+            methods.add('HEAD')
+        self.rules.append((rule, endpoint, frozenset(methods)))
+
+    @property
+    def has_body(self):
+        """Whether the request body should be processed."""
+        return self.body_arg is not None or self.validator is not None
+
+    def update(self, **options):
+        """Update route options.
+
+        :param options: The options to set.
+        """
+        for name, value in options.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def pop_options(cls, options):
+        """Returns the route options removed from the passed rule options.
+
+        :param options: The options passed to :meth:`~flask_apify.Apify.route`
+        """
+        return dict((name, options.pop(name)) for name in cls.option_names
+                    if name in options)
+
+
+class HookFilter(object):
+    """The filter of routes the hook is applied to. The hook is applied to
+    the route if the route matches all passed criteria. The route matches
+    endpoints and rules if any of its URL rules does, so the hook is applied
+    to all URL rules of the view function.
+
+    :param endpoints: The endpoint names, without the blueprint name.
+    :param methods: The HTTP methods.
+    :param rules: The URL rule strings.
+    """
+
+    def __init__(self, endpoints=None, methods=None, rules=None):
+        self.endpoints = frozenset(endpoints) if endpoints else None
+        self.methods = frozenset(m.upper() for m in methods) if methods \
+            else None
+        self.rules = frozenset(rules) if rules else None
+
+    @property
+    def is_global(self):
+        """Whether the filter matches all routes."""
+        return self.endpoints is None and self.methods is None and \
+            self.rules is None
+
+    def matches(self, route, method):
+        """Returns whether the hook is applied to requests of the route with
+        the method.
+
+        :param route: The :class:`ApiRoute`
+        :param method: The HTTP method
+        """
+        if self.methods is not None and method not in self.methods:
+            return False
+        if self.endpoints is not None and \
+           not self.endpoints.intersection(route.endpoints):
+            return False
+        if self.rules is not None and \
+           not self.rules.intersection(rule for rule, _, _ in route.rules):
+            return False
+        return True
+
+
+#: The filter of global hooks which matches all routes
+all_routes = HookFilter()
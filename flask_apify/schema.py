@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.schema
+    ~~~~~~~~~~~~~~~~~~
+
+    The declarative schema of the request body compiled into validator
+    functions.
+
+    The schema is a dictionary of field name to the field specification,
+    where specification is a Python type, a nested schema dictionary, a list
+    with single item specification or :class:`Field` instance::
+
+        todo_schema = {
+            'title': Field(str, max_length=140),
+            'done': Field(bool, required=False, default=False),
+            'tags': [str],
+            'author': {'name': str},
+        }
+
+    The schema is compiled once by :func:`compile_schema` into the Python
+    source specialized for that schema, so validation does not walk the
+    schema on each request.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import copy
+
+from .exc import ApiUnprocessableEntity
+
+
+text_type = type(u'')
+
+_missing = object()
+
+# The default values of these types are shared between results, other ones
+# are copied for each result
+immutable_types = (type(None), bool, int, float, complex, text_type, bytes,
+                   tuple, frozenset)
+
+
+class Field(object):
+    """The specification of a single field.
+
+    :param type: The Python type of the field value, nested schema
+        dictionary or a list with the specification of list items. Any value
+        is allowed if `None`.
+    :param required: Whether the field must be present.
+    :param nullable: Whether the field value may be `None`.
+    :param default: The value to set if field is missing, or a callable which
+        returns that value. The mutable value is copied for each request.
+    :param choices: The collection of allowed values.
+    :param min: The minimum allowed value.
+    :param max: The maximum allowed value.
+    :param min_length: The minimum allowed length of value.
+    :param max_length: The maximum allowed length of value.
+    """
+
+    def __init__(self, type=None, required=True, nullable=False,
+                 default=_missing, choices=None, min=None, max=None,
+                 min_length=None, max_length=None):
+        self.type = type
+        self.required = required and default is _missing
+        self.nullable = nullable
+        self.default = default
+        self.choices = choices
+        self.min = min
+        self.max = max
+        self.min_length = min_length
+        self.max_length = max_length
+
+
+def to_field(spec):
+    """Returns the :class:`Field` for specification.
+
+    :param spec: The field specification.
+    """
+    return spec if isinstance(spec, Field) else Field(spec)
+
+
+def join_path(path, name):
+    """Returns the path of the nested field.
+
+    :param path: The path of parent field.
+    :param name: The name or index of the nested field.
+    """
+    return '%s.%s' % (path, name) if path else '%s' % name
+
+
+def not_in(value, choices):
+    """Returns whether the value is not one of choices, the unhashable value
+    is not.
+
+    :param value: The value to check.
+    :param choices: The set of allowed values.
+    """
+    try:
+        return value not in choices
+    except TypeError:
+        return True
+
+
+def less_than(value, bound):
+    """Returns whether the value is less than bound, the value which is not
+    comparable with bound is.
+
+    :param value: The value to check.
+    :param bound: The lower bound.
+    """
+    try:
+        return value < bound
+    except TypeError:
+        return True
+
+
+def has_length(value):
+    """Returns whether the value has length.
+
+    :param value: The value to check.
+    """
+    try:
+        len(value)
+    except TypeError:
+        return False
+    return True
+
+
+def greater_than(value, bound):
+    """Returns whether the value is greater than bound, the value which is
+    not comparable with bound is.
+
+    :param value: The value to check.
+    :param bound: The upper bound.
+    """
+    try:
+        return value > bound
+    except TypeError:
+        return True
+
+
+# The type checks and the name of the type used in error messages
+type_checks = {
+    text_type: ('isinstance({0}, _text_type)', 'string'),
+    bytes: ('isinstance({0}, bytes)', 'bytes'),
+    int: ('isinstance({0}, int) and not isinstance({0}, bool)', 'integer'),
+    float: ('isinstance({0}, (int, float)) and not isinstance({0}, bool)',
+            'number'),
+    bool: ('isinstance({0}, bool)', 'boolean'),
+    dict: ('isinstance({0}, dict)', 'object'),
+    list: ('isinstance({0}, list)', 'array'),
+}
+if str is not text_type:  # pragma: no cover
+    type_checks[str] = type_checks[text_type]
+
+
+class SchemaCompiler(object):
+    """Generates the source of validator functions for schema nodes.
+
+    Each object and list node of the schema is compiled into separate
+    function with signature ``(value, path, errors)`` which returns the
+    validated value. Checks of scalar fields are inlined.
+    """
+
+    def __init__(self):
+        self.namespace = {
+            '_missing': _missing,
+            '_join': join_path,
+            '_text_type': text_type,
+            '_not_in': not_in,
+            '_lt': less_than,
+            '_gt': greater_than,
+            '_has_len': has_length,
+            '_copy': copy.copy,
+        }
+        self.sources = []
+        self.counter = 0
+
+    def constant(self, value, prefix='c'):
+        """Returns the name the value is available in generated code by.
+
+        :param value: The value to use in generated code.
+        :param prefix: The name prefix.
+        """
+        self.counter += 1
+        name = '_%s%d' % (prefix, self.counter)
+        self.namespace[name] = value
+        return name
+
+    def compile(self, spec):
+        """Compiles validator function for schema and returns it.
+
+        :param spec: The schema or field specification.
+        """
+        field = to_field(spec)
+        name, _ = self.compile_node(field)
+        if name is None:
+            name = self.compile_scalar(field)
+        source = '\n\n'.join(self.sources)
+        exec(compile(source, '<schema>', 'exec'), self.namespace)
+        return self.namespace[name]
+
+    def compile_node(self, field):
+        """Compiles the function for object or list field type. Returns the
+        function name and whether it may return the new value, or `None` if
+        there is nothing to compile.
+
+        :param field: The :class:`Field` instance.
+        """
+        if isinstance(field.type, dict):
+            return self.compile_object(field.type)
+        if isinstance(field.type, list):
+            return self.compile_list(field.type)
+        return None, False
+
+    def compile_scalar(self, field):
+        name = self.constant(None, 'v')
+        lines = ['def %s(value, path, errors):' % name]
+        self.emit_value(lines, field, 'value', 'path', '    ')
+        lines.append('    return value')
+        self.sources.append('\n'.join(lines))
+        return name
+
+    def compile_object(self, schema):
+        name = self.constant(None, 'v')
+        fields = [(key, to_field(spec)) for key, spec in schema.items()]
+        copy = any(f.default is not _missing for _, f in fields)
+
+        body = []
+        for key, field in fields:
+            key_name = repr(key)
+            path = '_join(path, %s)' % key_name
+            body.append('    item = value.get(%s, _missing)' % key_name)
+            body.append('    if item is _missing:')
+            if field.required:
+                body.append("        errors[%s] = 'Missing required field.'"
+                            % path)
+            elif field.default is not _missing:
+                default = self.constant(field.default)
+                if callable(field.default):
+                    default += '()'
+                elif not isinstance(field.default, immutable_types):
+                    default = '_copy(%s)' % default
+                body.append('        result[%s] = %s' % (key_name, default))
+            else:
+                body.append('        pass')
+            body.append('    else:')
+            transforms = self.emit_value(body, field, 'item', path, '        ')
+            if transforms:
+                copy = True
+                body.append('        result[%s] = item' % key_name)
+
+        lines = [
+            'def %s(value, path, errors):' % name,
+            '    if not isinstance(value, dict):',
+            "        errors[path] = 'Invalid type, expected object.'",
+            '        return value',
+            '    result = dict(value)' if copy else '    result = value',
+        ]
+        lines.extend(body)
+        lines.append('    return result')
+        self.sources.append('\n'.join(lines))
+        return name, copy
+
+    def compile_list(self, spec):
+        if len(spec) != 1:
+            raise ValueError('List schema must contain single item '
+                             'specification, got %r' % (spec,))
+        name = self.constant(None, 'v')
+        body = []
+        transforms = self.emit_value(body, to_field(spec[0]), 'item',
+                                     '_join(path, i)', '        ')
+        lines = [
+            'def %s(value, path, errors):' % name,
+            '    if not isinstance(value, list):',
+            "        errors[path] = 'Invalid type, expected array.'",
+            '        return value',
+        ]
+        if transforms:
+            lines.append('    result = list(value)')
+        lines.append('    for i, item in enumerate(value):')
+        lines.extend(body)
+        if transforms:
+            lines.append('        result[i] = item')
+            lines.append('    return result')
+        else:
+            lines.append('    return value')
+        self.sources.append('\n'.join(lines))
+        return name, transforms
+
+    def emit_value(self, lines, field, var, path, indent):
+        """Emits the checks of the value in place. Returns `True` if the
+        checks may replace the value.
+
+        :param lines: The list of source lines to extend.
+        :param field: The :class:`Field` instance.
+        :param var: The name of variable holding the value.
+        :param path: The expression evaluated to the value path.
+        :param indent: The indentation of emitted lines.
+        """
+        def error(message):
+            return '%s    errors[%s] = %r' % (indent, path, message)
+
+        lines.append('%sif %s is None:' % (indent, var))
+        lines.append('%s    pass' % indent if field.nullable else
+                     error('Field may not be null.'))
+
+        check, type_name = None, None
+        if isinstance(field.type, dict):
+            check, type_name = type_checks[dict]
+        elif isinstance(field.type, list):
+            check, type_name = type_checks[list]
+        elif field.type in type_checks:
+            check, type_name = type_checks[field.type]
+        elif field.type is not None:
+            check = 'isinstance({0}, %s)' % self.constant(field.type, 't')
+            type_name = getattr(field.type, '__name__', str(field.type))
+        if check is not None:
+            # Nested nodes check their type by themselves
+            if not isinstance(field.type, (dict, list)):
+                lines.append('%selif not (%s):' % (indent, check.format(var)))
+                lines.append(error('Invalid type, expected %s.' % type_name))
+
+        if field.choices is not None:
+            choices = self.constant(frozenset(field.choices))
+            lines.append('%selif _not_in(%s, %s):' % (indent, var, choices))
+            lines.append(error('Must be one of: %s.' % ', '.join(
+                sorted('%s' % c for c in field.choices))))
+        if field.min is not None:
+            lines.append('%selif _lt(%s, %s):' % (
+                indent, var, self.constant(field.min)))
+            lines.append(error('Must be at least %s.' % field.min))
+        if field.max is not None:
+            lines.append('%selif _gt(%s, %s):' % (
+                indent, var, self.constant(field.max)))
+            lines.append(error('Must be at most %s.' % field.max))
+        if field.min_length is not None or field.max_length is not None:
+            lines.append('%selif not _has_len(%s):' % (indent, var))
+            lines.append(error('Invalid length.'))
+        if field.min_length is not None:
+            lines.append('%selif len(%s) < %d:' % (indent, var,
+                                                    field.min_length))
+            lines.append(error('Length must be at least %d.'
+                               % field.min_length))
+        if field.max_length is not None:
+            lines.append('%selif len(%s) > %d:' % (indent, var,
+                                                    field.max_length))
+            lines.append(error('Length must be at most %d.'
+                               % field.max_length))
+
+        name, transforms = self.compile_node(field)
+        if name is not None:
+            lines.append('%selse:' % indent)
+            lines.append('%s    %s = %s(%s, %s, errors)' % (
+                indent, var, name, var, path))
+        return transforms
+
+
+class Validator(object):
+    """The compiled schema validator.
+
+    Returns the validated data or raises `ApiUnprocessableEntity` error with
+    the ``errors`` dictionary of field path to error message.
+
+    :param schema: The schema to compile.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.validate = SchemaCompiler().compile(schema)
+
+    def __call__(self, data, path=''):
+        """Validates data.
+
+        :param data: The data to validate.
+        :param path: The path of data used as prefix of error keys.
+        """
+        errors = {}
+        data = self.validate(data, path, errors)
+        if errors:
+            raise ApiUnprocessableEntity(errors=errors)
+        return data
+
+    def iterate(self, items):
+        """Yields the items validated one at a time. The index of item is
+        used as prefix of error keys.
+
+        :param items: The iterable of items to validate.
+        """
+        validate = self.__call__
+        for i, item in enumerate(items):
+            yield validate(item, '%d' % i)
+
+
+# The validators compiled per schema object
+_validators = {}
+
+
+def compile_schema(schema):
+    """Returns the :class:`Validator` for schema. The validator is compiled
+    once per schema object and reused on subsequent calls.
+
+    :param schema: The schema to compile.
+    """
+    try:
+        cached_schema, validator = _validators[id(schema)]
+        if cached_schema is schema:
+            return validator
+    except KeyError:
+        pass
+    validator = Validator(schema)
+    _validators[id(schema)] = (schema, validator)
+    return validator
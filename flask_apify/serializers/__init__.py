@@ -8,10 +8,18 @@
 
     :copyright: (c) by Vital Kudzelka
 """
+import binascii
+import os
+import re
+from copy import copy
+
 from flask import current_app
+from flask.json import dumps as json_dumps
 from werkzeug.local import LocalProxy
 
+from .encoders import EncoderRegistry, encoders
 from ..exc import ApiNotAcceptable
+from ..registry import MimetypeRegistry
 from ..utils import (
     self_config, self_config_value
 )
@@ -20,39 +28,186 @@ from ..utils import (
 _apify = LocalProxy(lambda: current_app.extensions['apify'])
 
 
+class RawJSON(object):
+    """The already encoded JSON fragment. Serializers splice the fragment
+    into their output verbatim instead of encoding it again, so responses
+    may be composed from the cached fragments::
+
+        @apify.route('/products')
+        def products():
+            return {'items': [RawJSON(cache.get(key)) for key in keys]}
+
+    :param encoded: The JSON text or bytes in UTF-8.
+    """
+
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        if isinstance(encoded, bytes):
+            encoded = encoded.decode('utf-8')
+        self.encoded = encoded
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.encoded)
+
+
+# The string the fragments are replaced with while encoding
+_placeholder = '__apify_raw_json_%s_{0}__' % \
+    binascii.hexlify(os.urandom(8)).decode('ascii')
+_placeholder_re = re.compile('"%s"' % _placeholder.format(r'(\d+)'))
+
+
+def dumps(data, default=None, **kwargs):
+    """Dumps data to JSON splicing the :class:`RawJSON` fragments into output
+    as is.
+
+    The data which is the fragment or the list of fragments is joined
+    without encoding at all. Otherwise each fragment is encoded as unique
+    placeholder string which is replaced with the fragment after encoding.
+
+    :param data: The data to dump.
+    :param default: The function to encode objects which are not JSON
+        serializable.
+    :param kwargs: The arguments passed to :func:`flask.json.dumps`.
+    """
+    if type(data) is RawJSON:
+        return data.encoded
+    if type(data) in (list, tuple) and data and not kwargs and \
+       all(type(item) is RawJSON for item in data):
+        return '[' + ', '.join([item.encoded for item in data]) + ']'
+
+    fragments = []
+
+    def splice(obj):
+        if type(obj) is RawJSON:
+            fragments.append(obj.encoded)
+            return _placeholder.format(len(fragments) - 1)
+        if default is None:
+            raise TypeError('Object of type %s is not JSON serializable'
+                            % type(obj).__name__)
+        return default(obj)
+
+    result = json_dumps(data, default=splice, **kwargs)
+    if fragments:
+        result = _placeholder_re.sub(
+            lambda m: fragments[int(m.group(1))], result)
+    return result
+
+
 class Serializer(object):
     """Base class for data serializers."""
 
+    #: The registry of encoders of Python objects which serializer cannot
+    #: process natively, see :mod:`flask_apify.serializers.encoders`. The
+    #: serializer bound to :class:`SerializerRegistry` uses its encoders.
+    encoders = encoders
+
+    #: Whether the output depends on the passed data only, so it may be
+    #: cached and reused for other requests.
+    cacheable = True
+
+    #: The headers to add to responses with the serializer output.
+    headers = ()
+
+    #: Whether the serializer streams the iterator returned by view item by
+    #: item, other serializers are passed the list of all items.
+    streaming = False
+
     def __call__(self, data):
         raise NotImplementedError('call method must be overriden '
                                   'by subclasses')
 
+    def bind(self, serializers):
+        """Called each time the serializer registry changes. Subclasses which
+        depend on other registered serializers may resolve them here once
+        instead of doing the lookup on every call.
+
+        Returns the serializer to use with the registry or `None` to use the
+        serializer as is. By default returns the copy of serializer which uses
+        the encoders of the registry.
+
+        :param serializers: The mapping of mimetype to serializer callable.
+        """
+        encoders = getattr(serializers, 'encoders', None)
+        if encoders is None or encoders is self.encoders:
+            return None
+        bound = copy(self)
+        bound.encoders = encoders
+        return bound
+
+
+class SerializerRegistry(MimetypeRegistry):
+    """The registry of serializers per mimetype with the registry of encoders
+    the serializers bound to it use::
+
+        @apify.serializers.encoders.register(Todo)
+        def encode_todo(todo):
+            return {'id': todo.id, 'title': todo.title}
+
+    :param items: The initial mapping of mimetype to serializer.
+    :param encoders: The registry of encoders, the new
+        :class:`~flask_apify.serializers.encoders.EncoderRegistry` by default.
+    """
+
+    def __init__(self, items=None, encoders=None):
+        self.encoders = EncoderRegistry() if encoders is None else encoders
+        super(SerializerRegistry, self).__init__(items)
 
-def get_serializer(mimetype):
+
+def get_serializer(mimetype, serializers=None):
     """Returns mimetype and serializer function to process response data.
 
     May raise `ApiNotAcceptable` error if cannot return serializer that can
     generate response in format accepted by client.
 
     :param mimetype: The response mimetype requested by client.
+    :param serializers: The serializer registry, defaults to the registry of
+        the current application extension.
     """
+    if serializers is None:
+        serializers = _apify.serializers
     try:
-        return mimetype, _apify.serializers[mimetype]
+        return mimetype, serializers.lookup(mimetype)
     except KeyError:
         raise ApiNotAcceptable()
 
 
-def get_default_serializer():
-    """Returns default serializer function and mimetype for response."""
-    try:
+def get_default_serializer(serializers=None, mimetype=None):
+    """Returns default serializer function and mimetype for response.
+
+    :param serializers: The serializer registry, defaults to the registry of
+        the current application extension.
+    :param mimetype: The default mimetype, defaults to the value from the
+        current application config.
+    """
+    if serializers is None:
+        serializers = _apify.serializers
+    if mimetype is None:
         mimetype = self_config_value('default_mimetype')
-        return mimetype, _apify.serializers[mimetype]
+    try:
+        return mimetype, serializers.lookup(mimetype)
     except KeyError:
         raise RuntimeError(\
                 'Serializer does not registered for mimetype '
                 '"{}"'.format(mimetype))
 
 
-from .debug import to_html
-from .json import to_json
-from .jsonp import to_javascript
+# The serializers are imported on first access, so application which does not
+# use a serializer does not pay for its import
+_lazy_serializers = {
+    'to_html': 'flask_apify.serializers.debug:to_html',
+    'to_json': 'flask_apify.serializers.json:to_json',
+    'to_javascript': 'flask_apify.serializers.jsonp:to_javascript',
+    'to_ndjson': 'flask_apify.serializers.ndjson:to_ndjson',
+    'to_event_stream': 'flask_apify.serializers.sse:to_event_stream',
+}
+
+
+def __getattr__(name):
+    try:
+        path = _lazy_serializers[name]
+    except KeyError:
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name))
+    from werkzeug.utils import import_string
+    return import_string(path)
@@ -9,11 +9,9 @@
 
     :copyright: (c) by Vital Kudzelka
 """
-from flask import (
-    json, render_template
-)
+from flask import render_template
 
-from . import Serializer
+from . import Serializer, dumps
 from ..utils import self_config_value
 
 
@@ -27,7 +25,7 @@ class DebugSerializer(Serializer):
 
         :param raw: The data to dump
         """
-        dump = json.dumps(raw, indent=2)
+        dump = dumps(raw, indent=2, default=self.encoders.default)
         return render_template(self_config_value('apidump_template'), dump=dump)
 
 
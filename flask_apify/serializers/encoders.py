@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.serializers.encoders
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The encoders of Python objects to the data serializers can process.
+
+    An encoder is a function which accept an instance of specific class and
+    returns its representation as a dictionary or another serializable value.
+    Encoders are registered explicitly or derived once per class for
+    dataclasses, ORM-like objects with ``__table__`` and classes which declare
+    ``__api_fields__``. Each extension instance has its own registry::
+
+        @apify.serializers.encoders.register(Todo)
+        def encode_todo(todo):
+            return {'id': todo.id, 'title': todo.title}
+
+    Note that JSON encoder processes tuples natively as arrays, so namedtuples
+    are serialized as arrays and never passed to encoders.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import keyword
+
+from flask import current_app
+
+try:
+    import dataclasses
+except ImportError:  # pragma: no cover
+    dataclasses = None
+
+
+def is_attribute_name(name):
+    """Returns whether the name may be used in attribute access expression.
+
+    :param name: The field name.
+    """
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def get_fields(cls):
+    """Returns the names of fields to encode instances of class with, or
+    `None` if the fields cannot be derived from the class.
+
+    :param cls: The class to derive fields from.
+    """
+    fields = getattr(cls, '__api_fields__', None)
+    if fields is not None:
+        return tuple(fields)
+
+    if dataclasses is not None and dataclasses.is_dataclass(cls):
+        return tuple(f.name for f in dataclasses.fields(cls))
+
+    table = getattr(cls, '__table__', None)
+    if table is not None and hasattr(table, 'columns'):
+        return tuple(c.key for c in table.columns)
+
+    return None
+
+
+def compile_encoder(names):
+    """Generates the encoder function which returns the dictionary of the
+    passed field names to the field values of encoded object.
+
+    :param names: The names of fields to encode.
+    """
+    items = []
+    for name in names:
+        if is_attribute_name(name):
+            value = 'obj.%s' % name
+        else:
+            value = 'getattr(obj, %r)' % name
+        items.append('%r: %s' % (name, value))
+
+    source = 'def encode(obj):\n    return {%s}\n' % ', '.join(items)
+    namespace = {}
+    exec(compile(source, '<encoder>', 'exec'), namespace)
+    return namespace['encode']
+
+
+def derive_encoder(cls):
+    """Returns the encoder derived for class or `None` if class is not
+    supported.
+
+    :param cls: The class to derive encoder for.
+    """
+    fields = get_fields(cls)
+    if fields is not None:
+        return compile_encoder(fields)
+
+    return None
+
+
+def flask_default(obj):
+    """Encodes object by the default function of the current application
+    JSON provider.
+
+    :param obj: The object to encode.
+    """
+    default = getattr(getattr(current_app, 'json', None), 'default', None)
+    if default is None:
+        raise TypeError('Object of type %s is not JSON serializable'
+                        % type(obj).__name__)
+    return default(obj)
+
+
+class EncoderRegistry(object):
+    """The registry of encoder functions per class.
+
+    Encoders are looked up by the class of the object, the result of
+    lookup (including derived encoders and the classes which are not
+    supported) is cached, so the class is inspected only once.
+
+    :param fallback: The function to encode objects of unsupported classes.
+    """
+
+    def __init__(self, fallback=flask_default):
+        self.fallback = fallback
+        self._registered = {}
+        self._cache = {}
+
+    def register(self, cls, fn=None):
+        """Register function as encoder for class and its subclasses. May be
+        used as decorator.
+
+        :param cls: The class to register encoder for.
+        :param fn: The encoder function.
+        """
+        def decorator(fn):
+            self._registered[cls] = fn
+            self._cache.clear()
+            return fn
+        if fn is None:
+            return decorator
+        return decorator(fn)
+
+    def get(self, cls):
+        """Returns the encoder for class or `None`.
+
+        :param cls: The class to look up encoder for.
+        """
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+
+        encoder = None
+        for base in cls.__mro__:
+            if base in self._registered:
+                encoder = self._registered[base]
+                break
+        else:
+            encoder = derive_encoder(cls)
+
+        self._cache[cls] = encoder
+        return encoder
+
+    def default(self, obj):
+        """Returns the serializable representation of object. Uses as
+        ``default`` function of JSON encoder.
+
+        :param obj: The object to encode.
+        """
+        encoder = self.get(type(obj))
+        if encoder is None:
+            return self.fallback(obj)
+        return encoder(obj)
+
+
+# The encoders of serializers not bound to any extension instance registry
+encoders = EncoderRegistry()
@@ -8,20 +8,23 @@
 
     :copyright: (c) by Vital Kudzelka
 """
-from flask import json
-
-from . import Serializer
+from . import Serializer, dumps
 
 
 class JSONSerializer(Serializer):
-    """The JSON serializer."""
+    """The JSON serializer.
+
+    Objects which are not JSON serializable are converted by the encoder
+    registered or derived for their class, see :attr:`encoders`. The
+    :class:`~flask_apify.serializers.RawJSON` fragments are spliced as is.
+    """
 
     def __call__(self, raw):
         """Dumps data to JSON.
 
         :param raw: The raw data to process.
         """
-        return json.dumps(raw)
+        return dumps(raw, default=self.encoders.default)
 
 
 to_json = JSONSerializer()
@@ -8,17 +8,27 @@
 
     :copyright: (c) by Vital Kudzelka.
 """
+import re
+from copy import copy
+
 from flask import (
-    current_app, json, request
+    current_app, request
 )
 from werkzeug.local import LocalProxy
 
-from . import Serializer
+from . import Serializer, dumps
 
 
 _apify = LocalProxy(lambda: current_app.extensions['apify'])
 
 
+# The callback name must be a valid JavaScript identifier or a dotted path of
+# them, e.g. ``callback`` or ``jQuery.handlers.done``.
+callback_re = re.compile(r'[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*\Z')
+
+string_types = (bytes, type(u''))
+
+
 class JSONPSerializer(Serializer):
     """The JSON-P serializer.
 
@@ -28,20 +38,72 @@ class JSONPSerializer(Serializer):
     as parameter via request arguments (or does nothing if no callback
     function specified).
 
+    The callback name is validated against :data:`callback_re` and ignored if
+    it is not a valid JavaScript identifier, so arbitrary script can not be
+    injected into the response. The result of validation is cached per value.
+
     :param callback_name: The name of the callback used as padding in output.
+    :param max_cached_callbacks: The maximum number of validated callback
+        names to remember.
     """
 
-    def __init__(self, callback_name='callback'):
+    # The output depends on the callback passed in request
+    cacheable = False
+
+    def __init__(self, callback_name='callback', max_cached_callbacks=256):
         self.callback_name = callback_name
+        self.max_cached_callbacks = max_cached_callbacks
+
+        # The JSON serializer resolved from the registry, see :meth:`bind`.
+        self.json_serializer = None
+        self._valid_callbacks = {}
+
+    def bind(self, serializers):
+        """Returns the copy of serializer with JSON serializer resolved from
+        the registry.
+
+        :param serializers: The mapping of mimetype to serializer callable.
+        """
+        bound = super(JSONPSerializer, self).bind(serializers) or copy(self)
+        bound.json_serializer = serializers.get('application/json')
+        return bound
 
     def __call__(self, data):
+        to_json = self.json_serializer
+        if to_json is None:
+            # Not bound to any registry, look it up on the current application
+            try:
+                to_json = _apify.serializers.lookup('application/json')
+            except (KeyError, RuntimeError):
+                to_json = self.dumps
+
+        callback = request.args.get(self.callback_name)
+        if callback and not self.is_valid_callback(callback):
+            callback = None
+        return jsonp(to_json(data), callback)
+
+    def dumps(self, data):
+        """Dumps data to JSON if there is no JSON serializer registered.
+
+        :param data: The data to dump.
+        """
+        return dumps(data, default=self.encoders.default)
+
+    def is_valid_callback(self, callback):
+        """Returns `True` if callback is safe to use as padding.
+
+        :param callback: The callback name passed by client.
+        """
         try:
-            to_json = _apify.serializers['application/json']
+            return self._valid_callbacks[callback]
         except KeyError:
-            to_json = lambda x: json.dumps(x)
+            pass
 
-        callback = request.args.get(self.callback_name, False)
-        return jsonp(to_json(data), callback)
+        valid = callback_re.match(callback) is not None
+        if len(self._valid_callbacks) >= self.max_cached_callbacks:
+            self._valid_callbacks.clear()
+        self._valid_callbacks[callback] = valid
+        return valid
 
 
 def jsonp(json, padding=None):
@@ -52,14 +114,29 @@ def jsonp(json, padding=None):
     >>> jsonp('42')
     '42'
 
-    :param json: The original json string.
+    If json is an iterable of chunks rather than a string, then returns the
+    iterable which yields the padding around the original chunks.
+
+    :param json: The original json string or iterable of chunks.
     :param padding: An optional padding to wrap json string.
     """
-    before = after = ''
-    if padding:
-        before = padding + '('
-        after = ');'
-    return before + json + after
+    if not padding:
+        return json
+    if not isinstance(json, string_types):
+        return _stream_jsonp(json, padding)
+    return padding + '(' + json + ');'
+
+
+def _stream_jsonp(chunks, padding):
+    """Yields padding around the chunks of the serialized data.
+
+    :param chunks: The iterable of json chunks.
+    :param padding: The padding to wrap chunks.
+    """
+    yield padding + '('
+    for chunk in chunks:
+        yield chunk
+    yield ');'
 
 
 to_javascript = JSONPSerializer()
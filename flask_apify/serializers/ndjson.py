@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.serializers.ndjson
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The newline delimited JSON serializer for API response.
+
+    :copyright: (c) by Vital Kudzelka
+"""
+from . import Serializer, dumps
+
+
+class NDJSONSerializer(Serializer):
+    """The newline delimited JSON serializer.
+
+    Lists, tuples and iterators are serialized lazily one item per line, so
+    the response body is streamed as the items are produced. Any other data
+    is serialized as a single line.
+    """
+
+    # The output is the iterator which is exhausted by the first response
+    cacheable = False
+
+    streaming = True
+
+    def __call__(self, raw):
+        """Returns the iterator over lines of serialized data.
+
+        :param raw: The raw data to process.
+        """
+        if isinstance(raw, dict) or not hasattr(raw, '__iter__') or \
+           isinstance(raw, (bytes, type(u''))):
+            raw = (raw,)
+        return self.iterlines(raw)
+
+    def iterlines(self, items):
+        """Yields the items dumped to JSON one per line.
+
+        :param items: The iterable of items to dump.
+        """
+        default = self.encoders.default
+        for item in items:
+            yield dumps(item, default=default) + '\n'
+
+
+to_ndjson = NDJSONSerializer()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    flask_apify.serializers.sse
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The server-sent events serializer for API response.
+
+    The view returns the iterator over events, each event is serialized by
+    the JSON serializer and streamed to the client as soon as it is
+    produced::
+
+        @apify.route('/status', last_event_id_arg='last_event_id')
+        def status(last_event_id=None):
+            for update in watch_status(since=last_event_id):
+                yield Event(update, id=update['version'])
+
+    :copyright: (c) by Vital Kudzelka
+"""
+import logging
+import threading
+from copy import copy
+
+from flask import copy_current_request_context, has_request_context
+
+from . import Serializer, _apify, dumps
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+
+logger = logging.getLogger('flask-apify')
+
+
+class Event(object):
+    """The server-sent event.
+
+    :param data: The event data to serialize.
+    :param id: The event id, sent back by client in ``Last-Event-ID`` header
+        on reconnect.
+    :param event: The event type.
+    :param retry: The reconnection time in milliseconds.
+    """
+
+    __slots__ = ('data', 'id', 'event', 'retry')
+
+    def __init__(self, data, id=None, event=None, retry=None):
+        self.data = data
+        self.id = id
+        self.event = event
+        self.retry = retry
+
+    def __repr__(self):
+        return '%s(%r, id=%r)' % (self.__class__.__name__, self.data, self.id)
+
+
+def format_event(data, id=None, event=None, retry=None):
+    """Returns the event in the wire format.
+
+    :param data: The serialized event data.
+    :param id: The event id.
+    :param event: The event type.
+    :param retry: The reconnection time in milliseconds.
+    """
+    lines = []
+    if id is not None:
+        lines.append('id: %s' % single_line(id))
+    if event is not None:
+        lines.append('event: %s' % single_line(event))
+    if retry is not None:
+        lines.append('retry: %d' % retry)
+    for line in data.splitlines() or ('',):
+        lines.append('data: ' + line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def single_line(value):
+    """Returns the field value with line breaks removed, otherwise the value
+    would end the field and start the next one.
+
+    :param value: The field value.
+    """
+    return ('%s' % value).replace('\r', '').replace('\n', '')
+
+
+class EventStream(object):
+    """The iterator over serialized events of a single connection.
+
+    The events are produced in the background thread and passed through the
+    bounded queue, so the producer waits while the client reads slowly and
+    the heartbeat comment is sent while the producer has no events.
+
+    The producer checks whether the connection is closed before each event
+    and while it waits for the free slot in queue, then it closes the events
+    iterator and exits. The event which is being produced at the moment the
+    connection is closed is waited for, the iterator is not interrupted.
+
+    :param events: The iterator over events returned by view.
+    :param encode: The function which returns event in the wire format.
+    :param heartbeat: The number of seconds without events after which the
+        heartbeat comment is sent, never if `None`.
+    :param max_queue: The maximum number of events produced ahead.
+    """
+
+    #: The value put to queue by producer to signal end of stream
+    end = object()
+
+    #: The data of the last event sent if the events iterator fails.
+    error = {
+        'error': 'Internal Server Error',
+        'message': 'The event stream is interrupted by the server error.',
+    }
+
+    #: The number of seconds producer waits for the free slot in queue
+    #: between checks whether connection is closed.
+    poll_interval = 0.5
+
+    def __init__(self, events, encode, heartbeat=15.0, max_queue=16):
+        self.events = events
+        self.encode = encode
+        self.heartbeat = heartbeat
+        self.queue = queue.Queue(max_queue)
+        self.closed = threading.Event()
+        produce = self.produce
+        if has_request_context():
+            produce = copy_current_request_context(produce)
+        self.thread = threading.Thread(target=produce,
+                                       name='flask-apify-event-stream')
+        self.thread.daemon = True
+
+    def __iter__(self):
+        self.thread.start()
+        try:
+            while True:
+                try:
+                    chunk = self.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if chunk is self.end:
+                    break
+                yield chunk
+        finally:
+            # Stops the producer if the consumer is closed or failed
+            self.close()
+
+    def produce(self):
+        events = self.events
+        try:
+            while not self.closed.is_set():
+                try:
+                    event = next(events)
+                except StopIteration:
+                    break
+                if not self.put(self.encode(event)):
+                    break
+        except Exception as exc:
+            self.log_exception(exc)
+            self.put(self.encode(Event(self.error, event='error')))
+        finally:
+            close = getattr(self.events, 'close', None)
+            if close is not None:
+                close()
+            self.put(self.end)
+
+    def log_exception(self, exc):
+        """Logs the exception raised by the events iterator to the extension
+        logger.
+
+        :param exc: The exception raised
+        """
+        if has_request_context():
+            _apify.log_exception(exc)
+        else:
+            logger.error('Exception in event stream', exc_info=exc)
+
+    def put(self, chunk):
+        """Puts chunk into queue, waits while the queue is full. Returns
+        `False` if the connection is closed.
+
+        :param chunk: The serialized event
+        """
+        while not self.closed.is_set():
+            try:
+                self.queue.put(chunk, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def close(self):
+        """Stops the producer, called by WSGI server when connection is
+        closed.
+        """
+        self.closed.set()
+
+
+class EventStreamSerializer(Serializer):
+    """The server-sent events serializer.
+
+    Lists, tuples and iterators are streamed one event per item, any other
+    data is sent as a single event. The items which are not :class:`Event`
+    are used as event data.
+
+    :param data_mimetype: The mimetype of serializer of event data.
+    :param heartbeat: The number of seconds without events after which the
+        heartbeat comment is sent to keep connection open.
+    :param max_queue: The maximum number of events produced ahead of the
+        client per connection.
+    """
+
+    # The output is the iterator which is exhausted by the first response
+    cacheable = False
+
+    streaming = True
+
+    #: The headers to add to response, the stream must not be cached or
+    #: buffered by proxies.
+    headers = (
+        ('Cache-Control', 'no-cache'),
+        ('X-Accel-Buffering', 'no'),
+    )
+
+    def __init__(self, data_mimetype='application/json', heartbeat=15.0,
+                 max_queue=16):
+        self.data_mimetype = data_mimetype
+        self.heartbeat = heartbeat
+        self.max_queue = max_queue
+
+        # The data serializer resolved from the registry, see :meth:`bind`.
+        self.data_serializer = None
+
+    def bind(self, serializers):
+        """Returns the copy of serializer with data serializer resolved from
+        the registry.
+
+        :param serializers: The mapping of mimetype to serializer callable.
+        """
+        bound = super(EventStreamSerializer, self).bind(serializers) or copy(self)
+        bound.data_serializer = serializers.get(self.data_mimetype)
+        return bound
+
+    def __call__(self, raw):
+        """Returns the iterator over serialized events.
+
+        :param raw: The event or iterable of events.
+        """
+        if isinstance(raw, (dict, Event)) or not hasattr(raw, '__iter__') or \
+           isinstance(raw, (bytes, type(u''))):
+            return self.encode(raw)
+        return EventStream(iter(raw), self.encode, heartbeat=self.heartbeat,
+                           max_queue=self.max_queue)
+
+    def encode(self, event):
+        """Returns the event in the wire format.
+
+        :param event: The :class:`Event` or event data.
+        """
+        if not isinstance(event, Event):
+            event = Event(event)
+        return format_event(self.serialize_data(event.data), event.id,
+                            event.event, event.retry)
+
+    def serialize_data(self, data):
+        """Returns the event data serialized by the data serializer.
+
+        :param data: The event data.
+        """
+        serializer = self.data_serializer
+        if serializer is None:
+            # Not bound to any registry, look it up on the current application
+            try:
+                serializer = _apify.serializers.lookup(self.data_mimetype)
+            except (KeyError, RuntimeError):
+                serializer = self.dumps
+        data = serializer(data)
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return data
+
+    def dumps(self, data):
+        """Dumps data to JSON if there is no data serializer registered.
+
+        :param data: The data to dump.
+        """
+        return dumps(data, default=self.encoders.default)
+
+
+to_event_stream = EventStreamSerializer()
@@ -8,8 +8,25 @@
 
     :copyright: (c) by Vital Kudzelka
 """
+import time
+
 from flask import current_app
 
+from .response import ApiResponse
+
+
+try:
+    clock = time.monotonic
+except AttributeError:  # pragma: no cover
+    clock = time.time
+"""The clock of deadlines and expiration times, in seconds."""
+
+try:
+    timer = time.perf_counter
+except AttributeError:  # pragma: no cover
+    timer = time.time
+"""The clock of durations, in seconds."""
+
 
 key = lambda s: 'APIFY_{}'.format(s.upper())
 """Create config key for extension."""
@@ -39,25 +56,21 @@ def self_config_value(key, app=None):
     return self_config(app).get(key.upper())
 
 
+def pass_context(fn):
+    """Marks the preprocessor function to receive the request
+    :class:`~flask_apify.ctx.ApiContext` as the second argument.
+
+    :param fn: The preprocessor function
+    """
+    fn.pass_context = True
+    return fn
+
+
 def unpack_response(raw):
     """Unpack raw data from view function to (raw, code, headers) tuple. Fill in
     missed values.
 
-    :param raw: The data returned by view function
+    :param raw: The data returned by view function, see
+        :meth:`~flask_apify.response.ApiResponse.from_raw`
     """
-    if not isinstance(raw, tuple):
-        return raw, 200, {}
-
-    try:
-        raw, code = raw
-        return raw, code, {}
-    except ValueError:
-        pass
-
-    try:
-        raw, code, headers = raw
-        return raw, code, headers
-    except ValueError:
-        pass
-
-    return raw, 200, {}
+    return tuple(ApiResponse.from_raw(raw))
@@ -1,18 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import asyncio
+import time
+
 import pytest
 
+import flask
 from flask import (
     abort, Flask
 )
 from flask_apify import Apify
 from flask_apify.exc import ApiError
+from flask_apify.cache import CachePolicy
+from flask_apify.ratelimit import RateLimit
+from flask_apify.schema import Field
+from flask_apify.serializers.sse import Event
 
 
 @pytest.fixture
 def app(request):
     app = Flask(__name__)
-    apify = Apify()
+    apify = Apify(debug_html=True)
 
     @apify.route('/ping')
     @apify.route('/ping/<int:value>')
@@ -43,6 +51,73 @@ def app(request):
         return app.response_class('response has been rewritten',
                                   mimetype='custom/mimetype')
 
+    @apify.route('/echo', methods=('POST',), body_arg='body',
+                 max_body_size=64)
+    def echo(body):
+        return {'body': body}
+
+    @apify.route('/ingest', methods=('POST',), body_arg='items',
+                 body_stream=True)
+    def ingest(items):
+        return {'count': sum(1 for _ in items)}
+
+    @apify.route('/todos', methods=('POST',), body_arg='todo',
+                 schema={'title': Field(str, min_length=1),
+                         'done': Field(bool, default=False)})
+    def addtodo(todo):
+        return todo, 201
+
+    @apify.route('/limited', rate_limit=RateLimit(2, per=60))
+    def limited():
+        return {'value': 'limited'}
+
+    @apify.route('/cached', methods=('GET', 'POST'),
+                 cache=CachePolicy(max_age=60, public=True))
+    def cached():
+        return {'value': 'cached'}
+
+    @apify.route('/export', ranges=True)
+    def export():
+        app.export_calls = getattr(app, 'export_calls', 0) + 1
+        return {'items': list(range(100))}
+
+    @apify.route('/events', last_event_id_arg='last_event_id')
+    def events(last_event_id=None):
+        start = int(last_event_id or 0) + 1
+        for i in range(start, 4):
+            yield Event({'value': i}, id=i)
+
+    @apify.route('/numbers')
+    def numbers():
+        for i in range(1, 4):
+            yield i
+
+    @apify.route('/slow', timeout=0.05)
+    def slow():
+        time.sleep(0.1)
+        return {'value': 'slow'}
+
+    @apify.route('/async_slow', timeout=0.05)
+    async def async_slow():
+        await asyncio.sleep(1)
+        return {'value': 'slow'}
+
+    @apify.route('/async_fast')
+    async def async_fast():
+        await asyncio.sleep(0)
+        return {'value': 'fast'}
+
+    @apify.route('/orders', methods=('POST',), idempotent=True)
+    def create_order():
+        app.orders = getattr(app, 'orders', 0) + 1
+        if flask.request.args.get('fail'):
+            raise ApiError()
+        return {'order': app.orders}, 201
+
+    @apify.route('/health', global_hooks=False)
+    def health():
+        return {'status': 'ok'}
+
     apify.init_app(app)
     app.register_blueprint(apify.blueprint)
 
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from io import StringIO
+
+import pytest
+from flask import url_for
+
+from flask_apify.accesslog import AccessLog, JSONLinesWriter
+
+
+class ListWriter(list):
+
+    def write(self, entry):
+        self.append(entry)
+
+
+@pytest.fixture
+def writer(apify):
+    writer = ListWriter()
+    apify.access_log = AccessLog(writer=writer, sample_rate=1, slow=None)
+    return writer
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+def test_record_request(client, writer):
+    client.get(url_for('api.cached'), headers=json_headers)
+
+    entry, = writer
+    assert entry['endpoint'] == 'api.cached'
+    assert entry['method'] == 'GET'
+    assert entry['status'] == 200
+    assert entry['mimetype'] == 'application/json'
+    assert entry['bytes'] > 0
+    assert entry['duration'] >= 0
+    assert entry['cache'] == 'cacheable'
+    assert entry['reason'] == 'sample'
+
+
+def test_write_to_stderr_by_default(apify, client, capsys):
+    apify.access_log = AccessLog(sample_rate=1, slow=None)
+    client.get(url_for('api.cached'), headers=json_headers)
+    apify.access_log.writer.close()
+
+    entry = json.loads(capsys.readouterr().err)
+    assert entry['endpoint'] == 'api.cached'
+    assert entry['status'] == 200
+
+
+def test_record_error(apify, client, writer):
+    apify.access_log.sample_rate = 0
+    client.get(url_for('api.ping'), headers=json_headers)
+    client.get(url_for('api.bomb'), headers=json_headers)
+
+    entry, = writer
+    assert entry['status'] == 500
+    assert entry['reason'] == 'error'
+    assert entry['cache'] is None
+
+
+def test_record_slow_request(apify, client, writer):
+    apify.access_log.sample_rate = 0
+    apify.access_log.slow = 0
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    entry, = writer
+    assert entry['reason'] == 'slow'
+
+
+def test_deterministic_sampling(apify, client, writer):
+    apify.access_log = AccessLog(writer=writer, sample_rate=0.5)
+    sampled = {}
+    for i in range(64):
+        for _ in range(2):
+            headers = json_headers + [('X-Request-Id', 'request-%d' % i)]
+            client.get(url_for('api.ping'), headers=headers)
+        sampled[i] = len(writer)
+        del writer[:]
+
+    assert set(sampled.values()) == set([0, 2])
+    assert 16 < sum(1 for n in sampled.values() if n) < 48
+
+
+def test_write_json_lines():
+    stream = StringIO()
+    writer = JSONLinesWriter(stream)
+    writer.write({'status': 200, 'endpoint': 'api.ping'})
+    writer.write({'status': 404, 'endpoint': None})
+    writer.close()
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == json.dumps({'status': 200, 'endpoint': 'api.ping'},
+                                  separators=(',', ':'))
+    assert json.loads(lines[1]) == {'status': 404, 'endpoint': None}
+
+
+def test_drop_entries_if_queue_is_full():
+    writer = JSONLinesWriter(StringIO(), maxsize=1)
+    # Do not start the background thread to keep the queue full
+    writer.start = lambda: None
+    for i in range(3):
+        writer.write({'i': i})
+    assert writer.dropped == 2
@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import sys
+import time
 import pytest
 import logging
 
-from flask import url_for
+from flask import g, url_for
+from flask_apify.ctx import ApiContext
+from flask_apify.response import ApiResponse
+from flask_apify.utils import pass_context
 from flask_apify.fy import (
     catch_errors, guess_best_mimetype, set_best_serializer
 )
@@ -315,6 +319,21 @@ def test_apify_exec_postprocessor(apify, client, accept_json):
     assert res.json == {'something': 42, 'value': 200}
 
 
+def test_postprocessor_may_return_api_response(apify, client):
+    @apify.postprocessor
+    def add_header(raw):
+        res = ApiResponse.from_raw(raw)
+        res.headers['X-Version'] = '1'
+        res.status = 201
+        return res
+
+    res = client.get(url_for('api.ping'),
+                     headers=[('Accept', 'application/json')])
+    assert res.status_code == 201
+    assert res.headers['X-Version'] == '1'
+    assert res.json == {'value': 200}
+
+
 def test_apify_add_finalizer(apify):
     @apify.finalizer
     def teardown():
@@ -353,3 +372,313 @@ def test_apify_can_handle_finalizer_error(apify, client, accept_mimetypes):
     res = client.get(url_for('api.ping'), headers=accept_mimetypes)
     assert res.status_code == 418
     assert b('Server too hot. Try it later.') in res.data
+
+
+class TestApiContext(object):
+
+    def test_preprocessor_may_receive_context(self, apify, client, mimetype):
+        contexts = []
+
+        @apify.preprocessor
+        @pass_context
+        def remember_context(fn, ctx):
+            contexts.append(ctx)
+            return fn
+
+        client.get(url_for('api.ping'), headers=[('Accept', mimetype)])
+        ctx, = contexts
+        assert ctx.apify is apify
+        assert ctx.mimetype == mimetype
+        assert ctx.serializer is apify.serializers.lookup(ctx.mimetype)
+
+    def test_mirror_negotiated_serializer_onto_globals(self, app, apify):
+        with app.test_request_context(headers=[('Accept', 'application/json')]):
+            ctx = ApiContext(apify)
+            set_best_serializer(lambda: None, ctx)
+            assert g.api_mimetype == 'application/json'
+            assert g.api_serializer is ctx.serializer
+
+    @pytest.mark.options(apify_mirror_globals=False)
+    def test_does_not_mirror_if_disabled(self, app, apify):
+        with app.test_request_context(headers=[('Accept', 'application/json')]):
+            set_best_serializer(lambda: None, ApiContext(apify))
+            assert 'api_mimetype' not in g
+
+    @pytest.mark.options(apify_mirror_globals=False)
+    def test_dispatch_without_globals(self, client):
+        res = client.get(url_for('api.ping'),
+                         headers=[('Accept', 'application/json')])
+        assert res.status_code == 200
+        assert res.json == {'value': 200}
+
+
+class TestRequestBody(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_pass_body_to_view(self, client):
+        res = client.post(url_for('api.echo'), data='{"ping": "pong"}',
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 200
+        assert res.json == {'body': {'ping': 'pong'}}
+
+    def test_body_too_large(self, client):
+        res = client.post(url_for('api.echo'), data='[%s]' % ('1,' * 64 + '1'),
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 413
+
+    @pytest.mark.options(apify_max_body_size=8)
+    def test_route_limit_overrides_config(self, client):
+        res = client.post(url_for('api.echo'), data='[1, 2, 3, 4, 5, 6]',
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 200
+
+    def test_unsupported_media_type(self, client):
+        res = client.post(url_for('api.echo'), data='<ping/>',
+                          content_type='text/xml', headers=self.headers)
+        assert res.status_code == 415
+
+    def test_invalid_body(self, client):
+        res = client.post(url_for('api.echo'), data='{"ping":',
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 422
+
+    def test_stream_body_to_view(self, client):
+        res = client.post(url_for('api.ingest'), data='1\n2\n3\n',
+                          content_type='application/x-ndjson',
+                          headers=self.headers)
+        assert res.json == {'count': 3}
+
+    def test_register_deserializer(self, apify):
+        @apify.deserializer('text/plain')
+        def from_text(stream, charset='utf-8'):
+            return stream.read().decode(charset)
+
+        assert apify.deserializers['text/plain'] is from_text
+
+
+class TestRequestBodyValidation(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_valid_body(self, client):
+        res = client.post(url_for('api.addtodo'), data='{"title": "Write"}',
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 201
+        assert res.json == {'title': 'Write', 'done': False}
+
+    def test_invalid_body(self, client):
+        res = client.post(url_for('api.addtodo'), data='{"done": 1}',
+                          content_type='application/json',
+                          headers=self.headers)
+        assert res.status_code == 422
+        assert res.json['errors'] == {
+            'title': 'Missing required field.',
+            'done': 'Invalid type, expected boolean.',
+        }
+
+
+class TestWarmup(object):
+
+    def test_resolve_registered_callables(self, app, apify):
+        apify.warmup(app)
+        for registry in (apify.serializers, apify.deserializers):
+            for fn in registry.index.exact.values():
+                assert callable(fn)
+
+    def test_render_static_errors(self, app, apify):
+        apify.warmup(app)
+        mimetypes = set(mimetype for _, _, _, mimetype in apify._error_bodies)
+        assert mimetypes == set(['application/json', 'text/html'])
+
+    def test_serve_rendered_error_body(self, app, apify, client):
+        apify.warmup(app)
+        apify._error_bodies[(401, 'Unauthorized', ApiUnauthorized.description,
+                             'application/json')] = 'cached'
+
+        @apify.preprocessor
+        def login_required(fn):
+            raise ApiUnauthorized()
+
+        res = client.get(url_for('api.ping'),
+                         headers=[('Accept', 'application/json')])
+        assert res.status_code == 401
+        assert res.data == b'cached'
+
+    def test_do_not_cache_custom_description(self, apify, client):
+        @apify.preprocessor
+        def forbid(fn):
+            raise ApiUnauthorized('Token expired at %s' % id(fn))
+
+        res = client.get(url_for('api.ping'),
+                         headers=[('Accept', 'application/json')])
+        assert res.status_code == 401
+        assert apify._error_bodies == {}
+
+    def test_freeze_gc(self, app, apify, monkeypatch):
+        calls = []
+        monkeypatch.setattr('gc.freeze', lambda: calls.append(True),
+                            raising=False)
+        apify.warmup(app)
+        assert calls == []
+        apify.warmup(app, freeze_gc=True)
+        assert calls == [True]
+
+
+class TestTimeout(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_deadline_exceeded(self, apify, client):
+        serialized = []
+        apify.postprocessor(lambda raw: serialized.append(raw) or raw)
+
+        res = client.get(url_for('api.slow'), headers=self.headers)
+        assert res.status_code == 504
+        assert serialized == []
+
+    def test_cancel_async_view(self, client):
+        start = time.time()
+        res = client.get(url_for('api.async_slow'), headers=self.headers)
+        assert res.status_code == 504
+        assert time.time() - start < 0.5
+
+    def test_run_async_view(self, client):
+        res = client.get(url_for('api.async_fast'), headers=self.headers)
+        assert res.status_code == 200
+        assert res.json == {'value': 'fast'}
+
+    def test_config_timeout(self, app, client):
+        app.config['APIFY_TIMEOUT'] = 0
+        res = client.get(url_for('api.ping'), headers=self.headers)
+        assert res.status_code == 504
+
+    def test_deadline_is_visible_to_hooks(self, app, apify, client):
+        time_left = []
+
+        @apify.preprocessor
+        @pass_context
+        def check(fn, ctx):
+            time_left.append(ctx.time_left())
+            assert g.api_deadline == ctx.deadline
+            return fn
+
+        app.config['APIFY_TIMEOUT'] = 10
+        res = client.get(url_for('api.ping'), headers=self.headers)
+        assert res.status_code == 200
+        assert 0 < time_left[0] <= 10
+
+
+class TestScopedHooks(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_endpoint_filter(self, apify, client):
+        called = []
+
+        @apify.preprocessor(endpoints=('ping',))
+        def remember(fn):
+            called.append(fn.__name__)
+            return fn
+
+        client.get(url_for('api.ping'), headers=self.headers)
+        client.get(url_for('api.async_fast'), headers=self.headers)
+        assert called == ['ping']
+
+    def test_method_filter(self, apify, client):
+        called = []
+
+        @apify.finalizer(endpoints=('cached',), methods=('post',))
+        def remember(res):
+            called.append(res.status_code)
+            return res
+
+        client.get(url_for('api.cached'), headers=self.headers)
+        assert called == []
+        client.post(url_for('api.cached'), headers=self.headers)
+        assert called == [200]
+
+    def test_rule_filter(self, apify, client):
+        called = []
+
+        @apify.postprocessor(rules=('/ping/<int:value>',))
+        def remember(raw):
+            called.append(raw)
+            return raw
+
+        client.get(url_for('api.async_fast'), headers=self.headers)
+        assert called == []
+        client.get(url_for('api.ping', value=201), headers=self.headers)
+        assert len(called) == 1
+
+    def test_route_excludes_global_hooks(self, apify, client):
+        called = []
+
+        @apify.preprocessor
+        def remember(fn):
+            called.append(fn.__name__)
+            return fn
+
+        res = client.get(url_for('api.health'), headers=self.headers)
+        assert res.status_code == 200
+        assert res.mimetype == 'application/json'
+        assert called == []
+
+    def test_scoped_hook_applies_without_global_hooks(self, apify, client):
+        called = []
+
+        @apify.preprocessor(endpoints=('health',))
+        def remember(fn):
+            called.append(fn.__name__)
+            return fn
+
+        client.get(url_for('api.health'), headers=self.headers)
+        assert called == ['health']
+
+    def test_apply_hooks_in_order_of_registration(self, apify, client):
+        called = []
+
+        @apify.preprocessor(endpoints=('ping',))
+        def scoped(fn):
+            called.append('scoped')
+            return fn
+
+        @apify.preprocessor
+        def remember(fn):
+            called.append('global')
+            return fn
+
+        client.get(url_for('api.ping'), headers=self.headers)
+        assert called == ['scoped', 'global']
+
+    def test_keep_order_of_direct_modification(self, apify, client):
+        called = []
+        apify.finalizer_funcs.append(
+            lambda res: called.append('direct') or res)
+        apify.finalizer(lambda res: called.append('scoped') or res,
+                        endpoints=('ping',))
+
+        client.get(url_for('api.ping'), headers=self.headers)
+        assert called == ['direct', 'scoped']
+
+    def test_exclude_global_hooks_of_unresolved_method(self, apify, app):
+        route = app.view_functions['api.health'].api_route
+        with app.test_request_context('/health', method='OPTIONS'):
+            ctx = ApiContext(apify, route=route)
+            assert apify.get_hooks(ctx) == ((set_best_serializer,), (), ())
+
+    def test_resolve_hooks_on_direct_modification(self, apify, client):
+        apify.preprocessor(lambda fn: fn, endpoints=('ping',))
+        called = []
+        apify.finalizer_funcs.append(lambda res: called.append(res) or res)
+
+        client.get(url_for('api.ping'), headers=self.headers)
+        assert called == []
+        apify.resolve_hooks()
+        client.get(url_for('api.ping'), headers=self.headers)
+        assert len(called) == 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from flask_apify.bench import (
+    BenchResult, EndpointStats, LoadGenerator, RequestSpec, percentile, serve
+)
+
+
+json_headers = {'Accept': 'application/json'}
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) is None
+
+
+class TestLoadGenerator(object):
+
+    def test_run_request_mix(self, app, apify):
+        generator = LoadGenerator(app, [
+            RequestSpec('GET', '/ping', json_headers, weight=3),
+            RequestSpec('GET', '/forbidden', json_headers),
+        ], concurrency=3, apify=apify, seed=1)
+        result = generator.run(total=60, warmup=5)
+
+        assert result.count == 60
+        report = result.as_dict()
+        ping = report['endpoints']['GET /ping']
+        forbidden = report['endpoints']['GET /forbidden']
+        assert ping['count'] + forbidden['count'] == 60
+        assert ping['count'] > forbidden['count']
+        assert ping['statuses'] == {200: ping['count']}
+        assert forbidden['statuses'] == {403: forbidden['count']}
+        assert ping['p50'] <= ping['p95'] <= ping['p99'] <= ping['max']
+
+    def test_collect_stage_timings(self, app, apify):
+        generator = LoadGenerator(app, [
+            RequestSpec('GET', '/ping', json_headers),
+        ], concurrency=1, apify=apify)
+        result = generator.run(total=5)
+
+        stages = result.stages['api.ping']
+        assert set(stages) == set(['preprocess', 'body', 'view',
+                                   'postprocess', 'serialize', 'finalize'])
+        assert apify.stage_timer is None
+
+    def test_run_for_duration(self, app):
+        generator = LoadGenerator(app, [RequestSpec('GET', '/ping')],
+                                  concurrency=2)
+        result = generator.run(duration=0.05)
+        assert result.count > 0
+        assert result.duration >= 0.05
+
+    def test_http_transport(self, app):
+        with serve(app) as transport:
+            generator = LoadGenerator(transport, [
+                RequestSpec('POST', '/echo', data=b'{"x": 1}',
+                            headers={'Accept': 'application/json',
+                                     'Content-Type': 'application/json'}),
+            ], concurrency=2)
+            result = generator.run(total=6)
+
+        stats = result.as_dict()['endpoints']['POST /echo']
+        assert stats['statuses'] == {200: 6}
+        assert stats['errors'] == 0
+
+    def test_requires_requests(self, app):
+        with pytest.raises(ValueError):
+            LoadGenerator(app, [])
+
+
+def test_regressions():
+    def result(duration):
+        stats = EndpointStats('GET /ping')
+        stats.latencies = [0.001] * 100
+        return BenchResult(duration, {'GET /ping': stats})
+
+    baseline = result(1.0)
+    assert result(1.05).regressions(baseline, tolerance=0.1) == []
+    regressions = result(2.0).regressions(baseline.as_dict(), tolerance=0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('total: 50.0 req/s')
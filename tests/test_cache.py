@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from flask import url_for
+from flask_apify.cache import CachePolicy
+
+
+class TestCachePolicy(object):
+
+    def test_header(self):
+        policy = CachePolicy(max_age=60, s_maxage=600, public=True,
+                             stale_while_revalidate=30, stale_if_error=300)
+        assert policy.header == ('public, max-age=60, s-maxage=600, '
+                                 'stale-while-revalidate=30, '
+                                 'stale-if-error=300')
+
+    def test_private(self):
+        assert CachePolicy(max_age=0, public=False).header == \
+                'private, max-age=0'
+
+    def test_no_store(self):
+        assert CachePolicy(no_cache=True, no_store=True).header == \
+                'no-cache, no-store'
+
+    def test_apply(self, app):
+        policy = CachePolicy(max_age=60)
+        res = app.response_class('')
+        policy.apply(res, 'GET')
+        assert res.headers['Cache-Control'] == 'max-age=60'
+
+    @pytest.mark.parametrize('method,status', [('POST', 200), ('GET', 404)])
+    def test_does_not_apply_to_uncacheable_responses(self, app, method,
+                                                     status):
+        res = app.response_class('', status=status)
+        CachePolicy(max_age=60).apply(res, method)
+        assert 'Cache-Control' not in res.headers
+
+    def test_keep_cache_control_set_by_view(self, app):
+        res = app.response_class('', headers={'Cache-Control': 'no-store'})
+        CachePolicy(max_age=60).apply(res, 'GET')
+        assert res.headers['Cache-Control'] == 'no-store'
+
+
+class TestCachedRoute(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_set_cache_control(self, client):
+        res = client.get(url_for('api.cached'), headers=self.headers)
+        assert res.headers['Cache-Control'] == 'public, max-age=60'
+
+    def test_skip_unsafe_methods(self, client):
+        res = client.post(url_for('api.cached'), headers=self.headers)
+        assert 'Cache-Control' not in res.headers
+
+    def test_vary_on_accept(self, client, mimetype):
+        res = client.get(url_for('api.ping'), headers=[('Accept', mimetype)])
+        assert res.headers['Vary'] == 'Accept'
+
+    def test_vary_on_error(self, client):
+        res = client.get(url_for('api.ping'), headers=[('Accept', 'x/y')])
+        assert res.status_code == 406
+        assert res.headers['Vary'] == 'Accept'
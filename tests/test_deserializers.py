@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import pytest
+
+from flask_apify.deserializers import (
+    BoundedStream, Deserializer, get_deserializer
+)
+from flask_apify.deserializers.json import JSONDeserializer
+from flask_apify.deserializers.ndjson import NDJSONDeserializer
+from flask_apify.exc import (
+    ApiRequestEntityTooLarge, ApiUnprocessableEntity, ApiUnsupportedMediaType
+)
+from flask_apify.registry import MimetypeRegistry
+
+
+def stream(data):
+    return io.BytesIO(data)
+
+
+class TestDeserializer(object):
+
+    def test_base_class_raises_not_implementent_error_on_call(self):
+        with pytest.raises(NotImplementedError):
+            Deserializer()(stream(b''))
+
+    def test_base_class_does_not_support_streaming(self):
+        with pytest.raises(ApiUnsupportedMediaType):
+            Deserializer().iterate(stream(b''))
+
+
+def test_get_deserializer():
+    registry = MimetypeRegistry({'application/json': 42})
+    assert get_deserializer('application/json', registry) == 42
+    with pytest.raises(ApiUnsupportedMediaType):
+        get_deserializer('text/xml', registry)
+
+
+class TestBoundedStream(object):
+
+    def test_read_within_limit(self):
+        assert BoundedStream(stream(b'1234'), 4).read() == b'1234'
+
+    def test_raise_if_limit_exceeded(self):
+        with pytest.raises(ApiRequestEntityTooLarge):
+            BoundedStream(stream(b'12345'), 4).read()
+
+    def test_raise_if_limit_exceeded_by_lines(self):
+        lines = BoundedStream(stream(b'12\n34\n56\n'), 7)
+        with pytest.raises(ApiRequestEntityTooLarge):
+            list(lines)
+
+
+class TestJSONDeserializer(object):
+
+    def test_load(self):
+        assert JSONDeserializer()(stream(b'{"ping": "pong"}')) == \
+                {'ping': 'pong'}
+
+    def test_empty_body(self):
+        assert JSONDeserializer()(stream(b'')) is None
+
+    def test_invalid_body(self):
+        with pytest.raises(ApiUnprocessableEntity):
+            JSONDeserializer()(stream(b'{"ping":'))
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+    def test_iterate_array_items(self, chunk_size):
+        deserializer = JSONDeserializer(chunk_size=chunk_size)
+        data = b' [1, 12345, "a,]b", {"c": [true, null]}, [] ] '
+        assert list(deserializer.iterate(stream(data))) == \
+                [1, 12345, 'a,]b', {'c': [True, None]}, []]
+
+    def test_iterate_large_item(self):
+        item = {'items': ['x' * 10] * 20000}
+        data = json.dumps([item, 'a\\"b]']).encode('utf-8')
+        items = JSONDeserializer(chunk_size=64).iterate(stream(data))
+        assert list(items) == [item, 'a\\"b]']
+
+    def test_iterate_empty_array(self):
+        assert list(JSONDeserializer().iterate(stream(b'[ ]'))) == []
+
+    @pytest.mark.parametrize('data', [b'{}', b'[1, 2', b'[1 2]', b'[1,',
+                                      b'[1,]', b'[1, 2] garbage', b'[{]',
+                                      b'["a]', b'[1}]'])
+    def test_iterate_invalid_array(self, data):
+        with pytest.raises(ApiUnprocessableEntity):
+            list(JSONDeserializer(chunk_size=2).iterate(stream(data)))
+
+    @pytest.mark.parametrize('data', [b'["\xff"]', b'["a\xc3"]'])
+    def test_iterate_invalid_text(self, data):
+        with pytest.raises(ApiUnprocessableEntity):
+            list(JSONDeserializer(chunk_size=2).iterate(stream(data)))
+
+    @pytest.mark.parametrize('charset', ['unknown', 'rot13', 'hex',
+                                         'base64'])
+    def test_iterate_unsupported_charset(self, charset):
+        with pytest.raises(ApiUnsupportedMediaType):
+            list(JSONDeserializer().iterate(stream(b'[1]'), charset))
+
+
+class TestNDJSONDeserializer(object):
+
+    def test_load(self):
+        data = b'{"a": 1}\n\n[2]\n3'
+        assert NDJSONDeserializer()(stream(data)) == [{'a': 1}, [2], 3]
+
+    def test_iterate_lazily(self):
+        items = NDJSONDeserializer().iterate(stream(b'1\n{"broken'))
+        assert next(items) == 1
+        with pytest.raises(ApiUnprocessableEntity):
+            next(items)
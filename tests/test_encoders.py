@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+import pytest
+from flask import Flask
+
+from flask_apify import Apify
+from flask_apify.serializers.encoders import (
+    EncoderRegistry, compile_encoder, derive_encoder
+)
+from flask_apify.serializers.json import JSONSerializer
+
+
+Point = namedtuple('Point', 'x y')
+
+
+class Todo(object):
+    __api_fields__ = ('id', 'title')
+
+    def __init__(self, id, title):
+        self.id, self.title = id, title
+
+
+class Column(object):
+    def __init__(self, key):
+        self.key = key
+
+
+class Table(object):
+    columns = [Column('id'), Column('user-name')]
+
+
+class Model(object):
+    __table__ = Table()
+
+    def __init__(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+
+def test_compile_encoder():
+    encode = compile_encoder(('a', 'b'))
+    assert encode(type('O', (object,), {'a': 1, 'b': 2})()) == {'a': 1, 'b': 2}
+
+
+def test_compile_encoder_of_keyword_names():
+    encode = compile_encoder(('from', 'id'))
+    assert encode(type('O', (object,), {'from': 1, 'id': 2})()) == \
+            {'from': 1, 'id': 2}
+
+
+class TestDeriveEncoder(object):
+
+    def test_namedtuple_is_serialized_natively(self):
+        assert derive_encoder(Point) is None
+        assert JSONSerializer()(Point(1, 2)) == '[1, 2]'
+
+    def test_declared_fields(self):
+        assert derive_encoder(Todo)(Todo(1, 'Write')) == \
+                {'id': 1, 'title': 'Write'}
+
+    def test_table_columns(self):
+        model = Model(**{'id': 1, 'user-name': 'vital'})
+        assert derive_encoder(Model)(model) == {'id': 1, 'user-name': 'vital'}
+
+    def test_dataclass(self):
+        dataclasses = pytest.importorskip('dataclasses')
+
+        @dataclasses.dataclass
+        class Item(object):
+            id: int
+            tags: list
+
+        assert derive_encoder(Item)(Item(1, [])) == {'id': 1, 'tags': []}
+
+    def test_unsupported_class(self):
+        assert derive_encoder(object) is None
+
+
+class TestEncoderRegistry(object):
+
+    def test_derive_once(self):
+        registry = EncoderRegistry()
+        assert registry.get(Todo) is registry.get(Todo)
+
+    def test_registered_encoder_apply_to_subclasses(self):
+        registry = EncoderRegistry()
+
+        @registry.register(Todo)
+        def encode_todo(todo):
+            return todo.title
+
+        class Task(Todo):
+            pass
+
+        assert registry.default(Task(1, 'Write')) == 'Write'
+
+    def test_fallback(self):
+        registry = EncoderRegistry(fallback=lambda obj: 'fallback')
+        assert registry.default(object()) == 'fallback'
+
+    def test_flask_fallback(self, app):
+        with pytest.raises(TypeError):
+            EncoderRegistry().default(object())
+
+
+def test_json_serializer_encode_objects(app):
+    serializer = JSONSerializer()
+    assert serializer([Todo(3, 'Write'), Model(**{'id': 4, 'user-name': 'v'})]) == \
+            '[{"id": 3, "title": "Write"}, {"id": 4, "user-name": "v"}]'
+
+
+def test_encoders_per_instance():
+    apps = []
+    for title in ('one', 'two'):
+        app = Flask(__name__)
+        apify = Apify()
+
+        @apify.route('/todo')
+        def todo():
+            return Todo(1, 'Write')
+
+        apify.serializers.encoders.register(Todo, lambda t, x=title: x)
+        apify.init_app(app)
+        app.register_blueprint(apify.blueprint)
+        apps.append(app)
+
+    headers = [('Accept', 'application/json')]
+    for app, title in zip(apps, ('one', 'two')):
+        res = app.test_client().get('/todo', headers=headers)
+        assert res.get_json() == title
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import threading
+
+import pytest
+from flask import Flask, url_for
+
+from flask_apify import Apify
+from flask_apify.exc import ApiConflict, ApiUnauthorized
+from flask_apify.idempotency import MemoryIdempotencyBackend, StoredResponse
+
+
+def post_order(client, key=None, data=None, headers=(), **params):
+    headers = [('Accept', 'application/json')] + list(headers)
+    if key is not None:
+        headers.append(('Idempotency-Key', key))
+    return client.post(url_for('api.create_order', **params), headers=headers,
+                       data=data)
+
+
+class TestIdempotentRoute(object):
+
+    def test_replay_response(self, app, client):
+        first = post_order(client, 'abc')
+        second = post_order(client, 'abc')
+        assert first.status_code == second.status_code == 201
+        assert first.data == second.data
+        assert second.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first.headers
+        assert app.orders == 1
+
+    def test_process_different_keys(self, app, client):
+        post_order(client, 'abc')
+        res = post_order(client, 'def')
+        assert res.json == {'order': 2}
+
+    def test_process_requests_without_key(self, app, client):
+        post_order(client)
+        post_order(client)
+        assert app.orders == 2
+
+    def test_do_not_store_errors(self, app, client):
+        assert post_order(client, 'abc', fail=1).status_code == 500
+        assert post_order(client, 'abc').status_code == 201
+        assert app.orders == 2
+
+    def test_reject_key_reused_with_another_body(self, app, client):
+        post_order(client, 'abc', data=b'{"item": 1}')
+        res = post_order(client, 'abc', data=b'{"item": 2}')
+        assert res.status_code == 422
+        assert app.orders == 1
+
+    def test_scope_key_by_client(self, app, client):
+        post_order(client, 'abc', headers=[('Authorization', 'Bearer one')])
+        res = post_order(client, 'abc',
+                         headers=[('Authorization', 'Bearer two')])
+        assert res.json == {'order': 2}
+        assert 'Idempotent-Replayed' not in res.headers
+
+    def test_run_preprocessors_before_replay(self, apify, app, client):
+        post_order(client, 'abc')
+
+        @apify.preprocessor(endpoints=('create_order',))
+        def login_required(fn):
+            raise ApiUnauthorized()
+
+        assert post_order(client, 'abc').status_code == 401
+        assert app.orders == 1
+
+    def test_do_not_store_client_errors(self, apify, app, client):
+        @apify.postprocessor(endpoints=('create_order',))
+        def throttle(raw):
+            return {}, 429 if app.orders == 1 else 201
+
+        assert post_order(client, 'abc').status_code == 429
+        assert post_order(client, 'abc').status_code == 201
+        assert app.orders == 2
+
+
+@pytest.fixture
+def body_app():
+    app = Flask(__name__)
+    apify = Apify(app)
+    app.orders = []
+
+    @apify.route('/orders', methods=('POST',), idempotent=True,
+                 body_arg='order', max_body_size=64)
+    def create_order(order):
+        app.orders.append(order)
+        return {'order': len(app.orders)}, 201
+
+    app.register_blueprint(apify.blueprint)
+    return app
+
+
+class TestIdempotentRouteWithBody(object):
+
+    headers = [('Accept', 'application/json'),
+               ('Content-Type', 'application/json'),
+               ('Idempotency-Key', 'abc')]
+
+    def test_pass_body_to_view(self, body_app):
+        client = body_app.test_client()
+        res = client.post('/orders', data=b'{"a": 1}', headers=self.headers)
+        assert res.status_code == 201
+        assert body_app.orders == [{'a': 1}]
+
+        res = client.post('/orders', data=b'{"a": 1}', headers=self.headers)
+        assert res.headers['Idempotent-Replayed'] == 'true'
+        assert body_app.orders == [{'a': 1}]
+
+    def test_bound_body_without_content_length(self, body_app):
+        client = body_app.test_client()
+        data = b'[' + b'1, ' * 64 + b'1]'
+        res = client.post('/orders', input_stream=io.BytesIO(data),
+                          headers=self.headers)
+        assert res.status_code == 413
+        assert body_app.orders == []
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryIdempotencyBackend(object):
+
+    def test_expire_response(self):
+        clock = FakeClock()
+        backend = MemoryIdempotencyBackend(ttl=10, clock=clock)
+        assert backend.acquire('key') is None
+        backend.complete('key', StoredResponse(200, [], b'ok'))
+        assert backend.acquire('key').body == b'ok'
+
+        clock.now = 11
+        assert backend.acquire('key') is None
+
+    def test_evict_least_recently_used(self):
+        backend = MemoryIdempotencyBackend(max_keys=2)
+        for key in ('one', 'two', 'three'):
+            backend.acquire(key)
+            backend.complete(key, StoredResponse(200, [], key))
+        assert backend.acquire('one') is None
+        assert backend.acquire('three').body == 'three'
+
+    def test_wait_for_in_flight_request(self):
+        backend = MemoryIdempotencyBackend()
+        assert backend.acquire('key') is None
+
+        result = []
+        waiter = threading.Thread(
+            target=lambda: result.append(backend.acquire('key')))
+        waiter.start()
+        waiter.join(0.05)
+        assert waiter.is_alive()
+
+        backend.complete('key', StoredResponse(201, [], b'done'))
+        waiter.join(1)
+        assert result[0].body == b'done'
+
+    def test_acquire_released_key(self):
+        backend = MemoryIdempotencyBackend()
+        backend.acquire('key')
+        backend.release('key')
+        assert backend.acquire('key') is None
+
+    def test_conflict_if_in_flight_too_long(self):
+        backend = MemoryIdempotencyBackend(wait_timeout=0.01)
+        backend.acquire('key')
+        with pytest.raises(ApiConflict):
+            backend.acquire('key')
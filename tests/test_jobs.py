@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from flask_apify import Apify
+from flask_apify.exc import ApiForbidden, ApiServiceUnavailable
+from flask_apify.jobs import JobExecutor
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+@pytest.fixture
+def apify():
+    return Apify(debug_html=True)
+
+
+@pytest.fixture
+def app(apify):
+    app = Flask(__name__)
+    app.release = threading.Event()
+
+    @apify.route('/reports', methods=('POST',), body_arg='params', job=True)
+    def build_report(params):
+        app.release.wait(5)
+        return {'rows': params['rows']}, 200, {'X-Rows': str(params['rows'])}
+
+    @apify.route('/forbidden', job=True)
+    def forbidden():
+        raise ApiForbidden()
+
+    @apify.route('/bomb', job=True)
+    def bomb():
+        raise RuntimeError('boom')
+
+    apify.init_app(app)
+    app.register_blueprint(apify.blueprint)
+    yield app
+    app.release.set()
+    apify.jobs.shutdown()
+
+
+def wait_done(client, location):
+    for _ in range(100):
+        status = client.get(location, headers=json_headers).json
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError('job is not finished')
+
+
+def test_accept_job(app, client):
+    res = client.post('/reports', data='{"rows": 3}', headers=json_headers +
+                      [('Content-Type', 'application/json')])
+    assert res.status_code == 202
+    job = res.json
+    assert job['status'] in ('pending', 'running')
+    assert res.headers['Location'] == '/jobs/%s' % job['id']
+
+    res = client.get('/jobs/%s/result' % job['id'], headers=json_headers)
+    assert res.status_code == 202
+
+    app.release.set()
+    status = wait_done(client, '/jobs/%s' % job['id'])
+    assert status['status'] == 'done'
+    assert status['result'] == '/jobs/%s/result' % job['id']
+
+    res = client.get(status['result'], headers=json_headers)
+    assert res.status_code == 200
+    assert res.headers['X-Rows'] == '3'
+    assert res.json == {'rows': 3}
+
+    res = client.get(status['result'], headers=[('Accept', 'text/html')])
+    assert res.mimetype == 'text/html'
+
+
+@pytest.mark.parametrize('endpoint,code', [('/forbidden', 403),
+                                           ('/bomb', 500)])
+def test_failed_job(client, endpoint, code):
+    location = client.get(endpoint, headers=json_headers).headers['Location']
+    status = wait_done(client, location)
+    assert status['status'] == 'failed'
+
+    for _ in range(2):
+        res = client.get(location + '/result', headers=json_headers)
+        assert res.status_code == code
+        assert res.json['message'] == status['error']
+
+
+def test_enable_jobs_once(apify, app):
+    with pytest.raises(RuntimeError):
+        apify.enable_jobs(max_workers=8)
+
+
+def test_unknown_job(client):
+    res = client.get('/jobs/unknown', headers=json_headers)
+    assert res.status_code == 404
+
+
+def test_reject_over_pending_limit(app, apify, client):
+    apify.jobs.max_pending = 1
+    headers = json_headers + [('Content-Type', 'application/json')]
+    res = client.post('/reports', data='{"rows": 1}', headers=headers)
+    assert res.status_code == 202
+    res = client.post('/reports', data='{"rows": 2}', headers=headers)
+    assert res.status_code == 503
+
+
+class TestJobExecutor(object):
+
+    def test_limit_pending_jobs(self):
+        release = threading.Event()
+        executor = JobExecutor(max_workers=1, max_pending=1)
+        try:
+            executor.submit(release.wait)
+            with pytest.raises(ApiServiceUnavailable):
+                executor.submit(release.wait)
+        finally:
+            release.set()
+            executor.shutdown()
+        assert executor.pending == 0
+
+    def test_expire_finished_jobs(self):
+        now = [0.0]
+        executor = JobExecutor(max_results=2, ttl=10, clock=lambda: now[0])
+        jobs = [executor.submit(lambda: i) for i in range(3)]
+        executor.shutdown()
+
+        assert executor.get(jobs[0].id) is None
+        assert executor.get(jobs[2].id).status == 'done'
+
+        now[0] = 11
+        assert executor.get(jobs[2].id) is None
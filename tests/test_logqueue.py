@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from io import StringIO
+
+import pytest
+
+from flask_apify import Apify
+from flask_apify.logqueue import LogQueue
+
+
+class BlockingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.event = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.event.wait(5)
+        self.records.append(self.format(record))
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger('test-logqueue')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    request.addfinalizer(lambda: logger.handlers.clear())
+    return logger
+
+
+def test_emit_in_background(logger):
+    stream = StringIO()
+    logger.addHandler(logging.StreamHandler(stream))
+    log_queue = LogQueue(logger).start()
+    try:
+        1 // 0
+    except ZeroDivisionError:
+        logger.error('Exception on %s %s', 'GET', '/foo', exc_info=True)
+    log_queue.stop()
+
+    assert 'Exception on GET /foo' in stream.getvalue()
+    assert 'ZeroDivisionError' in stream.getvalue()
+    assert logger.handlers[-1].stream is stream
+
+
+def test_drop_records_if_queue_is_full(logger):
+    handler = BlockingHandler()
+    logger.addHandler(handler)
+    log_queue = LogQueue(logger, maxsize=2).start()
+
+    for i in range(10):
+        logger.error('error %d', i)
+    logger.warning('warning')
+
+    handler.event.set()
+    log_queue.stop()
+
+    # The listener may take one record out of queue before it blocks
+    assert len(handler.records) in (2, 3)
+    assert log_queue.dropped['WARNING'] == 1
+    assert sum(log_queue.dropped.values()) + len(handler.records) == 11
+
+
+def test_apify_log_queue(app, apify, client):
+    stream = StringIO()
+    handler = logging.StreamHandler(stream)
+    apify.logger.addHandler(handler)
+    try:
+        log_queue = apify.start_log_queue()
+        assert apify.start_log_queue() is log_queue
+        assert handler not in apify.logger.handlers
+
+        client.get('/bomb', headers=[('Accept', 'application/json')])
+        apify.stop_log_queue()
+
+        assert apify.log_queue is None
+        assert 'Exception on GET /bomb' in stream.getvalue()
+    finally:
+        apify.logger.removeHandler(handler)
+
+
+def test_start_once_per_logger(logger):
+    logger.addHandler(logging.StreamHandler(StringIO()))
+    log_queue = LogQueue(logger).start()
+    try:
+        with pytest.raises(RuntimeError):
+            LogQueue(logger).start()
+        assert len(logger.handlers) == 1
+    finally:
+        log_queue.stop()
+
+
+def test_apify_log_queue_of_shared_logger(app, apify):
+    other = Apify()
+    assert other.logger is apify.logger
+    apify.start_log_queue()
+    try:
+        with pytest.raises(RuntimeError):
+            other.start_log_queue()
+        assert other.log_queue is None
+    finally:
+        apify.stop_log_queue()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+from flask import Flask, url_for
+
+from flask_apify import Apify
+from flask_apify.memoize import MemoEntry, MemoStore
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    apify = Apify(app)
+    app.calls = 0
+
+    @apify.route('/users/<int:user_id>/orders',
+                 memoize=('user:{user_id}', 'order:*'))
+    def user_orders(user_id):
+        app.calls += 1
+        return {'user': user_id, 'calls': app.calls}
+
+    app.register_blueprint(apify.blueprint)
+    return app
+
+
+def get_orders(client, user_id):
+    return client.get(url_for('api.user_orders', user_id=user_id),
+                      headers=json_headers)
+
+
+class TestMemoizedRoute(object):
+
+    def test_serve_memoized_response(self, app, client):
+        first = get_orders(client, 1)
+        second = get_orders(client, 1)
+        assert first.data == second.data
+        assert second.mimetype == 'application/json'
+        assert app.calls == 1
+
+    def test_key_includes_url_arguments(self, app, client):
+        get_orders(client, 1)
+        get_orders(client, 2)
+        assert app.calls == 2
+
+    def test_invalidate_by_tag(self, app, apify, client):
+        get_orders(client, 1)
+        get_orders(client, 2)
+        assert apify.invalidate('user:1') == 1
+
+        assert get_orders(client, 1).json['calls'] == 3
+        assert get_orders(client, 2).json['calls'] == 2
+
+    def test_invalidate_namespace(self, app, apify, client):
+        get_orders(client, 1)
+        get_orders(client, 2)
+        assert apify.invalidate('order:42') == 2
+
+
+def entry(body, *tags):
+    return MemoEntry(body, 200, 'application/json', tags)
+
+
+class TestMemoStore(object):
+
+    def test_invalidate_namespace_wildcard(self):
+        store = MemoStore()
+        store.put('one', entry(b'1', 'order:1'))
+        store.put('two', entry(b'2', 'order:2'))
+        store.put('three', entry(b'3', 'user:1'))
+        assert store.invalidate('order:*') == 2
+        assert store.get('three') is not None
+        assert store._namespaces == {'user': set(['user:1'])}
+
+    def test_evict_least_recently_used(self):
+        store = MemoStore(max_size=4)
+        store.put('one', entry(b'11', 'a'))
+        store.put('two', entry(b'22', 'b'))
+        store.get('one')
+        store.put('three', entry(b'33', 'c'))
+        assert store.get('two') is None
+        assert store.size == 4
+        assert set(store._index) == set(['a', 'c'])
+
+    def test_do_not_store_stale_entry(self):
+        store = MemoStore()
+        generation = store.generation
+        store.invalidate('user:1')
+        assert not store.put('one', entry(b'1', 'user:2'), generation)
+        assert store.get('one') is None
+
+    def test_store_entry_of_other_namespace(self):
+        store = MemoStore()
+        generation = store.generation
+        store.invalidate('order:1')
+        assert store.put('one', entry(b'1', 'user:2'), generation)
+        assert store.put('two', entry(b'2', 'plain'), generation)
+        assert not store.put('three', entry(b'3', 'order:*'), generation)
+
+
+def test_reject_template_of_missing_argument():
+    apify = Apify()
+    with pytest.raises(ValueError):
+        @apify.route('/orders', memoize=('order:{order_id}',))
+        def orders():
+            pass
+
+
+def test_accept_template_of_default_argument():
+    apify = Apify()
+
+    @apify.route('/orders', memoize=('order:{page}',), defaults={'page': 1})
+    @apify.route('/orders/<int:page>', memoize=('order:{page}',))
+    def orders(page):
+        pass
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import tracemalloc
+
+import pytest
+from flask import Flask, url_for
+
+from flask_apify import Apify
+from flask_apify.memory import SizeHistogram
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    apify = Apify(app, debug_html=True)
+    apify.enable_memory_profiler(sample_rate=1, rule='/_debug/memory')
+
+    @apify.route('/export')
+    def export():
+        return {'items': ['item %d' % i for i in range(1000)]}
+
+    @apify.route('/ping')
+    def ping():
+        return {'value': 'pong'}
+
+    app.register_blueprint(apify.blueprint)
+    return app
+
+
+def test_size_histogram():
+    sizes = SizeHistogram()
+    for size in (0, 1, 3, 4, 1000):
+        sizes.add(size)
+    assert sizes.as_dict() == {
+        'count': 5,
+        'total': 1008,
+        'max': 1000,
+        'buckets': {'<1': 1, '<2': 1, '<4': 1, '<8': 1, '<1024': 1},
+    }
+
+
+def test_profile_requests(apify, client):
+    client.get(url_for('api.export'), headers=json_headers)
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    report = apify.memory_profiler.report()
+    export = report['api.export']
+    assert export['sizes']['count'] == 1
+    assert export['sizes']['max'] > 10000
+
+    sample, = export['samples']
+    assert sample['status'] == 200
+    assert set(sample['stages']) == set(['preprocess', 'body', 'view',
+                                         'postprocess', 'serialize',
+                                         'finalize'])
+    assert sample['stages']['view']['size_diff'] > 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_keep_bounded_number_of_samples(apify, client):
+    apify.memory_profiler.endpoints.clear()
+    apify.memory_profiler.max_samples = 2
+    for _ in range(3):
+        client.get(url_for('api.ping'), headers=json_headers)
+
+    ping = apify.memory_profiler.report()['api.ping']
+    assert ping['sizes']['count'] == 3
+    assert len(ping['samples']) == 2
+
+
+def test_sizes_only_if_not_sampled(apify, client):
+    apify.memory_profiler.sample_rate = 0
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    ping = apify.memory_profiler.report()['api.ping']
+    assert ping['sizes']['count'] == 1
+    assert ping['samples'] == []
+
+
+def test_report_view(apify, client):
+    apify.memory_profiler.sample_rate = 0
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    res = client.get(url_for('api.memory_report'), headers=json_headers)
+    assert res.json['api.ping']['sizes']['count'] == 1
+
+    res = client.get(url_for('api.memory_report'),
+                     headers=[('Accept', 'text/html')])
+    assert res.status_code == 200
+    assert b'api.ping' in res.data
+
+
+def test_report_route_is_opt_in():
+    app = Flask(__name__)
+    apify = Apify(app)
+    apify.enable_memory_profiler()
+    app.register_blueprint(apify.blueprint)
+
+    assert 'api.memory_report' not in app.view_functions
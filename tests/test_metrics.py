@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import pytest
+from flask import Flask, url_for
+
+from flask_apify import Apify
+from flask_apify.exc import ApiError
+from flask_apify.metrics import SharedMetrics
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+@pytest.fixture
+def app(tmpdir):
+    app = Flask(__name__)
+    apify = Apify(app, debug_html=True)
+    apify.enable_metrics(str(tmpdir.join('metrics')), max_endpoints=8,
+                         max_workers=4, rule='/_debug/metrics')
+
+    @apify.route('/ping')
+    def ping():
+        return {'value': 'pong'}
+
+    @apify.route('/bomb')
+    def bomb():
+        raise ApiError()
+
+    @apify.route('/crash')
+    def crash():
+        raise RuntimeError('crash')
+
+    app.register_blueprint(apify.blueprint)
+    yield app
+    apify.metrics.close()
+
+
+@pytest.fixture
+def metrics(app):
+    return app.extensions['apify'].metrics
+
+
+def test_count_requests(client, metrics):
+    for _ in range(3):
+        client.get(url_for('api.ping'), headers=json_headers)
+    client.get(url_for('api.bomb'), headers=json_headers)
+
+    report = metrics.report()
+    ping, bomb = report['api.ping'], report['api.bomb']
+    assert ping['count'] == 3
+    assert ping['errors'] == 0
+    assert ping['bytes'] > 0
+    assert ping['mean'] >= 0
+    assert sum(ping['buckets'].values()) == 3
+    assert ping['p50'] <= ping['p99']
+    assert bomb['count'] == 1
+    assert bomb['errors'] == 1
+
+
+def test_count_unhandled_errors(app, client, metrics):
+    app.testing = False
+    res = client.get(url_for('api.crash'), headers=json_headers)
+    assert res.status_code == 500
+
+    crash = metrics.report()['api.crash']
+    assert crash['count'] == 1
+    assert crash['errors'] == 1
+
+
+def test_report_route(client):
+    client.get(url_for('api.ping'), headers=json_headers)
+    res = client.get(url_for('api.metrics_report'), headers=json_headers)
+    assert res.status_code == 200
+    assert res.json['api.ping']['count'] == 1
+
+
+def test_report_route_is_opt_in(tmpdir):
+    app = Flask(__name__)
+    apify = Apify(app)
+    metrics = apify.enable_metrics(str(tmpdir.join('metrics')))
+    app.register_blueprint(apify.blueprint)
+
+    assert 'api.metrics_report' not in app.view_functions
+    metrics.close()
+
+
+def test_reopen_file(client, metrics):
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    other = SharedMetrics(metrics.path, max_endpoints=8, max_workers=4)
+    try:
+        assert other.report()['api.ping']['count'] == 1
+    finally:
+        other.close()
+
+
+def test_reset_file_of_other_layout(client, metrics):
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    other = SharedMetrics(metrics.path, max_endpoints=4, max_workers=4)
+    try:
+        assert other.report() == {}
+    finally:
+        other.close()
+
+
+def test_drop_requests_over_endpoint_limit(tmpdir):
+    app = Flask(__name__)
+    apify = Apify(app)
+    metrics = apify.enable_metrics(str(tmpdir.join('metrics')),
+                                   max_endpoints=1)
+
+    @apify.route('/one')
+    def one():
+        return {}
+
+    @apify.route('/two')
+    def two():
+        return {}
+
+    app.register_blueprint(apify.blueprint)
+    client = app.test_client()
+    client.get('/one', headers=json_headers)
+    client.get('/two', headers=json_headers)
+
+    assert list(metrics.report()) == ['api.one']
+    assert metrics.dropped == 1
+    metrics.close()
+
+
+def test_count_requests_of_threads(app, metrics):
+    def send():
+        client = app.test_client()
+        for _ in range(50):
+            client.get('/ping', headers=json_headers)
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ping = metrics.report()['api.ping']
+    assert ping['count'] == 200
+    assert sum(ping['buckets'].values()) == 200
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_aggregate_workers(app, client, metrics):
+    client.get(url_for('api.ping'), headers=json_headers)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for _ in range(2):
+                app.test_client().get('/ping', headers=json_headers)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert metrics.report()['api.ping']['count'] == 3
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+from flask import url_for
+
+from flask_apify.ranges import RangeStore
+
+
+json_headers = [('Accept', 'application/json')]
+
+
+@pytest.fixture
+def full(client):
+    return client.get(url_for('api.export'), headers=json_headers)
+
+
+class TestRangeRequests(object):
+
+    def test_full_response_has_etag(self, full):
+        assert full.status_code == 200
+        assert full.headers['Accept-Ranges'] == 'bytes'
+        assert full.get_etag()[0]
+
+    def test_resume_from_stored_body(self, app, client, full):
+        etag, _ = full.get_etag()
+        res = client.get(url_for('api.export'), headers=json_headers + [
+            ('Range', 'bytes=10-19'),
+            ('If-Range', '"%s"' % etag),
+        ])
+        assert res.status_code == 206
+        assert res.data == full.data[10:20]
+        assert res.headers['Content-Range'] == \
+            'bytes 10-19/%d' % len(full.data)
+        assert app.export_calls == 1
+
+    def test_call_view_if_etag_does_not_match(self, app, client, full):
+        res = client.get(url_for('api.export'), headers=json_headers + [
+            ('Range', 'bytes=10-19'),
+            ('If-Range', '"outdated"'),
+        ])
+        assert res.status_code == 200
+        assert res.data == full.data
+        assert app.export_calls == 2
+
+    def test_range_without_if_range(self, app, client, full):
+        res = client.get(url_for('api.export'), headers=json_headers + [
+            ('Range', 'bytes=-5'),
+        ])
+        assert res.status_code == 206
+        assert res.data == full.data[-5:]
+        assert app.export_calls == 2
+
+    def test_not_satisfiable_range(self, client, full):
+        res = client.get(url_for('api.export'), headers=json_headers + [
+            ('Range', 'bytes=100000-'),
+            ('If-Range', '"%s"' % full.get_etag()[0]),
+        ])
+        assert res.status_code == 416
+        assert res.headers['Content-Range'] == 'bytes */%d' % len(full.data)
+
+    def test_key_includes_mimetype(self, app, client, full):
+        res = client.get(url_for('api.export'), headers=[
+            ('Accept', 'text/html'),
+            ('Range', 'bytes=0-9'),
+            ('If-Range', '"%s"' % full.get_etag()[0]),
+        ])
+        assert res.status_code == 200
+        assert app.export_calls == 2
+
+
+class TestRangeStore(object):
+
+    def test_spool_large_body(self):
+        store = RangeStore(spool_size=4)
+        small = store.put('small', b'abc', 'text/plain')
+        large = store.put('large', b'abcdefgh', 'text/plain')
+        assert small.buffer == b'abc'
+        assert not isinstance(large.buffer, bytes)
+
+        f = large.open()
+        f.seek(2)
+        assert f.read(3) == b'cde'
+        assert f.read() == b'fgh'
+        assert large.open().read() == b'abcdefgh'
+
+    def test_evict_least_recently_used(self):
+        store = RangeStore(max_size=8)
+        store.put('one', b'1111', 'text/plain')
+        store.put('two', b'2222', 'text/plain')
+        store.get('one')
+        store.put('three', b'3333', 'text/plain')
+        assert store.get('two') is None
+        assert store.get('one') is not None
+        assert store.size == 8
+
+    def test_do_not_store_too_large_body(self):
+        store = RangeStore(max_size=2)
+        body = store.put('one', b'1111', 'text/plain')
+        assert body.etag
+        assert store.get('one') is None
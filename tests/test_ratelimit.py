@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from flask import url_for
+from flask_apify.ratelimit import (
+    MemoryBackend, RateLimit, RateLimitBackend
+)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def backend(clock):
+    return MemoryBackend(stripes=2, max_keys=2, clock=clock)
+
+
+def test_base_backend_raises_not_implemented_error():
+    with pytest.raises(NotImplementedError):
+        RateLimitBackend().consume('key', 1, 1)
+
+
+class TestMemoryBackend(object):
+
+    def test_consume_until_empty(self, backend):
+        assert backend.consume('a', 1, 2).allowed
+        assert backend.consume('a', 1, 2).remaining == 0
+        state = backend.consume('a', 1, 2)
+        assert not state.allowed
+        assert state.retry_after == 1
+
+    def test_refill(self, backend, clock):
+        backend.consume('a', 1, 1)
+        assert not backend.consume('a', 1, 1).allowed
+        clock.now = 1.0
+        assert backend.consume('a', 1, 1).allowed
+
+    def test_refill_up_to_capacity(self, backend, clock):
+        backend.consume('a', 1, 2)
+        clock.now = 100.0
+        assert backend.consume('a', 1, 2).remaining == 1
+
+    def test_keys_are_independent(self, backend):
+        backend.consume('a', 1, 1)
+        assert backend.consume('b', 1, 1).allowed
+
+    def test_evict_oldest_buckets(self):
+        backend = MemoryBackend(stripes=1, max_keys=1)
+        backend.consume('a', 1, 1)
+        backend.consume('b', 1, 1)
+        assert list(backend._buckets[0]) == ['b']
+
+
+class TestRateLimit(object):
+
+    def test_rate_per_second(self):
+        limit = RateLimit(10, per=60)
+        assert limit.rate == 10 / 60.
+        assert limit.capacity == 10
+        assert RateLimit(10, burst=20).capacity == 20
+
+    def test_headers(self, backend):
+        limit = RateLimit(1)
+        backend.consume('a', limit.rate, limit.capacity)
+        state = backend.consume('a', limit.rate, limit.capacity)
+        assert limit.headers(state) == [
+            ('RateLimit-Limit', '1'),
+            ('RateLimit-Remaining', '0'),
+            ('RateLimit-Reset', '1'),
+            ('Retry-After', '1'),
+        ]
+
+
+class TestRateLimitedRoute(object):
+
+    headers = [('Accept', 'application/json')]
+
+    def test_reject_over_limit(self, client):
+        for remaining in ('1', '0'):
+            res = client.get(url_for('api.limited'), headers=self.headers)
+            assert res.status_code == 200
+            assert res.headers['RateLimit-Remaining'] == remaining
+
+        res = client.get(url_for('api.limited'), headers=self.headers)
+        assert res.status_code == 429
+        assert res.mimetype == 'application/json'
+        assert res.json['error'] == 'Too Many Requests'
+        assert int(res.headers['Retry-After']) > 0
+
+    def test_cache_error_body(self, apify, client):
+        for _ in range(4):
+            client.get(url_for('api.limited'), headers=self.headers)
+        assert [(code, mimetype) for code, _, _, mimetype
+                in apify._error_bodies] == [(429, 'application/json')]
+
+    def test_skip_if_no_identity(self, app, apify, client):
+        app.view_functions['api.limited'].api_route.rate_limit.key_func = \
+            lambda ctx: None
+        for _ in range(4):
+            res = client.get(url_for('api.limited'), headers=self.headers)
+            assert res.status_code == 200
+            assert 'RateLimit-Limit' not in res.headers
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from io import StringIO
+
+import pytest
+from flask import url_for
+
+from flask_apify.recorder import (
+    RequestRecorder, load_samples, replay, to_request_spec
+)
+
+
+class ListWriter(list):
+
+    def write(self, entry):
+        self.append(entry)
+
+
+@pytest.fixture
+def writer(apify):
+    writer = ListWriter()
+    apify.request_recorder = RequestRecorder(writer=writer, sample_rate=1)
+    return writer
+
+
+def test_record_request(client, writer):
+    client.get(url_for('api.ping', value=201) + '?x=1',
+               headers=[('Accept', 'application/json'),
+                        ('Authorization', 'secret')])
+
+    entry, = writer
+    assert entry['e'] == 'api.ping'
+    assert entry['m'] == 'GET'
+    assert entry['p'] == '/ping/201'
+    assert entry['q'] == 'x=1'
+    assert entry['h'] == [['Accept', 'application/json']]
+    assert entry['s'] == 200
+    assert entry['r'] > 0
+    assert entry['d'] >= 0
+    assert 'b' not in entry
+
+
+def test_record_request_body(client, writer):
+    res = client.post(url_for('api.echo'), data='{"x": 1}',
+                      headers=[('Accept', 'application/json'),
+                               ('Content-Type', 'application/json')])
+    assert res.json == {'body': {'x': 1}}
+
+    entry, = writer
+    assert entry['n'] == 8
+    spec = to_request_spec(entry)
+    assert spec.data == b'{"x": 1}'
+    assert spec.name == 'api.echo'
+
+
+def test_skip_large_body(apify, client, writer):
+    apify.request_recorder.max_body = 4
+    res = client.post(url_for('api.echo'), data='{"x": 1}',
+                      headers=[('Accept', 'application/json'),
+                               ('Content-Type', 'application/json')])
+    assert res.json == {'body': {'x': 1}}
+
+    entry, = writer
+    assert entry['n'] == 8
+    assert 'b' not in entry
+
+
+def test_not_sampled(apify, client, writer):
+    apify.request_recorder.sample_rate = 0
+    client.get(url_for('api.ping'), headers=[('Accept', 'application/json')])
+    assert writer == []
+
+
+def test_replay(app, apify, client, writer):
+    headers = [('Accept', 'application/json'),
+               ('Content-Type', 'application/json')]
+    client.get(url_for('api.ping'), headers=headers)
+    client.post(url_for('api.echo'), data='{"x": 1}', headers=headers)
+    client.get(url_for('api.forbidden'), headers=headers)
+
+    stream = StringIO(u''.join(json.dumps(entry) + '\n' for entry in writer))
+    apify.request_recorder = None
+    result = replay(app, load_samples(stream), concurrency=2, total=30)
+
+    assert result.count == 30
+    report = result.as_dict()['endpoints']
+    assert set(report) == set(['api.ping', 'api.echo', 'api.forbidden'])
+    assert set(report['api.echo']['statuses']) == set([200])
+    assert set(report['api.forbidden']['statuses']) == set([403])
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from flask_apify import Apify
+from flask import Flask
+
+from flask_apify.registry import (
+    MimetypeIndex, MimetypeRegistry, parse_mimetype, parse_params, quality
+)
+
+
+def test_parse_mimetype():
+    assert parse_mimetype('Application/JSON; charset=utf-8') == \
+            ('application', 'json')
+    assert parse_mimetype('*') == ('*', '*')
+    assert parse_mimetype('text/*') == ('text', '*')
+
+
+def test_parse_params():
+    assert parse_params('text/html; Level=1; q=0.5') == \
+            frozenset([('level', '1')])
+    assert parse_params('text/html') == frozenset()
+
+
+def test_quality_of_most_specific_range():
+    accept = [('*/*', 1), ('application/json', 0.1)]
+    assert quality(accept, 'application/json') == 0.1
+    assert quality(accept, 'text/html') == 1
+    assert quality([('text/*', 1)], 'application/json') == 0
+
+
+class TestMimetypeIndex(object):
+
+    @pytest.fixture
+    def index(self):
+        return MimetypeIndex({
+            'application/json': 1,
+            'application/javascript': 2,
+            'text/html': 3,
+        })
+
+    def test_type_buckets(self, index):
+        assert index.types == {
+            'application': ('application/json', 'application/javascript'),
+            'text': ('text/html',),
+        }
+
+    def test_exact_match(self, index):
+        assert index.best_match([('text/html', 1)]) == 'text/html'
+        assert index.best_match([('text/xml', 1)]) is None
+
+    def test_wildcard_match(self, index):
+        assert index.best_match([('application/*', 1)]) == 'application/json'
+        assert index.best_match([('*/json', 1)]) is None
+
+    def test_prefer_quality_then_specificity(self, index):
+        assert index.best_match([('application/*', 1),
+                                 ('text/html', 0.5)]) == 'application/json'
+        assert index.best_match([('application/*', 1),
+                                 ('application/javascript', 1)]) == \
+                'application/javascript'
+
+    def test_skip_not_acceptable(self, index):
+        assert index.best_match([('text/html', 0)]) is None
+
+    def test_exclude_by_specific_range(self, index):
+        assert index.best_match([('application/json', 0), ('*/*', 1)]) == \
+                'application/javascript'
+        assert index.best_match([('application/*', 0),
+                                 ('*/*', 1)]) == 'text/html'
+
+    def test_quality_of_most_specific_range(self, index):
+        assert index.best_match([('*/*', 1), ('application/json', 0.1)]) == \
+                'application/javascript'
+
+    def test_match_params(self, index):
+        assert index.best_match([('text/html; level=1', 1)]) is None
+        assert index.best_match([('text/html; level=1', 1),
+                                 ('text/*', 0.5)]) == 'text/html'
+
+
+def test_negotiate_request_mimetype():
+    app = Flask(__name__)
+    apify = Apify(app)
+
+    @apify.route('/ping')
+    def ping():
+        return {'value': 'pong'}
+
+    app.register_blueprint(apify.blueprint)
+    client = app.test_client()
+
+    res = client.get('/ping', headers=[
+        ('Accept', 'application/json; q=0, application/javascript')])
+    assert res.mimetype == 'application/javascript'
+
+    res = client.get('/ping', headers=[
+        ('Accept', 'application/json; q=0, */*')])
+    assert res.status_code == 200
+    assert res.mimetype != 'application/json'
+
+    res = client.get('/ping', headers=[('Accept', 'application/json; q=0')])
+    assert res.status_code == 406
+
+
+class TestMimetypeRegistry(object):
+
+    def test_read_only_mapping(self):
+        registry = MimetypeRegistry({'text/html': 1})
+        assert registry['text/html'] == 1
+        assert dict(registry) == {'text/html': 1}
+        with pytest.raises(TypeError):
+            registry['text/html'] = 2
+
+    def test_register_rebuild_index(self):
+        registry = MimetypeRegistry()
+        index = registry.index
+        registry.register('text/html', 1)
+        assert registry.index is not index
+        assert registry.lookup('text/html') == 1
+
+    def test_bind_on_rebuild(self):
+        class Bindable(object):
+            def bind(self, registry):
+                return 'bound'
+
+        fn = Bindable()
+        registry = MimetypeRegistry({'text/html': fn})
+        assert registry['text/html'] is fn
+        assert registry.lookup('text/html') == 'bound'
+
+
+def test_registry_is_not_shared_between_instances():
+    one, two = Apify(), Apify()
+
+    @one.serializer('application/xml')
+    def to_xml(raw):
+        return raw
+
+    assert 'application/xml' in one.serializers
+    assert 'application/xml' not in two.serializers
+
+
+class TestLazyRegistration(object):
+
+    path = 'flask_apify.serializers.json:to_json'
+
+    def test_resolve_on_lookup(self):
+        from flask_apify.serializers.json import to_json
+
+        registry = MimetypeRegistry({'application/json': self.path})
+        assert registry.index.exact['application/json'] == self.path
+        assert registry.lookup('application/json') is to_json
+        assert registry.index.exact['application/json'] is to_json
+
+    def test_resolve_on_item_access(self):
+        from flask_apify.serializers.json import to_json
+
+        registry = MimetypeRegistry({'application/json': self.path})
+        assert registry['application/json'] is to_json
+
+    def test_bind_resolved_callable(self):
+        from flask_apify.serializers.json import to_json
+
+        registry = MimetypeRegistry({
+            'application/json': self.path,
+            'application/javascript':
+                'flask_apify.serializers.jsonp:to_javascript',
+        })
+        jsonp = registry.lookup('application/javascript')
+        assert jsonp.json_serializer is to_json
+
+
+def test_debug_html_is_opt_in():
+    assert 'text/html' not in Apify().serializers
+    assert Apify().blueprint.template_folder is None
+
+    apify = Apify(debug_html=True)
+    assert 'text/html' in apify.serializers
+    assert apify.blueprint.template_folder == 'templates'
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import datetime
+
+import pytest
+
+from flask_apify.exc import ApiUnprocessableEntity
+from flask_apify.schema import (
+    Field, Validator, compile_schema, join_path
+)
+
+
+def errors_of(validator, data):
+    with pytest.raises(ApiUnprocessableEntity) as exc:
+        validator(data)
+    return exc.value.errors
+
+
+def test_join_path():
+    assert join_path('', 'title') == 'title'
+    assert join_path('tags', 0) == 'tags.0'
+
+
+def test_compile_schema_once():
+    schema = {'title': str}
+    assert compile_schema(schema) is compile_schema(schema)
+    assert compile_schema(schema) is not compile_schema({'title': str})
+
+
+class TestValidator(object):
+
+    @pytest.fixture
+    def validator(self):
+        return Validator({
+            'title': Field(str, min_length=1, max_length=8),
+            'done': Field(bool, default=False),
+            'priority': Field(int, required=False, min=1, max=3),
+            'state': Field(str, required=False, choices=('open', 'closed')),
+            'tags': [str],
+            'author': {'name': str, 'email': Field(str, nullable=True)},
+        })
+
+    @pytest.fixture
+    def todo(self):
+        return {
+            'title': 'Write',
+            'tags': ['docs'],
+            'author': {'name': 'vital', 'email': None},
+        }
+
+    def test_valid_data(self, validator, todo):
+        data = validator(todo)
+        assert data == dict(todo, done=False)
+        assert 'done' not in todo
+
+    def test_missing_fields(self, validator):
+        assert errors_of(validator, {}) == {
+            'title': 'Missing required field.',
+            'tags': 'Missing required field.',
+            'author': 'Missing required field.',
+        }
+
+    def test_invalid_types(self, validator, todo):
+        todo.update(title=1, done='yes', priority=True)
+        assert errors_of(validator, todo) == {
+            'title': 'Invalid type, expected string.',
+            'done': 'Invalid type, expected boolean.',
+            'priority': 'Invalid type, expected integer.',
+        }
+
+    def test_constraints(self, validator, todo):
+        todo.update(title='', priority=4, state='done')
+        assert errors_of(validator, todo) == {
+            'title': 'Length must be at least 1.',
+            'priority': 'Must be at most 3.',
+            'state': 'Must be one of: closed, open.',
+        }
+
+    def test_unhashable_choice(self, validator, todo):
+        todo.update(state=['open'])
+        assert errors_of(validator, todo)['state'] == \
+            'Invalid type, expected string.'
+        validator = Validator({'state': Field(choices=('open', 'closed'))})
+        assert errors_of(validator, {'state': ['open']}) == {
+            'state': 'Must be one of: closed, open.',
+        }
+
+    def test_bounds_of_any_value(self):
+        validator = Validator({
+            'score': Field(float, max=float('inf')),
+            'day': Field(min=datetime.date(2020, 1, 1)),
+        })
+        data = {'score': 1.5, 'day': datetime.date(2021, 1, 1)}
+        assert validator(data) == data
+        assert errors_of(validator, {'score': 1, 'day': 'today'}) == {
+            'day': 'Must be at least 2020-01-01.',
+        }
+
+    def test_nested_errors(self, validator, todo):
+        todo.update(tags=['docs', 42], author={'email': 'me'})
+        assert errors_of(validator, todo) == {
+            'tags.1': 'Invalid type, expected string.',
+            'author.name': 'Missing required field.',
+        }
+
+    def test_null_value(self, validator, todo):
+        todo['title'] = None
+        assert errors_of(validator, todo) == {
+            'title': 'Field may not be null.',
+        }
+
+    def test_invalid_root(self, validator):
+        assert errors_of(validator, []) == {
+            '': 'Invalid type, expected object.',
+        }
+
+    def test_list_schema(self):
+        validator = Validator([{'id': int, 'ok': Field(bool, default=True)}])
+        assert validator([{'id': 1}]) == [{'id': 1, 'ok': True}]
+        assert errors_of(validator, [{'id': 1}, {}]) == {
+            '1.id': 'Missing required field.',
+        }
+
+    def test_callable_default(self):
+        validator = Validator({'tags': Field(list, default=list)})
+        one, two = validator({}), validator({})
+        assert one == {'tags': []}
+        assert one['tags'] is not two['tags']
+
+    def test_copy_mutable_default(self):
+        validator = Validator({'tags': Field(list, default=[])})
+        one, two = validator({}), validator({})
+        one['tags'].append('docs')
+        assert two == {'tags': []}
+
+    def test_length_of_unsized_value(self):
+        validator = Validator({'code': Field(min_length=1, max_length=8)})
+        assert validator({'code': 'abc'}) == {'code': 'abc'}
+        assert errors_of(validator, {'code': 42}) == {
+            'code': 'Invalid length.',
+        }
+
+    def test_custom_type(self):
+        class Point(object):
+            pass
+
+        validator = Validator({'point': Point})
+        assert errors_of(validator, {'point': 42}) == {
+            'point': 'Invalid type, expected Point.',
+        }
+
+    def test_validate_items_one_at_a_time(self):
+        validator = Validator({'id': int})
+        items = validator.iterate(iter([{'id': 1}, {}]))
+        assert next(items) == {'id': 1}
+        with pytest.raises(ApiUnprocessableEntity) as exc:
+            next(items)
+        assert exc.value.errors == {'1.id': 'Missing required field.'}
+
+    def test_invalid_list_schema(self):
+        with pytest.raises(ValueError):
+            Validator({'tags': [str, int]})
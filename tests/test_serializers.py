@@ -1,12 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import json
+import logging
+import time
+
 import pytest
+from flask import url_for
 
-from flask_apify.serializers import Serializer
+from flask_apify.serializers import RawJSON, Serializer, dumps
 from flask_apify.serializers.debug import DebugSerializer
 from flask_apify.serializers.json import JSONSerializer
 from flask_apify.serializers.jsonp import JSONPSerializer
 from flask_apify.serializers.jsonp import jsonp
+from flask_apify.serializers.ndjson import NDJSONSerializer
+from flask_apify.serializers.sse import (
+    Event, EventStream, EventStreamSerializer, format_event
+)
 
 
 class TestSerializer(object):
@@ -58,9 +67,188 @@ class TestJSONPSerializer(object):
 
     def test_use_callback_function_from_request_arguments_to_wrap_output(self, app):
         with app.test_request_context('?callback=console.log'):
-            assert self.serializer('42') == 'console.log(42);'
+            assert self.serializer('42') == 'console.log("42");'
 
     def test_support_custom_callback_name(self, app):
         serializer = JSONPSerializer(callback_name='jsonp')
         with app.test_request_context('?jsonp=console.log'):
-            assert serializer('42') == 'console.log(42);'
+            assert serializer('42') == 'console.log("42");'
+
+    def test_ignore_invalid_callback(self, app):
+        serializer = JSONPSerializer()
+        with app.test_request_context('?callback=alert(1);foo'):
+            assert serializer('42') == '"42"'
+
+    def test_cache_callback_validation(self):
+        serializer = JSONPSerializer(max_cached_callbacks=1)
+        assert serializer.is_valid_callback('jQuery.done')
+        assert serializer._valid_callbacks == {'jQuery.done': True}
+        assert not serializer.is_valid_callback('a-b')
+        assert serializer._valid_callbacks == {'a-b': False}
+
+    def test_reject_callback_with_trailing_newline(self):
+        serializer = JSONPSerializer()
+        assert not serializer.is_valid_callback('cb\n')
+
+    def test_resolve_json_serializer_on_bind(self, app):
+        serializer = JSONPSerializer()
+        bound = serializer.bind({'application/json': lambda raw: '42'})
+        assert serializer.json_serializer is None
+        with app.test_request_context('?callback=cb'):
+            assert bound('What is the meaning of the Life?') == 'cb(42);'
+
+    def test_rebind_on_serializer_registration(self, app, apify):
+        @apify.serializer('application/json')
+        def my_json(raw):
+            return '42'
+
+        bound = apify.serializers.lookup('application/javascript')
+        assert bound.json_serializer is my_json
+
+    def test_add_padding_to_streamed_output(self):
+        assert list(jsonp(iter(['[1', ',2]']), 'cb')) == \
+                ['cb(', '[1', ',2]', ');']
+
+
+class TestRawJSON(object):
+
+    def test_decode_bytes(self):
+        assert RawJSON(b'{"a": 1}').encoded == '{"a": 1}'
+
+    def test_dump_fragment_as_is(self):
+        assert dumps(RawJSON('{"a":1}')) == '{"a":1}'
+
+    def test_join_list_of_fragments(self):
+        assert dumps([RawJSON('{"a":1}'), RawJSON('2')]) == '[{"a":1}, 2]'
+
+    def test_splice_nested_fragments(self, app):
+        data = {'items': [RawJSON('{"a":1}'), 2], 'one': RawJSON('"__x__"')}
+        assert dumps(data, sort_keys=True) == \
+                '{"items": [{"a":1}, 2], "one": "__x__"}'
+
+    def test_splice_into_json(self, app):
+        assert JSONSerializer()({'a': RawJSON('[1,2]')}) == '{"a": [1,2]}'
+
+    def test_splice_into_jsonp(self, app):
+        with app.test_request_context('?callback=cb'):
+            assert JSONPSerializer()([RawJSON('1')]) == 'cb([1]);'
+
+    def test_splice_into_html(self, app):
+        with app.test_request_context():
+            assert DebugSerializer()({'a': RawJSON('[1,2]')}) == \
+                    '<pre>{\n  &#34;a&#34;: [1,2]\n}</pre>'
+
+    def test_splice_into_ndjson(self, app):
+        assert list(NDJSONSerializer()([RawJSON('{"a":1}'), {'b': 2}])) == \
+                ['{"a":1}\n', '{"b": 2}\n']
+
+
+class TestNDJSONSerializer(object):
+
+    def test_dump_item_per_line(self, app):
+        assert ''.join(NDJSONSerializer()(iter([1, [2], 'x']))) == \
+                '1\n[2]\n"x"\n'
+
+    def test_dump_single_value(self, app):
+        assert list(NDJSONSerializer()({'a': 1})) == ['{"a": 1}\n']
+
+
+class TestEventStreamSerializer(object):
+
+    headers = [('Accept', 'text/event-stream')]
+
+    def test_format_event(self, app):
+        serializer = EventStreamSerializer()
+        assert serializer(Event({'a': 1}, id=7, event='update', retry=1000)) \
+            == 'id: 7\nevent: update\nretry: 1000\ndata: {"a": 1}\n\n'
+        assert serializer('multi\nline') == 'data: "multi\\nline"\n\n'
+
+    def test_strip_line_breaks_from_fields(self):
+        assert format_event('1', id='7\ndata: forged', event='a\r\nb') == \
+            'id: 7data: forged\nevent: ab\ndata: 1\n\n'
+
+    def test_stream_events(self, client):
+        res = client.get(url_for('api.events'), headers=self.headers)
+        assert res.status_code == 200
+        assert res.mimetype == 'text/event-stream'
+        assert res.headers['Cache-Control'] == 'no-cache'
+        assert res.get_data(as_text=True) == (
+            'id: 1\ndata: {"value": 1}\n\n'
+            'id: 2\ndata: {"value": 2}\n\n'
+            'id: 3\ndata: {"value": 3}\n\n'
+        )
+
+    def test_resume_from_last_event_id(self, client):
+        res = client.get(url_for('api.events'),
+                         headers=self.headers + [('Last-Event-ID', '2')])
+        assert res.get_data(as_text=True) == 'id: 3\ndata: {"value": 3}\n\n'
+
+    def test_send_heartbeat(self, app):
+        def slow_events():
+            time.sleep(0.2)
+            yield 1
+
+        stream = EventStreamSerializer(heartbeat=0.05)(slow_events())
+        chunks = list(stream)
+        assert chunks[0] == ': heartbeat\n\n'
+        assert chunks[-1] == 'data: 1\n\n'
+
+    def test_backpressure(self, app):
+        produced = []
+
+        def events():
+            for i in range(10):
+                produced.append(i)
+                yield i
+
+        stream = EventStreamSerializer(max_queue=2)(events())
+        chunks = iter(stream)
+        assert next(chunks) == 'data: 0\n\n'
+        time.sleep(0.1)
+        # One event is taken, two are queued and one is waiting for slot
+        assert len(produced) == 4
+
+        stream.close()
+        stream.thread.join(1)
+        assert not stream.thread.is_alive()
+
+    def test_stop_producer_when_consumer_is_closed(self, app):
+        closed = []
+
+        def events():
+            try:
+                while True:
+                    time.sleep(0.01)
+                    yield 1
+            finally:
+                closed.append(True)
+
+        stream = EventStreamSerializer(max_queue=1)(events())
+        chunks = iter(stream)
+        assert next(chunks) == 'data: 1\n\n'
+
+        chunks.close()
+        stream.thread.join(1)
+        assert not stream.thread.is_alive()
+        assert closed == [True]
+
+    def test_send_error_event_when_producer_fails(self, app, caplog):
+        def events():
+            yield 1
+            raise ValueError('broken')
+
+        with caplog.at_level(logging.ERROR, logger='flask-apify'):
+            chunks = list(EventStreamSerializer()(events()))
+        assert chunks[0] == 'data: 1\n\n'
+        assert chunks[1].startswith('event: error\ndata: ')
+        assert json.loads(chunks[1][len('event: error\ndata: '):]) == \
+            EventStream.error
+        assert len(chunks) == 2
+        record, = caplog.records
+        assert record.exc_info[0] is ValueError
+
+    def test_serialize_stream_as_list_in_other_format(self, client):
+        res = client.get(url_for('api.numbers'),
+                         headers=[('Accept', 'application/json')])
+        assert res.status_code == 200
+        assert res.json == [1, 2, 3]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+import sys
+
+
+startup_script = '''
+import json, sys, time
+
+start = time.perf_counter()
+import flask
+flask_elapsed = time.perf_counter() - start
+
+start = time.perf_counter()
+import flask_apify
+app = flask.Flask(__name__)
+apify = flask_apify.Apify(app)
+
+@apify.route('/ping')
+def ping():
+    return {}
+
+app.register_blueprint(apify.blueprint)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'flask_elapsed': flask_elapsed,
+    'elapsed': elapsed,
+    'modules': sorted(m for m in sys.modules if m.startswith('flask_apify')),
+    'asyncio': 'asyncio' in sys.modules,
+}))
+'''
+
+
+def run_startup():
+    output = subprocess.check_output([sys.executable, '-c', startup_script])
+    return json.loads(output.decode('utf-8'))
+
+
+def test_startup_does_not_import_serializers():
+    modules = run_startup()['modules']
+    assert 'flask_apify.serializers' in modules
+    assert 'flask_apify.serializers.debug' not in modules
+    assert 'flask_apify.serializers.json' not in modules
+    assert 'flask_apify.serializers.jsonp' not in modules
+    assert 'flask_apify.deserializers.json' not in modules
+
+
+
+def test_startup_does_not_import_asyncio():
+    assert not run_startup()['asyncio']
+
+
+def test_startup_time(record_property):
+    # Compared with the import of Flask in the same process, so the check
+    # scales with the machine speed and load. The best of several runs is
+    # taken to reduce the noise of process startup.
+    runs = [run_startup() for _ in range(3)]
+    elapsed = min(run['elapsed'] for run in runs)
+    flask_elapsed = min(run['flask_elapsed'] for run in runs)
+    record_property('startup_ms', round(elapsed * 1000, 1))
+    record_property('flask_import_ms', round(flask_elapsed * 1000, 1))
+    assert elapsed < max(flask_elapsed * 3, 0.1)
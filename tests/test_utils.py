@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import pytest
 
+from flask_apify.response import ApiResponse
 from flask_apify.utils import (
     key, get_config, self_config, self_config_value, unpack_response
 )
@@ -21,6 +22,9 @@ def test_self_config(app):
     assert self_config(app) == {
         'APIDUMP_TEMPLATE': 'apidump.html',
         'DEFAULT_MIMETYPE': 'application/javascript',
+        'MIRROR_GLOBALS': True,
+        'MAX_BODY_SIZE': None,
+        'TIMEOUT': None,
     }
 
 
@@ -35,3 +39,40 @@ def test_unpack_response():
     assert unpack_response(one) == (one, 200, {})
     assert unpack_response((one, two)) == (one, two, {})
     assert unpack_response((one, two, three)) == (one, two, three)
+    assert unpack_response(ApiResponse(one, two, three)) == (one, two, three)
+
+
+class TestApiResponse(object):
+
+    def test_from_raw(self):
+        one, two, three = object(), object(), object()
+
+        res = ApiResponse.from_raw(one)
+        assert (res.payload, res.status) == (one, 200)
+        res = ApiResponse.from_raw((one, two, three))
+        assert (res.payload, res.status, res.headers) == (one, two, three)
+        assert ApiResponse.from_raw(res) is res
+
+    def test_headers_allocated_lazily(self):
+        res = ApiResponse({})
+        assert not res.has_headers
+        assert res._headers is None
+
+        res.headers['X-Version'] = '1'
+        assert res.has_headers
+        assert dict(res.headers) == {'X-Version': '1'}
+
+    def test_set_header_of_list_headers(self):
+        res = ApiResponse({}, 201, [('Link', '</a>'), ('Link', '</b>')])
+        res.headers['X-Version'] = '1'
+        assert res.headers.getlist('Link') == ['</a>', '</b>']
+        assert res.headers['X-Version'] == '1'
+
+        res.headers = [('X-Version', '2')]
+        res.headers['X-Request-Id'] = '42'
+        assert dict(res.headers) == {'X-Version': '2', 'X-Request-Id': '42'}
+
+    def test_unpack_without_allocating_headers(self):
+        res = ApiResponse({})
+        assert tuple(res) == ({}, 200, {})
+        assert res._headers is None